@@ -1,32 +1,33 @@
-import pandas as pd
-
-def analyze_results(high_quality_file, low_quality_file):
+def analyze_results(high_quality_file, low_quality_file, chunk_rows=1 << 20, significance=True):
     """
     Analyzes the simulated test results and prints a summary.
+    Accepts .npy results or the comma-separated text files; either is read in
+    chunks of chunk_rows, so memory stays bounded regardless of file size.
+    With significance, also reports Welch t, Mann-Whitney and bootstrap CIs,
+    which stream large files too (see experiment_stats.compare_results).
     """
-    df_high = pd.read_csv(high_quality_file, header=None, names=[
-        "task_completion_time", "errors_encountered", "user_satisfaction_score"
-    ])
-    df_low = pd.read_csv(low_quality_file, header=None, names=[
-        "task_completion_time", "errors_encountered", "user_satisfaction_score"
-    ])
+    # Imported here so importing this module stays cheap on cold start
+    from results_io import format_describe, summarize_results
+
+    summary_high = summarize_results(high_quality_file, chunk_rows)
+    summary_low = summarize_results(low_quality_file, chunk_rows)
 
     print("\n--- High Quality Results Summary ---")
-    print(df_high.describe())
+    print(format_describe(summary_high))
     print("\n--- Low Quality Results Summary ---")
-    print(df_low.describe())
+    print(format_describe(summary_low))
 
     # Calculate percentage improvements/differences
-    avg_high_time = df_high["task_completion_time"].mean()
-    avg_low_time = df_low["task_completion_time"].mean()
+    avg_high_time = summary_high["task_completion_time"].mean
+    avg_low_time = summary_low["task_completion_time"].mean
     time_diff_percent = ((avg_low_time - avg_high_time) / avg_low_time) * 100
 
-    avg_high_errors = df_high["errors_encountered"].mean()
-    avg_low_errors = df_low["errors_encountered"].mean()
+    avg_high_errors = summary_high["errors_encountered"].mean
+    avg_low_errors = summary_low["errors_encountered"].mean
     errors_diff_percent = ((avg_low_errors - avg_high_errors) / avg_low_errors) * 100
 
-    avg_high_satisfaction = df_high["user_satisfaction_score"].mean()
-    avg_low_satisfaction = df_low["user_satisfaction_score"].mean()
+    avg_high_satisfaction = summary_high["user_satisfaction_score"].mean
+    avg_low_satisfaction = summary_low["user_satisfaction_score"].mean
     satisfaction_diff_percent = ((avg_high_satisfaction - avg_low_satisfaction) / avg_high_satisfaction) * 100
 
     print("\n--- Impact Analysis ---")
@@ -42,5 +43,18 @@ def analyze_results(high_quality_file, low_quality_file):
     print(f"Average User Satisfaction Score (Low Quality): {avg_low_satisfaction:.2f}")
     print(f"High quality leads to {satisfaction_diff_percent:.2f}% higher user satisfaction.")
 
+    if significance:
+        from experiment_stats import compare_results, format_report
+
+        print("\n--- Significance (high vs low) ---")
+        print(format_report(compare_results(high_quality_file, low_quality_file,
+                                            summaries_a=summary_high, summaries_b=summary_low)))
+
 if __name__ == '__main__':
-    analyze_results("high_quality_results.txt", "low_quality_results.txt")
+    import os
+
+    # Prefer the columnar results when the simulator wrote them
+    if os.path.exists("high_quality_results.npy") and os.path.exists("low_quality_results.npy"):
+        analyze_results("high_quality_results.npy", "low_quality_results.npy")
+    else:
+        analyze_results("high_quality_results.txt", "low_quality_results.txt")
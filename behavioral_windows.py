@@ -0,0 +1,211 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Behavioral Windows
+==============================
+Behavioral scores of a run of interactions, and a per-session series of
+window signatures for emotional stability.
+
+Stability compares the signatures (sums of behavioral scores) of
+consecutive windows over roughly the last `history` interactions. Windows
+hold `history // divisor` interactions by default (the prototype's
+20 // 3 = 6), or `history // window_count`, or window_size; there are
+window_count of them, by default enough to span the history (4 of 6).
+
+Windows are anchored at fixed positions in the session: a
+WindowSignatureSeries numbers interactions as it first sees them, counting
+on from the newest one it already knows, and window n holds interactions
+n x size to (n + 1) x size - 1. Stability uses the newest windows, the last
+of which may still be filling. A new interaction therefore changes only the
+newest window, so each event rescores one window, however long the history;
+older windows keep their cached signatures until they drop out. Inferring again without new interactions
+rescores nothing. (Windows anchored at the start of the last `history`
+interactions all shift on every event, so each inference rescored them all.)
+The series also keeps the product flag of every live interaction, so a
+target is looked up in the feature table once. Entries are keyed by
+interaction identity, so histories that are trimmed, replaced or appended to
+directly (micro-batching, snapshot restores) are handled.
+
+Scores are computed by one function, behavioral_scores(), for both
+inference and stability, so cached signatures are bit-for-bit what
+rescoring would give.
+"""
+
+import math
+import statistics
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from target_features import TargetFeatureTable
+
+DEFAULT_HISTORY = 20
+DEFAULT_DIVISOR = 3
+
+
+def product_flags(interactions: Sequence[Any], features: TargetFeatureTable) -> List[bool]:
+    """Whether each interaction's target is a product"""
+    product_bit = features.bits["product"]
+    return [bool(features.mask(i.target) & product_bit) for i in interactions]
+
+
+def behavioral_scores(interactions: Sequence[Any], products: Sequence[bool]) -> Dict[str, float]:
+    """Behavioral indicator scores (0-1) of a run of interactions, given their product_flags()"""
+    if not interactions:
+        return {}
+
+    # One pass collecting what each score averages or counts, in interaction order
+    click_times, hover_durations, scroll_speeds, page_durations = [], [], [], []
+    product_targets = set()
+    product_views = detailed_views = 0
+    counts = {"add_to_cart": 0, "remove_from_cart": 0, "add_to_wishlist": 0, "search": 0}
+    for interaction, product in zip(interactions, products):
+        action = interaction.action
+        if action == "click":
+            click_times.append(interaction.timestamp)
+        elif action == "hover":
+            hover_durations.append(interaction.duration)
+        elif action == "scroll":
+            scroll_speeds.append(interaction.context.get("scroll_speed", 1))
+        elif action == "view":
+            page_durations.append(interaction.duration)
+        elif action in counts:
+            counts[action] += 1
+        if product:
+            product_targets.add(interaction.target)
+            product_views += 1
+            if interaction.duration > 30:
+                detailed_views += 1
+
+    scores = {}
+
+    # Analyze click patterns
+    if click_times:
+        avg_click_interval = statistics.fmean([
+            (click_times[i+1] - click_times[i]).total_seconds() for i in range(len(click_times)-1)
+        ]) if len(click_times) > 1 else 5.0
+
+        scores["quick_clicks"] = max(0, 1 - (avg_click_interval / 10))  # Normalize to 0-1
+        scores["erratic_clicking"] = 1 if avg_click_interval < 1 else 0
+
+    # Analyze hover patterns
+    if hover_durations:
+        avg_hover_duration = statistics.fmean(hover_durations)
+        scores["long_hover_times"] = min(1, avg_hover_duration / 5)  # Normalize
+        scores["short_hover_times"] = max(0, 1 - (avg_hover_duration / 2))
+
+    # Analyze scrolling behavior
+    if scroll_speeds:
+        avg_scroll_speed = statistics.fmean(scroll_speeds)
+        scores["rapid_scrolling"] = min(1, avg_scroll_speed / 3)
+        scores["slow_scrolling"] = max(0, 1 - (avg_scroll_speed / 1.5))
+
+    # Analyze page duration
+    if page_durations:
+        avg_page_duration = statistics.fmean(page_durations)
+        scores["long_page_durations"] = min(1, avg_page_duration / 60)  # Normalize to minutes
+        scores["short_session_duration"] = max(0, 1 - (avg_page_duration / 30))
+
+    # Analyze product engagement
+    scores["multiple_product_views"] = min(1, len(product_targets) / 5)
+    scores["detailed_product_views"] = detailed_views / max(1, product_views)
+
+    # Analyze specific actions
+    total = len(interactions)
+    scores["cart_additions"] = counts["add_to_cart"] / total
+    scores["cart_abandonments"] = counts["remove_from_cart"] / total
+    scores["wishlist_additions"] = counts["add_to_wishlist"] / total
+    scores["search_refinements"] = counts["search"] / total
+
+    return scores
+
+
+def population_variance(values: Sequence[float]) -> float:
+    """Population variance of a short list (statistics.pvariance is exact but far slower)"""
+    mean = statistics.fmean(values)
+    return statistics.fmean([(value - mean) ** 2 for value in values])
+
+
+def window_layout(history: int = DEFAULT_HISTORY, divisor: int = DEFAULT_DIVISOR, window_size: Optional[int] = None,
+                  window_count: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (window size, window count) for stability over `history` interactions.
+    The size is window_size, else history // window_count, else
+    history // divisor; the count is window_count, else enough windows to
+    span the history (4 for 20 and a divisor of 3).
+    """
+    if window_size is None:
+        window_size = max(1, history // (window_count or divisor))
+    return window_size, window_count or math.ceil(history / window_size)
+
+
+class WindowSignatureSeries:
+    """One session's window signatures over its recent history, maintained across inferences"""
+
+    def __init__(self, history: int = DEFAULT_HISTORY, divisor: int = DEFAULT_DIVISOR,
+                 window_size: Optional[int] = None, window_count: Optional[int] = None):
+        if history < 1 or divisor < 1:
+            raise ValueError("history and divisor must be at least 1")
+        if window_size is not None and window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        if window_count is not None and window_count < 1:
+            raise ValueError("window_count must be at least 1")
+        self.history = history
+        self.divisor = divisor
+        self.window_size, self.window_count = window_layout(history, divisor, window_size, window_count)
+        self._features: Optional[TargetFeatureTable] = None
+        # id(interaction) -> (interaction, product flag, position). Entries hold their interactions,
+        # so an id cannot be reused by a new interaction while it is cached
+        self._products: Dict[int, Tuple[Any, bool, int]] = {}
+        # window number -> (the window's interactions, signature)
+        self._signatures: Dict[int, Tuple[List[Any], float]] = {}
+        self.scored_windows = 0
+
+    def signatures(self, interactions: Sequence[Any], features: TargetFeatureTable) -> List[float]:
+        """Signature (sum of behavioral scores) of each of the newest windows, oldest first"""
+        if features is not self._features:
+            # Product flags depend on the feature table, which is rebuilt with the config
+            self.clear()
+            self._features = features
+
+        size, count = self.window_size, self.window_count
+        # The newest `count` windows always lie within the last count x size interactions
+        recent = interactions[-size * count:]
+        products = self._products
+        fresh = [interaction for interaction in recent if id(interaction) not in products]
+        if fresh:
+            # Positions run on from the newest known interaction, so one that was rolled
+            # back is renumbered the same and one that reappears at the old end fits before the rest
+            base = 0
+            for index in range(len(recent) - 1, -1, -1):
+                known = products.get(id(recent[index]))
+                if known is not None:
+                    base = known[2] - index
+                    break
+            if len(products) + len(fresh) > 2 * size * count:
+                # Drop interactions that left the history
+                products = self._products = {id(i): products[id(i)] for i in recent if id(i) in products}
+            flags = iter(product_flags(fresh, features))
+            for index, interaction in enumerate(recent):
+                if id(interaction) not in products:
+                    products[id(interaction)] = (interaction, next(flags), base + index)
+
+        windows: Dict[int, List[Any]] = {}
+        for interaction in recent:
+            windows.setdefault(products[id(interaction)][2] // size, []).append(interaction)
+        numbers = sorted(windows)[-count:]
+
+        previous = self._signatures
+        signatures: Dict[int, Tuple[List[Any], float]] = {}
+        for number in numbers:
+            window = windows[number]
+            entry = previous.get(number)
+            if entry is None or len(entry[0]) != len(window) or any(a is not b for a, b in zip(entry[0], window)):
+                scores = behavioral_scores(window, [products[id(interaction)][1] for interaction in window])
+                entry = (window, sum(scores.values()) if scores else 0)
+                self.scored_windows += 1
+            signatures[number] = entry
+        self._signatures = signatures
+        return [signatures[number][1] for number in numbers]
+
+    def clear(self) -> None:
+        self._features = None
+        self._products = {}
+        self._signatures = {}
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Catalog Index
+=========================
+Inverted index over a product catalog tagged with emotions, aspirational
+themes, personality fits and personalization states.
+
+Each product tag carries an affinity. For every (facet, tag) there is a
+posting list of products sorted by affinity x popularity. A query weights
+any number of tags, and a product scores
+    popularity x sum(weight x affinity) over the query tags it carries.
+Top-k is answered with the threshold algorithm: the posting lists are
+merged through a heap, always advancing the list whose head could add the
+most. Every product reached is scored exactly, and the merge stops once the
+k-th best score beats the best any unseen product could still reach. A
+query reads a few entries per list, not the catalog.
+
+A CatalogStore holds the shared index for a catalog file and rebuilds it
+when the file changes (reload_if_changed() or a watcher thread), bumping
+the shared recommendation caches' generation.
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from heapq import heappop, heappush, heapreplace
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'product_catalog.json')
+
+FACETS = ('emotions', 'themes', 'personality', 'states')
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    """Raised when a catalog file cannot be loaded into an index"""
+
+
+@dataclass(frozen=True)
+class CatalogProduct:
+    """A SKU with its per-facet tag affinities"""
+    sku: str
+    popularity: float = 1.0
+    emotions: Mapping[str, float] = field(default_factory=dict)
+    themes: Mapping[str, float] = field(default_factory=dict)
+    personality: Mapping[str, float] = field(default_factory=dict)
+    states: Mapping[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, spec: Dict) -> 'CatalogProduct':
+        """Tags may be a list (affinity 1.0 each) or a {tag: affinity} mapping"""
+        facets = {}
+        for facet in FACETS:
+            tags = spec.get(facet, {})
+            facets[facet] = dict.fromkeys(tags, 1.0) if isinstance(tags, list) else dict(tags)
+        return cls(sku=spec['sku'], popularity=float(spec.get('popularity', 1.0)), **facets)
+
+
+class CatalogIndex:
+    """Posting lists per (facet, tag) with threshold-algorithm top-k"""
+
+    def __init__(self, products: Iterable[CatalogProduct], version: Optional[int] = None):
+        self.skus: List[str] = []
+        self.popularity = array('d')
+        self._doc_ids: Dict[str, int] = {}
+        self._keys: Dict[Tuple[str, str], int] = {}
+        # Per product: ((posting key, affinity), ...) for exact scoring on random access
+        self._doc_tags: List[Tuple[Tuple[int, float], ...]] = []
+        # Per posting key: (-affinity x popularity, doc) pairs, sorted once at the end
+        unsorted: List[List[Tuple[float, int]]] = []
+        checksum = 0
+
+        for product in products:
+            if product.popularity < 0:
+                raise ValueError(f"{product.sku}: popularity must be non-negative")
+            doc = len(self.skus)
+            self.skus.append(product.sku)
+            self.popularity.append(product.popularity)
+            self._doc_ids[product.sku] = doc
+            tags = []
+            keys = array('I')
+            values = array('d', [product.popularity])
+            for facet in FACETS:
+                for tag, affinity in getattr(product, facet).items():
+                    key = self._keys.setdefault((facet, tag), len(self._keys))
+                    if key == len(unsorted):
+                        unsorted.append([])
+                    unsorted[key].append((-affinity * product.popularity, doc))
+                    tags.append((key, float(affinity)))
+                    keys.append(key)
+                    values.append(affinity)
+            self._doc_tags.append(tuple(tags))
+            checksum = zlib.crc32(product.sku.encode('utf-8') + b'\0', checksum)
+            checksum = zlib.crc32(keys.tobytes(), zlib.crc32(values.tobytes(), checksum))
+
+        # Catalog version: given by the file, or derived from the contents. Each product adds its
+        # SKU, popularity and (posting key, affinity) pairs as raw bytes, and the keys' (facet, tag)
+        # names are added once at the end, so any popularity, tag or affinity change is a new version
+        if version is None:
+            version = zlib.crc32(repr(list(self._keys)).encode('utf-8'), checksum)
+        self.version = version
+
+        self._postings: List[Tuple[array, array]] = []
+        for entries in unsorted:
+            entries.sort()
+            self._postings.append((array('I', [doc for _, doc in entries]),
+                                   array('d', [-negative for negative, _ in entries])))
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def __contains__(self, sku: str) -> bool:
+        return sku in self._doc_ids
+
+    def tags(self, facet: str) -> List[str]:
+        return [tag for tag_facet, tag in self._keys if tag_facet == facet]
+
+    def doc_id(self, sku: str) -> int:
+        """Position of a SKU in catalog order"""
+        return self._doc_ids[sku]
+
+    def vocabulary(self) -> List[Tuple[str, str]]:
+        """Every (facet, tag), indexed by posting key"""
+        return list(self._keys)
+
+    def doc_tags(self) -> Iterator[Tuple[Tuple[int, float], ...]]:
+        """Per product, in catalog order: ((posting key, affinity), ...)"""
+        return iter(self._doc_tags)
+
+    def posting_size(self, facet: str, tag: str) -> int:
+        key = self._keys.get((facet, tag))
+        return len(self._postings[key][0]) if key is not None else 0
+
+    def top_k(self, query: Mapping[str, Mapping[str, float]], k: int = 10,
+              exclude: Sequence[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Best k products for {facet: {tag: weight}} (weights must be non-negative),
+        as (sku, score) pairs, best first; equal scores keep catalog order.
+        """
+        weights: Dict[int, float] = {}
+        for facet, tags in query.items():
+            for tag, weight in tags.items():
+                if weight < 0:
+                    raise ValueError("query weights must be non-negative")
+                key = self._keys.get((facet, tag))
+                if key is not None and weight > 0:
+                    weights[key] = weights.get(key, 0.0) + weight
+        if not weights or k <= 0:
+            return []
+
+        excluded = {self._doc_ids[sku] for sku in exclude if sku in self._doc_ids}
+        lists = [(self._postings[key][0], self._postings[key][1], weight) for key, weight in weights.items()]
+        positions = [0] * len(lists)
+        cursors: List[Tuple[float, int]] = []
+        threshold = 0.0
+        for index, (docs, values, weight) in enumerate(lists):
+            bound = weight * values[0]
+            threshold += bound
+            heappush(cursors, (-bound, index))
+
+        seen = set()
+        best: List[Tuple[float, int]] = []  # min-heap of (score, -doc)
+        while cursors:
+            _, index = heappop(cursors)
+            docs, values, weight = lists[index]
+            position = positions[index]
+            doc = docs[position]
+
+            threshold -= weight * values[position]
+            position += 1
+            positions[index] = position
+            if position < len(docs):
+                bound = weight * values[position]
+                threshold += bound
+                heappush(cursors, (-bound, index))
+
+            if doc in seen or doc in excluded:
+                continue
+            seen.add(doc)
+            score = self.popularity[doc] * sum(weights[key] * affinity for key, affinity in self._doc_tags[doc]
+                                               if key in weights)
+            entry = (score, -doc)
+            if len(best) < k:
+                heappush(best, entry)
+            elif entry > best[0]:
+                heapreplace(best, entry)
+            if len(best) == k and best[0][0] >= threshold:
+                break
+
+        return [(self.skus[-negative_doc], score) for score, negative_doc in sorted(best, reverse=True)]
+
+    def top_skus(self, facet: str, tag: str, k: int = 10, exclude: Sequence[str] = ()) -> List[str]:
+        """Best k SKUs for a single tag"""
+        return [sku for sku, _ in self.top_k({facet: {tag: 1.0}}, k, exclude)]
+
+    def product(self, sku: str) -> CatalogProduct:
+        doc = self._doc_ids[sku]
+        facets: Dict[str, Dict[str, float]] = {facet: {} for facet in FACETS}
+        tags_by_key = {key: facet_tag for facet_tag, key in self._keys.items()}
+        for key, affinity in self._doc_tags[doc]:
+            facet, tag = tags_by_key[key]
+            facets[facet][tag] = affinity
+        return CatalogProduct(sku=sku, popularity=self.popularity[doc], **facets)
+
+    def products(self) -> Iterator[CatalogProduct]:
+        for sku in self.skus:
+            yield self.product(sku)
+
+
+def _iter_catalog_file(path: str) -> Tuple[Optional[int], Iterator[Dict]]:
+    if path.endswith(('.ndjson', '.jsonl')):
+        def records() -> Iterator[Dict]:
+            with open(path, 'r', encoding='utf-8') as handle:
+                for line in handle:
+                    if line.strip():
+                        yield json.loads(line)
+        return None, records()
+
+    with open(path, 'r', encoding='utf-8') as handle:
+        data = json.load(handle)
+    return data.get('version'), iter(data['products'])
+
+
+def load_catalog(path: str = DEFAULT_CATALOG_PATH) -> CatalogIndex:
+    """Build an index from a JSON catalog ({version, products}) or an NDJSON file of products"""
+    version, records = _iter_catalog_file(path)
+    return CatalogIndex((CatalogProduct.from_dict(record) for record in records), version)
+
+
+class CatalogStore:
+    """
+    Holds the current index for one catalog file, like ModelConfigStore does for
+    the model config. Readers take `store.current`; a reload builds the new
+    index fully before swapping the reference, then invalidates the shared
+    recommendation caches, so lists ranked on the old catalog are dropped
+    even when the file keeps its version. A bad file leaves the previous
+    index in place.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.current: CatalogIndex = self._load()
+
+    def _load(self) -> CatalogIndex:
+        # Recorded before building, so a bad file is not retried until it changes again
+        self._mtime_ns = os.stat(self.path).st_mtime_ns
+        return load_catalog(self.path)
+
+    def reload(self) -> CatalogIndex:
+        """Rebuild the index and swap it in; raises CatalogError and keeps the old index on failure"""
+        from recommendation_cache import invalidate_all
+
+        with self._lock:
+            try:
+                index = self._load()
+            except Exception as error:
+                logger.error("reload of %s failed, keeping generation %d: %s", self.path, self.generation, error)
+                raise CatalogError(f"reload of {self.path} failed: {error}") from error
+            self.current = index
+            self.generation += 1
+        invalidate_all()
+        return index
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the file's modification time has changed"""
+        try:
+            changed = os.stat(self.path).st_mtime_ns != self._mtime_ns
+        except OSError:
+            return False
+        if changed:
+            self.reload()
+        return changed
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Poll the file in a daemon thread and rebuild the index on change"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except CatalogError:
+                    pass  # Logged by reload(); keep serving the last good index
+                except Exception:
+                    logger.exception("catalog watcher for %s failed", self.path)
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=watch, name='catalog-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self, timeout: Optional[float] = None) -> None:
+        """Stop the watcher thread and wait for it to exit"""
+        watcher, self._watcher = self._watcher, None
+        self._stop_watching.set()
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join(timeout)
+
+
+_stores: Dict[str, CatalogStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_catalog_store(path: str = DEFAULT_CATALOG_PATH) -> CatalogStore:
+    """Process-wide store for a catalog file, shared by every engine that uses it"""
+    path = os.path.abspath(path)
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = CatalogStore(path)
+    return store
+
+
+def get_catalog_index(path: str = DEFAULT_CATALOG_PATH) -> CatalogIndex:
+    """Current process-wide index for a catalog file; replaced when its store reloads"""
+    return get_catalog_store(path).current
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rng = random.Random(7)
+    emotions = ['excited', 'curious', 'contemplative', 'frustrated', 'relaxed', 'focused', 'inspired', 'delighted']
+    themes = [f"theme_{n}" for n in range(200)]
+    personality = [f"trait_{n}" for n in range(50)]
+
+    def synthetic_products(count: int) -> Iterator[CatalogProduct]:
+        for n in range(count):
+            yield CatalogProduct(
+                sku=f"sku_{n}",
+                popularity=rng.paretovariate(1.5),
+                emotions={emotion: rng.uniform(0.3, 1.0) for emotion in rng.sample(emotions, 2)},
+                themes={theme: rng.uniform(0.3, 1.0) for theme in rng.sample(themes, 3)},
+                personality=dict.fromkeys(rng.sample(personality, 2), 1.0),
+            )
+
+    count = 1_000_000
+    started = time.perf_counter()
+    index = CatalogIndex(synthetic_products(count))
+    print(f"indexed {count:,} SKUs in {time.perf_counter() - started:.1f}s")
+
+    queries = [
+        {'emotions': {rng.choice(emotions): 1.0, rng.choice(emotions): 0.5},
+         'themes': {rng.choice(themes): 0.8}}
+        for _ in range(2000)
+    ]
+    started = time.perf_counter()
+    for query in queries:
+        index.top_k(query, k=10)
+    elapsed = time.perf_counter() - started
+    print(f"top-10 over 3 posting lists: {elapsed / len(queries) * 1e6:.0f} µs/query")
+    print(index.top_k(queries[0], k=3))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Cohort Analytics
+============================
+Population-level rollups over detected behavioral patterns.
+
+Every session's patterns are folded into pre-aggregated cells keyed by
+(slice dimension, slice value, facet, key), so dashboard queries such as
+"share of HESITATING sessions by hour" never scan stored patterns.
+Updates and queries are serialized by one internal lock, so a single
+instance can be shared by engines running on several threads.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+UNKNOWN = 'unknown'
+ALL_SESSIONS = ('all', '*')
+
+# Cell layout: [pattern_count, confidence_sum, session_count]
+PATTERN_COUNT, CONFIDENCE_SUM, SESSION_COUNT = 0, 1, 2
+
+
+class CohortAnalytics:
+    """Incrementally maintained cohort rollups for BehavioralPattern objects"""
+
+    DIMENSIONS = ('device', 'hour', 'referrer')
+    FACETS = ('behavior_type', 'intensity', 'trigger')
+
+    def __init__(self):
+        self.rollups: Dict[Tuple[str, Any, str, str], List[float]] = defaultdict(lambda: [0, 0.0, 0])
+        self.session_totals: Dict[Tuple[str, Any], int] = defaultdict(int)
+        # What each session last contributed, so re-analysis replaces instead of double counting
+        self._session_slices: Dict[str, List[Tuple[str, Any]]] = {}
+        self._session_contributions: Dict[str, Dict[Tuple[str, str], List[float]]] = {}
+        self._lock = threading.RLock()
+
+    def record_session(self, session_id: str, patterns: List[Any], context: Optional[Any] = None) -> None:
+        """Fold a session's patterns into the rollups, replacing any earlier contribution"""
+        contribution: Dict[Tuple[str, str], List[float]] = {}
+        for pattern in patterns:
+            keys = [('behavior_type', pattern.pattern_type.value), ('intensity', pattern.intensity.value)]
+            keys.extend(('trigger', trigger) for trigger in set(pattern.triggers))
+            for key in keys:
+                cell = contribution.setdefault(key, [0, 0.0, 1])
+                cell[PATTERN_COUNT] += 1
+                cell[CONFIDENCE_SUM] += pattern.confidence
+        slices = self._slices_for_context(context)
+
+        with self._lock:
+            self.remove_session(session_id)
+            self._apply(slices, contribution, 1)
+            self._session_slices[session_id] = slices
+            self._session_contributions[session_id] = contribution
+
+    def update_session_context(self, session_id: str, context: Any) -> None:
+        """Re-attribute an already recorded session to the slices of a new context"""
+        with self._lock:
+            contribution = self._session_contributions.get(session_id)
+            if contribution is None:
+                return
+
+            self._apply(self._session_slices[session_id], contribution, -1)
+            slices = self._slices_for_context(context)
+            self._apply(slices, contribution, 1)
+            self._session_slices[session_id] = slices
+
+    def remove_session(self, session_id: str) -> None:
+        """Retract a session's contribution from every rollup"""
+        with self._lock:
+            contribution = self._session_contributions.pop(session_id, None)
+            if contribution is None:
+                return
+            self._apply(self._session_slices.pop(session_id), contribution, -1)
+
+    def _apply(self, slices: List[Tuple[str, Any]], contribution: Dict[Tuple[str, str], List[float]],
+               sign: int) -> None:
+        for dimension, value in slices:
+            self.session_totals[(dimension, value)] += sign
+            for (facet, key), cell in contribution.items():
+                rollup = self.rollups[(dimension, value, facet, key)]
+                rollup[PATTERN_COUNT] += sign * cell[PATTERN_COUNT]
+                rollup[CONFIDENCE_SUM] += sign * cell[CONFIDENCE_SUM]
+                rollup[SESSION_COUNT] += sign * cell[SESSION_COUNT]
+
+    def _slices_for_context(self, context: Optional[Any]) -> List[Tuple[str, Any]]:
+        """Slice values for a SessionContext (device, start hour, referrer)"""
+        if context is None:
+            return [ALL_SESSIONS, ('device', UNKNOWN), ('hour', UNKNOWN), ('referrer', UNKNOWN)]
+
+        return [
+            ALL_SESSIONS,
+            ('device', context.device_type or UNKNOWN),
+            ('hour', context.start_time.hour if context.start_time else UNKNOWN),
+            ('referrer', context.referrer_source or UNKNOWN)
+        ]
+
+    # Queries
+    def pattern_stats(self, facet: str, key: str, dimension: str = 'all',
+                      value: Any = '*') -> Dict[str, float]:
+        """Pattern count, mean confidence and session count for one facet key in one slice"""
+        with self._lock:
+            cell = self.rollups.get((dimension, value, facet, key))
+            if cell is None or cell[PATTERN_COUNT] <= 0:
+                return {'pattern_count': 0, 'mean_confidence': 0.0, 'session_count': 0}
+
+            return {
+                'pattern_count': cell[PATTERN_COUNT],
+                'mean_confidence': float(cell[CONFIDENCE_SUM] / cell[PATTERN_COUNT]),
+                'session_count': cell[SESSION_COUNT]
+            }
+
+    def share_of_sessions(self, facet: str, key: str, dimension: str = 'all') -> Dict[Any, float]:
+        """Fraction of sessions in each slice of a dimension that showed the facet key"""
+        with self._lock:
+            shares = {}
+            for (slice_dimension, value), total in self.session_totals.items():
+                if slice_dimension != dimension or total <= 0:
+                    continue
+                cell = self.rollups.get((dimension, value, facet, key))
+                shares[value] = (cell[SESSION_COUNT] / total) if cell else 0.0
+            return shares
+
+    def breakdown(self, facet: str, dimension: str = 'all', value: Any = '*') -> Dict[str, Dict[str, float]]:
+        """Stats for every key of a facet within one slice"""
+        with self._lock:
+            return {
+                key: self.pattern_stats(facet, key, dimension, value)
+                for (slice_dimension, slice_value, slice_facet, key), cell in self.rollups.items()
+                if slice_dimension == dimension and slice_value == value and slice_facet == facet
+                and cell[PATTERN_COUNT] > 0
+            }
+
+    @property
+    def total_sessions(self) -> int:
+        return self.session_totals.get(ALL_SESSIONS, 0)
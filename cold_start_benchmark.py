@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Cold-Start Benchmark
+======================================
+Measures import time, engine construction and first-call latency for each
+ER-AI module in a fresh interpreter, the way a newly scaled-up worker pays
+them. Every measurement runs in its own subprocess so module caches from
+one run never leak into the next.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+{import_stmt}
+imported = time.perf_counter()
+{warm_stmt}
+warmed = time.perf_counter()
+engine = {constructor}
+constructed = time.perf_counter()
+{first_call}
+called = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'warm_start_ms': (warmed - imported) * 1000,
+    'construct_ms': (constructed - warmed) * 1000,
+    'first_call_ms': (called - constructed) * 1000,
+    'numpy_loaded': 'numpy' in sys.modules,
+    'pandas_loaded': 'pandas' in sys.modules
+}}))
+"""
+
+SCENARIOS = {
+    'er_ai_prototype': {
+        'import_stmt': 'from er_ai_prototype import EmotionalResonanceAI, UserInteraction\nfrom datetime import datetime',
+        'constructor': 'EmotionalResonanceAI()',
+        'first_call': ("engine.process_interaction(UserInteraction(datetime.now(), 'view', 'product_page', 12.0, {}))\n"
+                       "engine.infer_emotional_state()")
+    },
+    'er_ai_enhanced': {
+        'import_stmt': 'from er_ai_enhanced import EnhancedEmotionalResonanceAI',
+        'constructor': 'EnhancedEmotionalResonanceAI()',
+        'first_call': "engine.track_enhanced_interaction('view', 'product_page', 4.0, scroll_velocity=80.0)"
+    },
+    'behavioral_pattern_recognition': {
+        'import_stmt': ('from behavioral_pattern_recognition import AdvancedBehavioralPatternRecognition\n'
+                        'from datetime import datetime, timedelta'),
+        'constructor': 'AdvancedBehavioralPatternRecognition()',
+        'first_call': ("engine.analyze_advanced_behavioral_patterns('user_1', 'session_1', ["
+                       "{'timestamp': datetime.now() + timedelta(seconds=10 * t), 'action': a, 'target': 'product_page', "
+                       "'dwell_time': 3.0 + t, 'scroll_velocity': 60.0 + 5 * t, 'duration': 2.0} "
+                       "for t, a in enumerate(['view', 'read', 'compare', 'view', 'add_to_cart'])])")
+    },
+    'analyze_results': {
+        'import_stmt': 'import analyze_results',
+        'constructor': 'None',
+        'first_call': ''
+    }
+}
+
+WARM_STARTS = {
+    'lazy': '',
+    'warm_start': 'import model_config\nmodel_config.warm_start()'
+}
+
+
+def run_probe(scenario: dict, warm_stmt: str) -> dict:
+    code = PROBE.format(warm_stmt=warm_stmt, **scenario)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def benchmark(repeats: int = 5) -> dict:
+    """Median of each timing over several fresh interpreters"""
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        for mode, warm_stmt in WARM_STARTS.items():
+            if name == 'analyze_results' and mode != 'lazy':
+                continue
+            runs = [run_probe(scenario, warm_stmt) for _ in range(repeats)]
+            summary = {key: statistics.median(run[key] for run in runs)
+                       for key in ('import_ms', 'warm_start_ms', 'construct_ms', 'first_call_ms')}
+            summary['numpy_loaded'] = runs[0]['numpy_loaded']
+            summary['pandas_loaded'] = runs[0]['pandas_loaded']
+            results[f"{name} ({mode})"] = summary
+    return results
+
+
+if __name__ == "__main__":
+    results = benchmark()
+    print(f"{'scenario':48} {'import':>9} {'warm':>9} {'build':>9} {'1st call':>9}  numpy")
+    for name, summary in results.items():
+        print(f"{name:48} {summary['import_ms']:8.1f}ms {summary['warm_start_ms']:8.1f}ms "
+              f"{summary['construct_ms']:8.1f}ms {summary['first_call_ms']:8.1f}ms  {summary['numpy_loaded']}")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Concurrent Engine
+===================================
+Thread-safe front ends for the ER-AI engines (enhanced, prototype and
+behavioral).
+
+The engine classes keep mutable per-session and per-user state without
+any locking. Here that state is partitioned across lock stripes: every
+session (or user) maps to exactly one stripe, and only the thread holding
+that stripe's lock touches its state. Different sessions proceed in
+parallel on a thread pool or a free-threaded interpreter; state shared
+by all of them (the compiled model config and the cohort rollups) is
+either immutable or guarded by its own lock.
+"""
+
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+from behavioral_pattern_recognition import AdvancedBehavioralPatternRecognition, SessionContext
+from cohort_analytics import CohortAnalytics
+from er_ai_enhanced import EnhancedEmotionalResonanceAI, PersonalizationInsight
+from er_ai_prototype import EmotionalProfile, EmotionalResonanceAI, EmotionalState, UserInteraction
+from model_config import ModelConfigStore, get_config_store
+from session_snapshot import encode_session, restore_session
+
+if TYPE_CHECKING:
+    from pattern_learning import PatternLearner
+
+EngineT = TypeVar('EngineT')
+
+
+class LockStripes:
+    """A fixed set of re-entrant locks; a key always maps to the same stripe"""
+
+    def __init__(self, num_stripes: int = 64):
+        if num_stripes < 1:
+            raise ValueError("num_stripes must be at least 1")
+        self.locks = [threading.RLock() for _ in range(num_stripes)]
+
+    def index_for(self, key: str) -> int:
+        return hash(key) % len(self.locks)
+
+    def lock_for(self, key: str) -> threading.RLock:
+        return self.locks[self.index_for(key)]
+
+    @contextmanager
+    def all_stripes(self) -> Iterator[None]:
+        """Hold every stripe, always acquired in index order so callers cannot deadlock"""
+        with ExitStack() as stack:
+            for lock in self.locks:
+                stack.enter_context(lock)
+            yield
+
+    def __len__(self) -> int:
+        return len(self.locks)
+
+
+class StripedSessionEngines(Generic[EngineT]):
+    """
+    One engine instance per session, sharded across lock stripes.
+    Each stripe owns its own dict of engines, so creating a session never
+    touches another stripe's state.
+    """
+
+    def __init__(self, engine_factory: Callable[[], EngineT], num_stripes: int = 64):
+        self.engine_factory = engine_factory
+        self.stripes = LockStripes(num_stripes)
+        self.shards: List[Dict[str, EngineT]] = [{} for _ in range(num_stripes)]
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[EngineT]:
+        """Exclusive access to a session's engine, creating it on first use"""
+        index = self.stripes.index_for(session_id)
+        with self.stripes.locks[index]:
+            shard = self.shards[index]
+            engine = shard.get(session_id)
+            if engine is None:
+                engine = shard[session_id] = self.engine_factory()
+            yield engine
+
+    def discard(self, session_id: str) -> Optional[EngineT]:
+        """Drop a finished session's engine"""
+        index = self.stripes.index_for(session_id)
+        with self.stripes.locks[index]:
+            return self.shards[index].pop(session_id, None)
+
+    def session_ids(self) -> List[str]:
+        with self.stripes.all_stripes():
+            return [session_id for shard in self.shards for session_id in shard]
+
+    def __contains__(self, session_id: str) -> bool:
+        index = self.stripes.index_for(session_id)
+        with self.stripes.locks[index]:
+            return session_id in self.shards[index]
+
+    def __len__(self) -> int:
+        with self.stripes.all_stripes():
+            return sum(len(shard) for shard in self.shards)
+
+
+class ConcurrentEmotionalEngine:
+    """Thread-safe EnhancedEmotionalResonanceAI: per-session engines behind lock stripes"""
+
+    def __init__(self, num_stripes: int = 64, config_store: Optional[ModelConfigStore] = None,
+                 use_embeddings: bool = False):
+        self.config_store = config_store or get_config_store()
+        self.sessions: StripedSessionEngines[EnhancedEmotionalResonanceAI] = StripedSessionEngines(
+            lambda: EnhancedEmotionalResonanceAI(config_store=self.config_store, use_embeddings=use_embeddings),
+            num_stripes
+        )
+
+    def track_interaction(self, session_id: str, action: str, target: str, duration: float = 1.0,
+                          context: Dict[str, Any] = None, **kwargs) -> PersonalizationInsight:
+        """Thread-safe track_enhanced_interaction for one session"""
+        with self.sessions.session(session_id) as engine:
+            return engine.track_enhanced_interaction(action, target, duration, context,
+                                                     session_id=session_id, **kwargs)
+
+    def end_session(self, session_id: str) -> None:
+        self.sessions.discard(session_id)
+
+    def export_session(self, session_id: str) -> bytes:
+        """Full binary snapshot of a session, e.g. before migrating it to another worker"""
+        with self.sessions.session(session_id) as engine:
+            return encode_session(engine)
+
+    def import_session(self, session_id: str, snapshot: bytes) -> None:
+        """Restore a session from a full snapshot, or apply a delta to it"""
+        with self.sessions.session(session_id) as engine:
+            restore_session(snapshot, engine)
+
+
+class ConcurrentPrototypeEngine:
+    """
+    Thread-safe EmotionalResonanceAI: per-session engines behind lock stripes.
+    Engines share the catalog index and recommendation cache (both locked)
+    and, with online learning, one PatternLearner, which buffers outcomes
+    per thread.
+    """
+
+    def __init__(self, num_stripes: int = 64, config_store: Optional[ModelConfigStore] = None,
+                 pattern_learner: Optional['PatternLearner'] = None, use_embeddings: bool = False):
+        self.config_store = config_store or get_config_store()
+        self.pattern_learner = pattern_learner
+        self.sessions: StripedSessionEngines[EmotionalResonanceAI] = StripedSessionEngines(
+            lambda: EmotionalResonanceAI(config_store=self.config_store, pattern_learner=self.pattern_learner,
+                                         use_embeddings=use_embeddings),
+            num_stripes
+        )
+
+    def process_interaction(self, session_id: str, interaction: UserInteraction) -> None:
+        with self.sessions.session(session_id) as engine:
+            engine.process_interaction(interaction)
+
+    def infer(self, session_id: str, recent_window_minutes: int = 10) -> Tuple[EmotionalProfile, PersonalizationInsight]:
+        """Thread-safe infer_emotional_state plus the insights generated from it"""
+        with self.sessions.session(session_id) as engine:
+            profile = engine.infer_emotional_state(recent_window_minutes)
+            return profile, engine.generate_personalization_insights(profile)
+
+    def record_outcome(self, session_id: str, outcome: str, label: Optional[EmotionalState] = None) -> None:
+        with self.sessions.session(session_id) as engine:
+            engine.record_outcome(outcome, label)
+
+    def flush_learning(self) -> None:
+        """Merge every outcome still buffered by the shared learner, e.g. at shutdown"""
+        if self.pattern_learner is not None:
+            self.pattern_learner.flush_all()
+
+    def end_session(self, session_id: str) -> None:
+        self.sessions.discard(session_id)
+
+
+class ConcurrentBehavioralEngine:
+    """
+    Thread-safe AdvancedBehavioralPatternRecognition.
+    Users are hashed onto independent engine shards, each behind its own lock,
+    so a user's signature, multi-session history and sessions always live in
+    one shard. All shards share one (internally locked) CohortAnalytics.
+    """
+
+    def __init__(self, num_shards: int = 16, config_store: Optional[ModelConfigStore] = None,
+                 **engine_options: Any):
+        self.config_store = config_store or get_config_store()
+        self.cohort_analytics = CohortAnalytics()
+        self.stripes = LockStripes(num_shards)
+        self.shards = [
+            AdvancedBehavioralPatternRecognition(config_store=self.config_store,
+                                                 cohort_analytics=self.cohort_analytics, **engine_options)
+            for _ in range(num_shards)
+        ]
+        # Which user a session belongs to, so session-scoped reads find the right shard;
+        # shared by all shards, so guarded by its own lock
+        self._session_users: Dict[str, str] = {}
+        self._session_users_lock = threading.Lock()
+
+    @contextmanager
+    def user_shard(self, user_id: str) -> Iterator[AdvancedBehavioralPatternRecognition]:
+        """Exclusive access to the shard that owns a user"""
+        index = self.stripes.index_for(user_id)
+        with self.stripes.locks[index]:
+            yield self.shards[index]
+
+    def _bind_session(self, session_id: str, user_id: str) -> None:
+        with self._session_users_lock:
+            self._session_users[session_id] = user_id
+
+    def analyze(self, user_id: str, session_id: str, interactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Thread-safe analyze_advanced_behavioral_patterns"""
+        self._bind_session(session_id, user_id)
+        with self.user_shard(user_id) as shard:
+            return shard.analyze_advanced_behavioral_patterns(user_id, session_id, interactions)
+
+    def register_session_context(self, user_id: str, context: SessionContext):
+        self._bind_session(context.session_id, user_id)
+        with self.user_shard(user_id) as shard:
+            return shard.register_session_context(context)
+
+    def ingest_signal_events(self, user_id: str, session_id: str, interactions: List[Dict[str, Any]]) -> None:
+        self._bind_session(session_id, user_id)
+        with self.user_shard(user_id) as shard:
+            shard.ingest_signal_events(user_id, session_id, interactions)
+
+    def end_session(self, session_id: str) -> None:
+        """Drop a finished session's context and signal streams; user-level state is kept"""
+        with self._session_users_lock:
+            user_id = self._session_users.pop(session_id, None)
+        if user_id is None:
+            return
+        with self.user_shard(user_id) as shard:
+            shard.session_contexts.pop(session_id, None)
+            shard.context_adjustments.pop(session_id, None)
+            shard.session_signal_streams.pop(session_id, None)
+
+    def get_signal_summary(self, key: str, signal: str = 'scroll_velocity',
+                           scope: str = 'session') -> Dict[str, Any]:
+        if scope == 'session':
+            with self._session_users_lock:
+                user_id = self._session_users.get(key)
+        else:
+            user_id = key
+        if user_id is None:
+            return {}
+        with self.user_shard(user_id) as shard:
+            return shard.get_signal_summary(key, signal, scope)
+
+    def behavioral_signature(self, user_id: str):
+        with self.user_shard(user_id) as shard:
+            return shard.behavioral_signatures.get(user_id)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    actions = ['view', 'hover', 'scroll', 'click', 'search', 'add_to_cart', 'compare']
+    engine = ConcurrentEmotionalEngine()
+
+    def run_session(session_number: int) -> int:
+        rng = random.Random(session_number)
+        for _ in range(100):
+            engine.track_interaction(f"session_{session_number}", rng.choice(actions), 'product_page',
+                                     rng.uniform(0.5, 10.0))
+        return session_number
+
+    for workers in (1, 4, 8):
+        engine = ConcurrentEmotionalEngine()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run_session, range(64)))
+        elapsed = time.perf_counter() - started
+        print(f"{workers} threads: {64 * 100 / elapsed:8.0f} events/s across {len(engine.sessions)} sessions")
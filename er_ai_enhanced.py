@@ -8,15 +8,25 @@ transition prediction, and advanced behavioral pattern recognition.
 This represents the next evolution in empathic commerce technology.
 """
 
-import numpy as np
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import TYPE_CHECKING, Callable, Dict, List, Mapping, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
 from enum import Enum
 import random
 import time
 import math
+import statistics
+
+from behavioral_windows import population_variance
+from catalog_index import CatalogIndex, CatalogStore, get_catalog_store
+from model_config import CompiledModelConfig, ModelConfigStore, get_config_store
+from target_features import micro_state_trigger_masks, target_features
+from range_classifiers import ThresholdClassifier
+from recommendation_cache import RecommendationCache, get_recommendation_cache
+
+if TYPE_CHECKING:
+    from product_embeddings import ProductEmbeddings
 
 # Enhanced Emotional State Definitions
 class EmotionalState(Enum):
@@ -44,6 +54,13 @@ class EmotionalIntensity(Enum):
     HIGH = "high"
     EXTREME = "extreme"
 
+# Intensity score ladder: >= 0.3 medium, >= 0.6 high, >= 0.8 extreme
+INTENSITY_CLASSIFIER = ThresholdClassifier(
+    [0.3, 0.6, 0.8],
+    [EmotionalIntensity.LOW, EmotionalIntensity.MEDIUM, EmotionalIntensity.HIGH, EmotionalIntensity.EXTREME],
+    strict=False
+)
+
 class BehavioralPattern(Enum):
     BROWSING = "browsing"
     SEARCHING = "searching"
@@ -53,6 +70,21 @@ class BehavioralPattern(Enum):
     EXPLORING = "exploring"
     RESEARCHING = "researching"
 
+@dataclass(frozen=True)
+class TrajectoryFeatures:
+    """Compact summary of a mouse trajectory; see trajectory_features"""
+    points: int
+    kept_points: int  # vertices left after Douglas-Peucker compression
+    duration: float  # seconds
+    path_length: float  # pixels
+    straightness: float  # start-to-end distance / path length
+    mean_speed: float  # pixels per second
+    peak_speed: float
+    mean_jerk: float  # mean |d acceleration / dt|, pixels per second^3
+    curvature: float  # mean |turning angle| at the compressed vertices, radians
+    pause_count: int
+    pause_time: float  # seconds spent in pauses
+
 @dataclass
 class UserInteraction:
     timestamp: datetime
@@ -67,6 +99,8 @@ class UserInteraction:
     mouse_trajectory: List[Tuple[float, float]] = None
     device_orientation: str = "portrait"
     session_id: str = ""
+    # Replaces the raw mouse_trajectory once it has been summarized
+    trajectory_features: Optional[TrajectoryFeatures] = None
 
 @dataclass
 class EmotionalProfile:
@@ -107,181 +141,79 @@ class EnhancedEmotionalResonanceAI:
     This represents the cutting edge of empathic commerce technology.
     """
     
-    def __init__(self):
+    def __init__(self, config_store: Optional[ModelConfigStore] = None,
+                 clock: Callable[[], datetime] = datetime.now, rng: Optional[random.Random] = None,
+                 catalog_index: Optional[CatalogIndex] = None,
+                 recommendation_cache: Optional[RecommendationCache] = None,
+                 use_embeddings: bool = False):
         self.interaction_history: List[UserInteraction] = []
         self.emotional_history: List[EmotionalProfile] = []
         self.session_data: Dict[str, Any] = {}
         self.behavioral_patterns: Dict[str, float] = {}
         
-        # Enhanced emotional transition matrix
-        self.emotional_transitions = self._build_enhanced_transition_matrix()
-        
-        # Micro-emotional state patterns
-        self.micro_state_patterns = self._build_micro_state_patterns()
-        
-        # Behavioral pattern recognition models
-        self.behavioral_models = self._initialize_behavioral_models()
-        
-        # Contextual factors
-        self.contextual_weights = {
-            'time_of_day': 0.15,
-            'device_type': 0.10,
-            'session_length': 0.20,
-            'previous_sessions': 0.25,
-            'seasonal_factors': 0.10,
-            'social_context': 0.20
-        }
+        # Transition matrix, micro-state patterns, behavioral models and contextual
+        # weights live in the shared, hot-reloadable model config
+        self.config_store = config_store or get_config_store()
+        # Product posting lists: a private index, or the shared, hot-reloadable one for the catalog file
+        self._catalog_index = catalog_index
+        self.catalog_store: Optional[CatalogStore] = get_catalog_store() if catalog_index is None else None
+        # Product lists per (state, intensity, catalog version); a private cache for a private catalog
+        self.recommendation_cache = recommendation_cache or (
+            get_recommendation_cache('enhanced') if catalog_index is None else RecommendationCache())
+        # Rank products by vector match to the whole profile (see product_embeddings); posting lists otherwise
+        self.use_embeddings = use_embeddings
+        self._embeddings: Optional['ProductEmbeddings'] = None
+        
+        # Injectable time source and randomness, so recorded traffic can be replayed in event time
+        self.clock = clock
+        self.rng = rng if rng is not None else random
 
-    def _build_enhanced_transition_matrix(self) -> Dict[str, Dict[str, float]]:
-        """Build comprehensive emotional state transition probabilities"""
-        return {
-            EmotionalState.CURIOUS.value: {
-                EmotionalState.CONTEMPLATIVE.value: 0.35,
-                EmotionalState.EXCITED.value: 0.25,
-                EmotionalState.HESITANT.value: 0.20,
-                EmotionalState.INSPIRED.value: 0.15,
-                EmotionalState.OVERWHELMED.value: 0.05
-            },
-            EmotionalState.CONTEMPLATIVE.value: {
-                EmotionalState.CONFIDENT.value: 0.30,
-                EmotionalState.DOUBTFUL.value: 0.25,
-                EmotionalState.EXCITED.value: 0.20,
-                EmotionalState.FRUSTRATED.value: 0.15,
-                EmotionalState.SATISFIED.value: 0.10
-            },
-            EmotionalState.EXCITED.value: {
-                EmotionalState.DELIGHTED.value: 0.40,
-                EmotionalState.ANTICIPATORY.value: 0.30,
-                EmotionalState.OVERWHELMED.value: 0.15,
-                EmotionalState.CONFIDENT.value: 0.15
-            },
-            EmotionalState.FRUSTRATED.value: {
-                EmotionalState.DOUBTFUL.value: 0.35,
-                EmotionalState.HESITANT.value: 0.25,
-                EmotionalState.CURIOUS.value: 0.20,
-                EmotionalState.SATISFIED.value: 0.20
-            },
-            # Micro-states transitions
-            EmotionalState.HESITANT.value: {
-                EmotionalState.CONFIDENT.value: 0.40,
-                EmotionalState.DOUBTFUL.value: 0.30,
-                EmotionalState.CURIOUS.value: 0.30
-            },
-            EmotionalState.INSPIRED.value: {
-                EmotionalState.EXCITED.value: 0.50,
-                EmotionalState.CONFIDENT.value: 0.30,
-                EmotionalState.ANTICIPATORY.value: 0.20
-            },
-            EmotionalState.OVERWHELMED.value: {
-                EmotionalState.FRUSTRATED.value: 0.40,
-                EmotionalState.HESITANT.value: 0.35,
-                EmotionalState.FOCUSED.value: 0.25
-            },
-            EmotionalState.CONFIDENT.value: {
-                EmotionalState.EXCITED.value: 0.45,
-                EmotionalState.SATISFIED.value: 0.35,
-                EmotionalState.DELIGHTED.value: 0.20
-            }
-        }
+    @property
+    def model_config(self) -> CompiledModelConfig:
+        """Current compiled model config; replaced wholesale when the config file is reloaded"""
+        return self.config_store.current
 
-    def _build_micro_state_patterns(self) -> Dict[str, Dict[str, Any]]:
-        """Define patterns for detecting micro-emotional states"""
-        return {
-            EmotionalState.HESITANT.value: {
-                'behavioral_indicators': {
-                    'hover_duration': (3.0, 8.0),
-                    'scroll_back_frequency': 0.3,
-                    'click_hesitation': 2.0,
-                    'comparison_actions': 0.4
-                },
-                'triggers': ['price_comparison', 'review_reading', 'specification_checking']
-            },
-            EmotionalState.INSPIRED.value: {
-                'behavioral_indicators': {
-                    'rapid_engagement': 0.8,
-                    'story_interaction': 0.7,
-                    'social_sharing_intent': 0.6,
-                    'bookmark_behavior': 0.5
-                },
-                'triggers': ['story_engagement', 'value_alignment', 'aesthetic_appeal']
-            },
-            EmotionalState.OVERWHELMED.value: {
-                'behavioral_indicators': {
-                    'rapid_scrolling': 0.9,
-                    'multiple_tab_opening': 0.7,
-                    'search_refinement': 0.8,
-                    'navigation_confusion': 0.6
-                },
-                'triggers': ['too_many_options', 'complex_interface', 'information_overload']
-            },
-            EmotionalState.CONFIDENT.value: {
-                'behavioral_indicators': {
-                    'direct_navigation': 0.8,
-                    'quick_decisions': 0.7,
-                    'minimal_comparison': 0.6,
-                    'cart_progression': 0.9
-                },
-                'triggers': ['clear_value_prop', 'trust_signals', 'previous_positive_experience']
-            }
-        }
+    @property
+    def catalog_index(self) -> CatalogIndex:
+        """Current catalog index; replaced wholesale when the shared catalog file is reloaded"""
+        return self._catalog_index if self._catalog_index is not None else self.catalog_store.current
 
-    def _initialize_behavioral_models(self) -> Dict[str, Any]:
-        """Initialize advanced behavioral pattern recognition models"""
-        return {
-            'dwell_time_analyzer': {
-                'thresholds': {
-                    'quick_glance': (0, 2),
-                    'casual_interest': (2, 5),
-                    'deep_consideration': (5, 15),
-                    'intensive_study': (15, float('inf'))
-                }
-            },
-            'scroll_velocity_analyzer': {
-                'patterns': {
-                    'scanning': (50, 200),  # pixels per second
-                    'reading': (10, 50),
-                    'searching': (200, 500),
-                    'overwhelmed': (500, float('inf'))
-                }
-            },
-            'interaction_sequence_analyzer': {
-                'patterns': {
-                    'methodical': ['view', 'read', 'compare', 'decide'],
-                    'impulsive': ['view', 'add_to_cart'],
-                    'research_heavy': ['search', 'filter', 'compare', 'external_research'],
-                    'social_influenced': ['view', 'reviews', 'social_proof', 'decide']
-                }
-            },
-            'multi_session_tracker': {
-                'continuity_factors': {
-                    'return_time': 0.3,
-                    'session_depth': 0.4,
-                    'interaction_consistency': 0.3
-                }
-            }
-        }
+    @property
+    def product_embeddings(self) -> 'ProductEmbeddings':
+        """Embeddings of the current catalog: the shared ones, or our own for a private index"""
+        from product_embeddings import ProductEmbeddings, get_product_embeddings
+        if self._catalog_index is None:
+            return get_product_embeddings(self.catalog_store.path)
+        if self._embeddings is None or self._embeddings.catalog is not self._catalog_index:
+            self._embeddings = ProductEmbeddings(self._catalog_index)
+        return self._embeddings
+
+    @property
+    def emotional_transitions(self) -> Mapping[str, Mapping[str, float]]:
+        """Emotional state transition probabilities"""
+        return self.model_config.enhanced['emotional_transitions']
+
+    @property
+    def micro_state_patterns(self) -> Mapping[str, Mapping[str, Any]]:
+        """Patterns for detecting micro-emotional states"""
+        return self.model_config.enhanced['micro_state_patterns']
+
+    @property
+    def behavioral_models(self) -> Mapping[str, Any]:
+        """Behavioral pattern recognition models"""
+        return self.model_config.enhanced['behavioral_models']
+
+    @property
+    def contextual_weights(self) -> Mapping[str, float]:
+        """Contextual factor weights"""
+        return self.model_config.enhanced['contextual_weights']
 
     def track_enhanced_interaction(self, action: str, target: str, duration: float = 1.0, 
                                  context: Dict[str, Any] = None, **kwargs) -> PersonalizationInsight:
         """Enhanced interaction tracking with advanced behavioral analysis"""
         
-        if context is None:
-            context = {}
-            
         # Create enhanced interaction record
-        interaction = UserInteraction(
-            timestamp=datetime.now(),
-            action=action,
-            target=target,
-            duration=duration,
-            context=context,
-            scroll_velocity=kwargs.get('scroll_velocity', random.uniform(10, 300)),
-            dwell_time=kwargs.get('dwell_time', duration),
-            click_pressure=kwargs.get('click_pressure', random.uniform(0.3, 1.0)),
-            mouse_trajectory=kwargs.get('mouse_trajectory', []),
-            device_orientation=kwargs.get('device_orientation', 'portrait'),
-            session_id=kwargs.get('session_id', 'session_001')
-        )
+        interaction = self._create_interaction(action, target, duration, context, **kwargs)
         
         self.interaction_history.append(interaction)
         
@@ -292,6 +224,35 @@ class EnhancedEmotionalResonanceAI:
         # Generate advanced personalization insights
         return self._generate_enhanced_personalization_insights(emotional_profile)
 
+    def _create_interaction(self, action: str, target: str, duration: float = 1.0,
+                            context: Dict[str, Any] = None, **kwargs) -> UserInteraction:
+        """Build an enhanced interaction record, simulating any signals that were not supplied"""
+        if context is None:
+            context = {}
+        
+        # Raw trajectories are reduced to a feature vector on arrival and not kept
+        trajectory = kwargs.get('mouse_trajectory', [])
+        trajectory_features = None
+        if trajectory:
+            from trajectory_features import extract_trajectory_features
+            trajectory_features = extract_trajectory_features(trajectory)
+            trajectory = []
+            
+        return UserInteraction(
+            timestamp=kwargs.get('timestamp') or self.clock(),
+            action=action,
+            target=target,
+            duration=duration,
+            context=context,
+            scroll_velocity=kwargs.get('scroll_velocity', self.rng.uniform(10, 300)),
+            dwell_time=kwargs.get('dwell_time', duration),
+            click_pressure=kwargs.get('click_pressure', self.rng.uniform(0.3, 1.0)),
+            mouse_trajectory=trajectory,
+            device_orientation=kwargs.get('device_orientation', 'portrait'),
+            session_id=kwargs.get('session_id', 'session_001'),
+            trajectory_features=trajectory_features
+        )
+
     def _analyze_enhanced_emotional_state(self) -> EmotionalProfile:
         """Advanced emotional state analysis with micro-states and intensity scaling"""
         
@@ -312,6 +273,16 @@ class EnhancedEmotionalResonanceAI:
         # Predict emotional transitions
         transition_probabilities = self._predict_emotional_transitions(recent_interactions)
         
+        return self._assemble_emotional_profile(recent_interactions, behavioral_scores, micro_states,
+                                                intensity, transition_probabilities)
+
+    def _assemble_emotional_profile(self, recent_interactions: List[UserInteraction],
+                                    behavioral_scores: Dict[str, float],
+                                    micro_states: List[EmotionalState],
+                                    intensity: EmotionalIntensity,
+                                    transition_probabilities: Dict[str, float]) -> EmotionalProfile:
+        """Build the full profile once micro-states, intensity and transitions are known"""
+        
         # Determine primary and secondary emotional states
         primary_state, secondary_state = self._determine_primary_secondary_states(
             micro_states, behavioral_scores
@@ -360,14 +331,14 @@ class EnhancedEmotionalResonanceAI:
         # Dwell time analysis
         dwell_times = [i.dwell_time for i in interactions if i.dwell_time > 0]
         if dwell_times:
-            avg_dwell = np.mean(dwell_times)
+            avg_dwell = statistics.fmean(dwell_times)
             patterns['deep_consideration'] = min(1.0, avg_dwell / 10.0)
             patterns['quick_scanning'] = max(0.0, 1.0 - (avg_dwell / 5.0))
         
         # Scroll velocity analysis
         scroll_velocities = [i.scroll_velocity for i in interactions if i.scroll_velocity > 0]
         if scroll_velocities:
-            avg_scroll = np.mean(scroll_velocities)
+            avg_scroll = statistics.fmean(scroll_velocities)
             patterns['overwhelmed_scrolling'] = min(1.0, max(0.0, (avg_scroll - 200) / 300))
             patterns['methodical_reading'] = min(1.0, max(0.0, (100 - avg_scroll) / 90))
         
@@ -379,10 +350,15 @@ class EnhancedEmotionalResonanceAI:
         # Click pressure analysis (simulated)
         click_pressures = [i.click_pressure for i in interactions if hasattr(i, 'click_pressure')]
         if click_pressures:
-            avg_pressure = np.mean(click_pressures)
+            avg_pressure = statistics.fmean(click_pressures)
             patterns['confident_clicking'] = min(1.0, avg_pressure)
             patterns['hesitant_clicking'] = min(1.0, 1.0 - avg_pressure)
         
+        # Cursor hesitation: mean seconds the pointer paused per trajectory
+        trajectories = [i.trajectory_features for i in interactions if i.trajectory_features is not None]
+        if trajectories:
+            patterns['click_hesitation'] = statistics.fmean(t.pause_time for t in trajectories)
+        
         # Multi-session continuity
         patterns['session_continuity'] = self._calculate_session_continuity(interactions)
         
@@ -392,6 +368,9 @@ class EnhancedEmotionalResonanceAI:
                                      behavioral_scores: Dict[str, float]) -> List[EmotionalState]:
         """Detect micro-emotional states based on behavioral patterns"""
         detected_states = []
+        features = target_features(self.model_config)
+        trigger_masks = micro_state_trigger_masks(self.model_config)
+        recent_mask = features.union_mask(i.target for i in interactions[-3:])
         
         for state_name, pattern_config in self.micro_state_patterns.items():
             state_score = 0.0
@@ -409,10 +388,8 @@ class EnhancedEmotionalResonanceAI:
                         if behavioral_scores[indicator] >= threshold:
                             state_score += 0.25
             
-            # Check triggers
-            recent_targets = [i.target for i in interactions[-3:]]
-            trigger_matches = sum(1 for trigger in pattern_config['triggers'] 
-                                if any(trigger in target for target in recent_targets))
+            # Check triggers: each trigger found in any recent target is one bit
+            trigger_matches = (recent_mask & trigger_masks[state_name]).bit_count()
             state_score += trigger_matches * 0.2
             
             if state_score >= 0.5:  # Threshold for state detection
@@ -437,19 +414,13 @@ class EnhancedEmotionalResonanceAI:
         
         # Recent interaction frequency
         if len(interactions) >= 5:
+            now = self.clock()
             recent_frequency = len([i for i in interactions[-5:] 
-                                 if (datetime.now() - i.timestamp).seconds < 60])
+                                 if (now - i.timestamp).seconds < 60])
             intensity_score += min(0.4, recent_frequency * 0.1)
         
         # Map score to intensity levels
-        if intensity_score >= 0.8:
-            return EmotionalIntensity.EXTREME
-        elif intensity_score >= 0.6:
-            return EmotionalIntensity.HIGH
-        elif intensity_score >= 0.3:
-            return EmotionalIntensity.MEDIUM
-        else:
-            return EmotionalIntensity.LOW
+        return INTENSITY_CLASSIFIER.classify(intensity_score)
 
     def _predict_emotional_transitions(self, interactions: List[UserInteraction]) -> Dict[str, float]:
         """Predict emotional state transitions based on current context"""
@@ -572,7 +543,7 @@ class EnhancedEmotionalResonanceAI:
             # Convert intensity enum values to numeric for variance calculation
             intensity_values = {'low': 1, 'medium': 2, 'high': 3, 'extreme': 4}
             numeric_intensities = [intensity_values.get(intensity.value, 2) for intensity in recent_intensities]
-            intensity_variance = np.var(numeric_intensities) / 3.0  # Normalize by max variance
+            intensity_variance = population_variance(numeric_intensities) / 3.0  # Normalize by max variance
             intensity_stability = max(0.0, 1.0 - intensity_variance)
         else:
             intensity_stability = 0.5
@@ -590,7 +561,8 @@ class EnhancedEmotionalResonanceAI:
             return factors
         
         # Time-based factors
-        current_hour = datetime.now().hour
+        now = self.clock()
+        current_hour = now.hour
         if 9 <= current_hour <= 17:
             factors['work_hours'] = 0.8
         elif 18 <= current_hour <= 22:
@@ -600,7 +572,7 @@ class EnhancedEmotionalResonanceAI:
         
         # Session length factor
         session_start = min(i.timestamp for i in interactions)
-        session_duration = (datetime.now() - session_start).total_seconds() / 60  # minutes
+        session_duration = (now - session_start).total_seconds() / 60  # minutes
         factors['session_depth'] = min(1.0, session_duration / 30)  # Normalize to 30 min max
         
         # Device context (simulated)
@@ -679,18 +651,20 @@ class EnhancedEmotionalResonanceAI:
         
         recent_targets = [i.target for i in interactions[-5:]]
         recent_actions = [i.action for i in interactions[-5:]]
+        features = target_features(self.model_config)
+        recent_mask = features.union_mask(recent_targets)
         
         # State-specific trigger identification
         if primary_state == EmotionalState.HESITANT:
-            if any('price' in target for target in recent_targets):
+            if recent_mask & features.bits['price']:
                 triggers.append('price_sensitivity')
             if 'hover' in recent_actions:
                 triggers.append('decision_uncertainty')
         
         elif primary_state == EmotionalState.INSPIRED:
-            if any('story' in target for target in recent_targets):
+            if recent_mask & features.bits['story']:
                 triggers.append('narrative_connection')
-            if any('sustainability' in target for target in recent_targets):
+            if recent_mask & features.bits['sustainability']:
                 triggers.append('value_alignment')
         
         elif primary_state == EmotionalState.OVERWHELMED:
@@ -702,7 +676,7 @@ class EnhancedEmotionalResonanceAI:
         elif primary_state == EmotionalState.CONFIDENT:
             if 'add_to_cart' in recent_actions:
                 triggers.append('clear_value_proposition')
-            if any('review' in target for target in recent_targets):
+            if recent_mask & features.bits['review']:
                 triggers.append('social_proof')
         
         return triggers if triggers else ['general_engagement']
@@ -712,7 +686,8 @@ class EnhancedEmotionalResonanceAI:
         """Generate enhanced personalization insights with advanced adaptations"""
         
         # Base personalization from primary state
-        base_personalization = self._get_base_personalization(emotional_profile.primary_state)
+        base_personalization = self._get_base_personalization(emotional_profile.primary_state,
+                                                              emotional_profile.intensity, emotional_profile)
         
         # Enhanced micro-adaptations based on micro-states
         micro_adaptations = self._generate_micro_adaptations(emotional_profile)
@@ -745,46 +720,42 @@ class EnhancedEmotionalResonanceAI:
             dynamic_pricing_psychology=pricing_psychology
         )
 
-    def _get_base_personalization(self, primary_state: EmotionalState) -> Dict[str, Any]:
+    def _get_base_personalization(self, primary_state: EmotionalState,
+                                  intensity: Optional[EmotionalIntensity] = None,
+                                  profile: Optional[EmotionalProfile] = None) -> Dict[str, Any]:
         """Get base personalization for primary emotional state"""
         personalizations = {
             EmotionalState.CURIOUS: {
-                'products': ['artisan_ceramic_mug', 'minimalist_leather_wallet'],
                 'ui': {'showStories': True, 'highlightCategories': True, 'enableExploration': True},
                 'tone': 'informative',
                 'style': 'exploratory',
                 'priority_info': ['product_story', 'craftsmanship_details', 'related_products']
             },
             EmotionalState.CONTEMPLATIVE: {
-                'products': ['sustainable_bamboo_toothbrush', 'artisan_ceramic_mug'],
                 'ui': {'showDetails': True, 'enableComparison': True, 'emphasizeQuality': True},
                 'tone': 'thoughtful',
                 'style': 'patient',
                 'priority_info': ['detailed_specifications', 'sustainability_info', 'long_term_value']
             },
             EmotionalState.EXCITED: {
-                'products': ['minimalist_leather_wallet', 'sustainable_bamboo_toothbrush'],
                 'ui': {'emphasizeCTA': True, 'showRelated': True, 'highlightBenefits': True},
                 'tone': 'enthusiastic',
                 'style': 'responsive',
                 'priority_info': ['key_benefits', 'immediate_value', 'purchase_incentives']
             },
             EmotionalState.FRUSTRATED: {
-                'products': ['artisan_ceramic_mug'],
                 'ui': {'simplifyNav': True, 'highlightSearch': True, 'showSupport': True},
                 'tone': 'supportive',
                 'style': 'helpful',
                 'priority_info': ['clear_navigation', 'search_assistance', 'customer_support']
             },
             EmotionalState.HESITANT: {
-                'products': ['artisan_ceramic_mug', 'sustainable_bamboo_toothbrush'],
                 'ui': {'showReviews': True, 'emphasizeGuarantees': True, 'provideReassurance': True},
                 'tone': 'reassuring',
                 'style': 'supportive',
                 'priority_info': ['customer_reviews', 'return_policy', 'quality_guarantees']
             },
             EmotionalState.CONFIDENT: {
-                'products': ['minimalist_leather_wallet', 'artisan_ceramic_mug'],
                 'ui': {'streamlineCheckout': True, 'showPremiumOptions': True, 'emphasizeExclusivity': True},
                 'tone': 'professional',
                 'style': 'efficient',
@@ -792,7 +763,29 @@ class EnhancedEmotionalResonanceAI:
             }
         }
         
-        return personalizations.get(primary_state, personalizations[EmotionalState.CURIOUS])
+        products = self._recommend_base_products(primary_state, intensity, profile)
+        return dict(personalizations.get(primary_state, personalizations[EmotionalState.CURIOUS]), products=products)
+
+    def _recommend_base_products(self, primary_state: EmotionalState, intensity: Optional[EmotionalIntensity],
+                                 profile: Optional[EmotionalProfile]) -> List[str]:
+        """Products for a profile, from its embedding match when enabled, else the primary state's posting list"""
+        intensity_value = intensity.value if intensity is not None else None
+        if self.use_embeddings and profile is not None:
+            from product_embeddings import profile_query, query_key
+            query = profile_query(profile)
+            products = self.recommendation_cache.get(
+                query_key(query), intensity_value, ('embeddings', self.catalog_index.version),
+                lambda: [sku for sku, _ in self.product_embeddings.top_k_batch([query], 2)[0]])
+            if products:
+                return products
+        # Products are shared by every session in the same state, intensity and catalog version
+        return self.recommendation_cache.get(primary_state.value, intensity_value, self.catalog_index.version,
+                                             lambda: self._rank_base_products(primary_state))
+
+    def _rank_base_products(self, primary_state: EmotionalState) -> List[str]:
+        """Best products from the catalog's per-state posting lists, falling back to curious"""
+        return (self.catalog_index.top_skus('states', primary_state.value, 2)
+                or self.catalog_index.top_skus('states', EmotionalState.CURIOUS.value, 2))
 
     def _generate_micro_adaptations(self, emotional_profile: EmotionalProfile) -> Dict[str, Any]:
         """Generate micro-adaptations based on detected micro-states"""
@@ -1021,7 +1014,7 @@ class EnhancedEmotionalResonanceAI:
         if not time_gaps:
             return 0.5
         
-        avg_gap = np.mean(time_gaps)
+        avg_gap = statistics.fmean(time_gaps)
         # Lower average gaps indicate higher continuity
         continuity = max(0.0, 1.0 - (avg_gap / 60))  # Normalize to 1 minute
         
@@ -6,14 +6,23 @@ to deliver truly personalized and delightful interactions.
 """
 
 import json
-import numpy as np
 import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
 from enum import Enum
 import math
 
+from behavioral_windows import WindowSignatureSeries, behavioral_scores, population_variance, product_flags
+from catalog_index import CatalogIndex, CatalogStore, get_catalog_store
+from model_config import ModelConfigStore, get_config_store
+from recommendation_cache import RecommendationCache, get_recommendation_cache
+from target_features import target_features
+
+if TYPE_CHECKING:
+    from pattern_learning import PatternLearner
+    from product_embeddings import ProductEmbeddings
+
 class EmotionalState(Enum):
     """Emotional states that can be inferred from user behavior"""
     EXCITED = "excited"
@@ -71,71 +80,85 @@ class EmotionalResonanceAI:
     to deliver prescient personalization.
     """
     
-    def __init__(self):
+    def __init__(self, config_store: Optional[ModelConfigStore] = None,
+                 catalog_index: Optional[CatalogIndex] = None,
+                 recommendation_cache: Optional[RecommendationCache] = None,
+                 pattern_learner: Optional['PatternLearner'] = None,
+                 stability_series: Optional[WindowSignatureSeries] = None,
+                 use_embeddings: bool = False):
         self.interaction_history: List[UserInteraction] = []
+        # Window signatures for stability; sets the history and windows (about the last 20, in 4 windows of 20 // 3)
+        self.stability_series = stability_series or WindowSignatureSeries()
+        self.config_store = config_store or get_config_store()
+        # A private catalog index, or the shared one, rebuilt when its file changes
+        self._catalog_index = catalog_index
+        self.catalog_store: Optional[CatalogStore] = get_catalog_store() if catalog_index is None else None
+        # Product lists per (emotion, catalog version); a private cache for a private catalog
+        self.recommendation_cache = recommendation_cache or (
+            get_recommendation_cache('prototype') if catalog_index is None else RecommendationCache())
+        # Rank products by vector match to the whole profile (see product_embeddings); posting lists otherwise
+        self.use_embeddings = use_embeddings
+        self._embeddings: Optional['ProductEmbeddings'] = None
         self.emotional_patterns = self._initialize_emotional_patterns()
-        self.product_emotional_mapping = self._initialize_product_mapping()
         self.learning_rate = 0.1
+        # Online learning: shared weights updated from outcomes, picked up on each inference
+        self.pattern_learner: Optional['PatternLearner'] = None
+        self._patterns_version: Optional[int] = None
+        self._last_observation: Optional[Tuple[Dict[str, float], str]] = None
+        if pattern_learner is not None:
+            self.enable_online_learning(pattern_learner)
+
+    @property
+    def catalog_index(self) -> CatalogIndex:
+        """Current catalog index; replaced wholesale when the shared catalog file is reloaded"""
+        return self._catalog_index if self._catalog_index is not None else self.catalog_store.current
+
+    @property
+    def product_embeddings(self) -> 'ProductEmbeddings':
+        """Embeddings of the current catalog: the shared ones, or our own for a private index"""
+        from product_embeddings import ProductEmbeddings, get_product_embeddings
+        if self._catalog_index is None:
+            return get_product_embeddings(self.catalog_store.path)
+        if self._embeddings is None or self._embeddings.catalog is not self._catalog_index:
+            self._embeddings = ProductEmbeddings(self._catalog_index)
+        return self._embeddings
         
     def _initialize_emotional_patterns(self) -> Dict[str, Dict]:
-        """Initialize behavioral patterns that indicate different emotional states"""
-        return {
-            EmotionalState.EXCITED.value: {
-                "quick_clicks": 0.8,
-                "short_hover_times": 0.7,
-                "rapid_scrolling": 0.9,
-                "multiple_product_views": 0.8,
-                "cart_additions": 0.9
-            },
-            EmotionalState.CURIOUS.value: {
-                "long_hover_times": 0.8,
-                "detailed_product_views": 0.9,
-                "story_reading": 0.9,
-                "category_exploration": 0.7,
-                "search_variations": 0.6
-            },
-            EmotionalState.CONTEMPLATIVE.value: {
-                "long_page_durations": 0.9,
-                "repeated_visits": 0.8,
-                "comparison_behavior": 0.8,
-                "wishlist_additions": 0.7,
-                "slow_scrolling": 0.6
-            },
-            EmotionalState.FRUSTRATED.value: {
-                "rapid_back_navigation": 0.9,
-                "search_refinements": 0.8,
-                "cart_abandonments": 0.7,
-                "short_session_duration": 0.6,
-                "erratic_clicking": 0.8
-            },
-            EmotionalState.DELIGHTED.value: {
-                "extended_engagement": 0.9,
-                "social_sharing": 0.8,
-                "review_reading": 0.7,
-                "immediate_purchases": 0.8,
-                "return_visits": 0.9
-            }
-        }
-    
-    def _initialize_product_mapping(self) -> Dict[str, Dict]:
-        """Initialize mapping between products and their emotional resonance"""
-        return {
-            "artisan_ceramic_mug": {
-                "primary_emotions": [EmotionalState.CONTEMPLATIVE, EmotionalState.RELAXED],
-                "aspirational_themes": ["mindfulness", "craftsmanship", "slow_living"],
-                "personality_fit": ["introspective", "quality_focused", "mindful"]
-            },
-            "minimalist_leather_wallet": {
-                "primary_emotions": [EmotionalState.FOCUSED, EmotionalState.INSPIRED],
-                "aspirational_themes": ["minimalism", "functionality", "sophistication"],
-                "personality_fit": ["organized", "design_conscious", "practical"]
-            },
-            "sustainable_bamboo_toothbrush": {
-                "primary_emotions": [EmotionalState.INSPIRED, EmotionalState.FOCUSED],
-                "aspirational_themes": ["sustainability", "health", "environmental_consciousness"],
-                "personality_fit": ["eco_conscious", "health_focused", "values_driven"]
-            }
-        }
+        """Copy the behavioral pattern weights for each emotional state out of the model config"""
+        patterns = self.config_store.current.prototype['emotional_patterns']
+        return {emotion: dict(weights) for emotion, weights in patterns.items()}
+    
+    def enable_online_learning(self, learner: Optional['PatternLearner'] = None) -> 'PatternLearner':
+        """Learn emotional_patterns from outcomes, with a learner of our own at self.learning_rate unless one is shared"""
+        if learner is None:
+            from pattern_learning import PatternLearner
+            learner = PatternLearner(self.emotional_patterns, learning_rate=self.learning_rate)
+        self.pattern_learner = learner
+        self._sync_patterns()
+        return learner
+    
+    def _sync_patterns(self) -> None:
+        weights = self.pattern_learner.current
+        if weights.version != self._patterns_version:
+            self.emotional_patterns = weights.as_patterns()
+            self._patterns_version = weights.version
+    
+    def record_outcome(self, outcome: str, label: Optional[EmotionalState] = None) -> None:
+        """
+        Learn from what followed the latest inference: 'purchase', 'abandonment',
+        or 'feedback' with the emotion the user reported as label
+        """
+        if self.pattern_learner is None:
+            raise RuntimeError("online learning is not enabled; call enable_online_learning() first")
+        if self._last_observation is None:
+            return
+        behavioral_scores, inferred = self._last_observation
+        self.pattern_learner.observe(behavioral_scores, inferred, outcome, label.value if label is not None else None)
+
+    def flush_learning(self) -> None:
+        """Train on and merge every outcome still buffered by the learner's workers, e.g. at shutdown"""
+        if self.pattern_learner is not None:
+            self.pattern_learner.flush_all()
     
     def process_interaction(self, interaction: UserInteraction) -> None:
         """Process a new user interaction and update the emotional understanding"""
@@ -172,6 +195,8 @@ class EmotionalResonanceAI:
         behavioral_scores = self._calculate_behavioral_scores(recent_interactions)
         
         # Map behavioral scores to emotional states
+        if self.pattern_learner is not None:
+            self._sync_patterns()
         emotional_scores = {}
         for emotion, patterns in self.emotional_patterns.items():
             score = 0
@@ -184,6 +209,7 @@ class EmotionalResonanceAI:
         sorted_emotions = sorted(emotional_scores.items(), key=lambda x: x[1], reverse=True)
         primary_emotion = EmotionalState(sorted_emotions[0][0])
         secondary_emotion = EmotionalState(sorted_emotions[1][0]) if len(sorted_emotions) > 1 else primary_emotion
+        self._last_observation = (behavioral_scores, primary_emotion.value)
         
         # Calculate confidence based on the difference between top emotions
         confidence = min(1.0, (sorted_emotions[0][1] - sorted_emotions[1][1]) + 0.5) if len(sorted_emotions) > 1 else 0.7
@@ -204,57 +230,8 @@ class EmotionalResonanceAI:
     
     def _calculate_behavioral_scores(self, interactions: List[UserInteraction]) -> Dict[str, float]:
         """Calculate behavioral indicator scores from interactions"""
-        if not interactions:
-            return {}
-        
-        scores = {}
-        
-        # Analyze click patterns
-        click_interactions = [i for i in interactions if i.action == "click"]
-        if click_interactions:
-            avg_click_interval = np.mean([
-                (click_interactions[i+1].timestamp - click_interactions[i].timestamp).total_seconds()
-                for i in range(len(click_interactions)-1)
-            ]) if len(click_interactions) > 1 else 5.0
-            
-            scores["quick_clicks"] = max(0, 1 - (avg_click_interval / 10))  # Normalize to 0-1
-            scores["erratic_clicking"] = 1 if avg_click_interval < 1 else 0
-        
-        # Analyze hover patterns
-        hover_interactions = [i for i in interactions if i.action == "hover"]
-        if hover_interactions:
-            avg_hover_duration = np.mean([i.duration for i in hover_interactions])
-            scores["long_hover_times"] = min(1, avg_hover_duration / 5)  # Normalize
-            scores["short_hover_times"] = max(0, 1 - (avg_hover_duration / 2))
-        
-        # Analyze scrolling behavior
-        scroll_interactions = [i for i in interactions if i.action == "scroll"]
-        if scroll_interactions:
-            avg_scroll_speed = np.mean([
-                i.context.get("scroll_speed", 1) for i in scroll_interactions
-            ])
-            scores["rapid_scrolling"] = min(1, avg_scroll_speed / 3)
-            scores["slow_scrolling"] = max(0, 1 - (avg_scroll_speed / 1.5))
-        
-        # Analyze page duration
-        page_views = [i for i in interactions if i.action == "view"]
-        if page_views:
-            avg_page_duration = np.mean([i.duration for i in page_views])
-            scores["long_page_durations"] = min(1, avg_page_duration / 60)  # Normalize to minutes
-            scores["short_session_duration"] = max(0, 1 - (avg_page_duration / 30))
-        
-        # Analyze product engagement
-        product_views = [i for i in interactions if "product" in i.target]
-        scores["multiple_product_views"] = min(1, len(set(i.target for i in product_views)) / 5)
-        scores["detailed_product_views"] = len([i for i in product_views if i.duration > 30]) / max(1, len(product_views))
-        
-        # Analyze specific actions
-        scores["cart_additions"] = len([i for i in interactions if i.action == "add_to_cart"]) / max(1, len(interactions))
-        scores["cart_abandonments"] = len([i for i in interactions if i.action == "remove_from_cart"]) / max(1, len(interactions))
-        scores["wishlist_additions"] = len([i for i in interactions if i.action == "add_to_wishlist"]) / max(1, len(interactions))
-        scores["search_refinements"] = len([i for i in interactions if i.action == "search"]) / max(1, len(interactions))
-        
-        return scores
+        features = target_features(self.config_store.current)
+        return behavioral_scores(interactions, product_flags(interactions, features))
     
     def _identify_emotional_triggers(self, interactions: List[UserInteraction], emotion: EmotionalState) -> List[str]:
         """Identify what triggered the current emotional state"""
@@ -277,7 +254,8 @@ class EmotionalResonanceAI:
                 triggers.append("product_discovery")
         
         elif emotion == EmotionalState.CONTEMPLATIVE:
-            if any("product" in target for target in recent_targets):
+            features = target_features(self.config_store.current)
+            if features.union_mask(recent_targets) & features.bits["product"]:
                 triggers.append("product_consideration")
             if "add_to_wishlist" in recent_actions:
                 triggers.append("future_planning")
@@ -289,39 +267,18 @@ class EmotionalResonanceAI:
         if len(self.interaction_history) < 10:
             return 0.5  # Default stability for insufficient data
         
-        # Use a simpler approach to avoid infinite recursion
-        # Analyze the consistency of behavioral patterns over time
-        recent_interactions = self.interaction_history[-20:]  # Use last 20 interactions
-        
-        # Group interactions by time windows
-        time_windows = []
-        window_size = len(recent_interactions) // 3  # Divide into 3 windows
+        # Analyze the consistency of behavioral patterns over time: one signature
+        # (sum of behavioral scores) per window of recent interactions, kept across calls
+        window_scores = self.stability_series.signatures(
+            self.interaction_history, target_features(self.config_store.current))
         
-        for i in range(0, len(recent_interactions), window_size):
-            window = recent_interactions[i:i+window_size]
-            if window:
-                time_windows.append(window)
-        
-        if len(time_windows) < 2:
+        if len(window_scores) < 2:
             return 0.5
         
-        # Calculate behavioral consistency across windows
-        window_scores = []
-        for window in time_windows:
-            scores = self._calculate_behavioral_scores(window)
-            # Create a simple signature of the behavioral pattern
-            signature = sum(scores.values()) if scores else 0
-            window_scores.append(signature)
-        
         # Calculate variance in behavioral patterns
-        if len(window_scores) > 1:
-            variance = np.var(window_scores)
-            # Convert variance to stability (lower variance = higher stability)
-            stability = max(0.1, 1.0 - min(1.0, variance))
-        else:
-            stability = 0.5
-        
-        return stability
+        variance = population_variance(window_scores)
+        # Convert variance to stability (lower variance = higher stability)
+        return max(0.1, 1.0 - min(1.0, variance))
     
     def generate_personalization_insights(self, emotional_profile: EmotionalProfile) -> PersonalizationInsight:
         """
@@ -331,7 +288,7 @@ class EmotionalResonanceAI:
         confidence = emotional_profile.confidence
         
         # Recommend products based on emotional state
-        recommended_products = self._recommend_products_for_emotion(primary_emotion)
+        recommended_products = self._recommend_products_for_emotion(primary_emotion, emotional_profile)
         
         # Adapt UI based on emotional state
         ui_adaptations = self._generate_ui_adaptations(primary_emotion, confidence)
@@ -353,13 +310,23 @@ class EmotionalResonanceAI:
             priority_information=priority_information
         )
     
-    def _recommend_products_for_emotion(self, emotion: EmotionalState) -> List[str]:
+    def _recommend_products_for_emotion(self, emotion: EmotionalState,
+                                        profile: Optional[EmotionalProfile] = None) -> List[str]:
         """Recommend products that resonate with the user's current emotional state"""
-        recommendations = []
-        
-        for product_id, product_data in self.product_emotional_mapping.items():
-            if emotion in product_data["primary_emotions"]:
-                recommendations.append(product_id)
+        if self.use_embeddings and profile is not None:
+            from product_embeddings import profile_query, query_key
+            query = profile_query(profile)
+            products = self.recommendation_cache.get(
+                query_key(query), None, ('embeddings', self.catalog_index.version),
+                lambda: [sku for sku, _ in self.product_embeddings.top_k_batch([query], 3)[0]])
+            if products:
+                return products
+        return self.recommendation_cache.get(emotion.value, None, self.catalog_index.version,
+                                             lambda: self._rank_products_for_emotion(emotion))
+    
+    def _rank_products_for_emotion(self, emotion: EmotionalState) -> List[str]:
+        """Rank catalog products for an emotion, falling back to compatible emotions"""
+        recommendations = self.catalog_index.top_skus('emotions', emotion.value, 3)
         
         # If no direct matches, recommend based on emotional compatibility
         if not recommendations:
@@ -371,11 +338,12 @@ class EmotionalResonanceAI:
             }
             
             for compatible_emotion in compatible_emotions.get(emotion, []):
-                for product_id, product_data in self.product_emotional_mapping.items():
-                    if compatible_emotion in product_data["primary_emotions"]:
-                        recommendations.append(product_id)
+                if len(recommendations) == 3:
+                    break
+                recommendations.extend(self.catalog_index.top_skus(
+                    'emotions', compatible_emotion.value, 3 - len(recommendations), exclude=recommendations))
         
-        return recommendations[:3]  # Return top 3 recommendations
+        return recommendations  # Top 3 recommendations
     
     def _generate_ui_adaptations(self, emotion: EmotionalState, confidence: float) -> Dict[str, Any]:
         """Generate UI adaptations based on emotional state"""
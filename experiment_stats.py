@@ -0,0 +1,419 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Experiment Statistics
+=================================
+Significance tests and confidence intervals for quality-level comparisons.
+
+welch_t_test works from streaming ColumnSummary moments, so it never needs
+the rows. mann_whitney_u counts pairs by binary search between the two
+sorted samples, with tie correction; mann_whitney_counts does the same from
+histograms over shared bins. bootstrap_mean_difference draws
+resamples as NumPy matrices in chunks spread over worker processes:
+  - small samples use index matrices (rows = resamples) over the data;
+  - large samples use the Bag of Little Bootstraps. Poisson count
+    matrices over small subsamples stand in for full n-row resamples, and
+    the averaged percentile offsets are centred on the full-sample
+    estimate. The cost does not grow with n, so a 10M-row file takes seconds.
+compare_results loads whole columns only up to BLB_THRESHOLD rows. Above
+that it streams each file once more, holding only histograms and the BLB
+subsamples, so memory does not grow with the row count.
+The t and normal distributions are evaluated with the math module (regularized
+incomplete beta via continued fractions), so SciPy is not needed.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from results_io import (DEFAULT_CHUNK_ROWS, RESULT_COLUMNS, RESULT_DTYPE, ColumnSummary, iter_result_chunks,
+                        open_results, summarize_results)
+
+# Above this many rows per sample the bootstrap switches to Bag of Little Bootstraps
+BLB_THRESHOLD = 200_000
+# Elements per resampling matrix, bounding the memory of each chunk
+MATRIX_BUDGET = 1 << 22
+# Below this many resampled draws (about a quarter second of work) a process pool
+# costs more to start and feed than it saves, so workers defaults to 1
+PARALLEL_MIN_DRAWS = 10_000_000
+# Shared histogram bins for the streaming Mann-Whitney test. Integer columns
+# whose range fits get one bin per value, which makes the test exact; other
+# columns count pairs within a bin as ties
+HISTOGRAM_BINS = 1 << 16
+
+
+@dataclass
+class TestResult:
+    """Outcome of a two-sample test"""
+    statistic: float
+    p_value: float
+    effect: float  # mean difference for t, P(a > b) for Mann-Whitney
+    detail: Dict[str, float]
+
+
+@dataclass
+class ConfidenceInterval:
+    """Bootstrap interval for mean(a) - mean(b)"""
+    estimate: float
+    lower: float
+    upper: float
+    confidence: float
+    method: str
+    resamples: int
+
+    def excludes_zero(self) -> bool:
+        return self.lower > 0 or self.upper < 0
+
+
+def _betacf(a: float, b: float, x: float, max_iterations: int = 300, epsilon: float = 1e-14) -> float:
+    """Continued fraction for the incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, max_iterations + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < epsilon:
+            break
+    return h
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    """I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = (math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                 + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _betacf(b, a, 1.0 - x) / b
+
+
+def normal_two_sided_p(z: float) -> float:
+    return math.erfc(abs(z) / math.sqrt(2.0))
+
+
+def t_two_sided_p(t: float, df: float) -> float:
+    """Two-sided p-value of Student's t with df degrees of freedom"""
+    if math.isnan(t) or math.isnan(df):
+        return float('nan')
+    if df > 1e6:
+        return normal_two_sided_p(t)
+    return regularized_incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+
+
+def welch_t_test(a: ColumnSummary, b: ColumnSummary) -> TestResult:
+    """Welch's unequal-variance t-test from streaming summaries; NaN when either sample has fewer than 2 rows"""
+    if a.count < 2 or b.count < 2:
+        difference = a.mean - b.mean if a.count and b.count else float('nan')
+        return TestResult(float('nan'), float('nan'), difference,
+                          {'df': float('nan'), 'standard_error': float('nan')})
+    var_a = a.m2 / (a.count - 1)
+    var_b = b.m2 / (b.count - 1)
+    se_a, se_b = var_a / a.count, var_b / b.count
+    standard_error = math.sqrt(se_a + se_b)
+    difference = a.mean - b.mean
+    if standard_error == 0:
+        return TestResult(math.copysign(math.inf, difference) if difference else float('nan'),
+                          0.0 if difference else 1.0,
+                          difference, {'df': float('nan'), 'standard_error': 0.0})
+    t = difference / standard_error
+    df = (se_a + se_b) ** 2 / (se_a ** 2 / (a.count - 1) + se_b ** 2 / (b.count - 1))
+    return TestResult(t, t_two_sided_p(t, df), difference, {'df': df, 'standard_error': standard_error})
+
+
+def mann_whitney_u(a: np.ndarray, b: np.ndarray) -> TestResult:
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction)"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n_a, n_b = a.size, b.size
+    n = n_a + n_b
+
+    # U counts pairs with a > b (ties count half): searchsorted of sorted a into sorted b
+    a_sorted = np.sort(a)
+    b_sorted = np.sort(b)
+    below = np.searchsorted(b_sorted, a_sorted, side='left')
+    at_or_below = np.searchsorted(b_sorted, a_sorted, side='right')
+    u_a = float(below.sum()) + 0.5 * float((at_or_below - below).sum())
+
+    # Tie groups of the pooled sample; merging two sorted runs is near-linear with a stable sort
+    pooled = np.sort(np.concatenate([a_sorted, b_sorted]), kind='stable')
+    boundaries = np.flatnonzero(np.diff(pooled)) + 1
+    counts = np.diff(np.concatenate(([0], boundaries, [n])))
+    return _mann_whitney_result(u_a, n_a, n_b, float(((counts.astype(np.float64) ** 3) - counts).sum()))
+
+
+def mann_whitney_counts(counts_a: np.ndarray, counts_b: np.ndarray) -> TestResult:
+    """
+    Mann-Whitney U from histograms of the two samples over the same bins.
+    Values sharing a bin count as ties, so this is exact when each bin holds
+    a single value (see HISTOGRAM_BINS).
+    """
+    counts_a = np.asarray(counts_a, dtype=np.float64)
+    counts_b = np.asarray(counts_b, dtype=np.float64)
+    n_a, n_b = int(counts_a.sum()), int(counts_b.sum())
+    below = np.cumsum(counts_b) - counts_b
+    u_a = float(counts_a @ below) + 0.5 * float(counts_a @ counts_b)
+    pooled = counts_a + counts_b
+    return _mann_whitney_result(u_a, n_a, n_b, float((pooled ** 3 - pooled).sum()))
+
+
+def _mann_whitney_result(u_a: float, n_a: int, n_b: int, tie_term: float) -> TestResult:
+    n = n_a + n_b
+    if n_a == 0 or n_b == 0:
+        return TestResult(u_a, float('nan'), float('nan'), {'z': float('nan'), 'n_a': n_a, 'n_b': n_b})
+    mean_u = n_a * n_b / 2.0
+    variance = n_a * n_b / 12.0 * ((n + 1) - tie_term / (n * (n - 1)))
+    z = (u_a - mean_u) / math.sqrt(variance) if variance > 0 else 0.0
+    return TestResult(u_a, normal_two_sided_p(z), u_a / (n_a * n_b), {'z': z, 'n_a': n_a, 'n_b': n_b})
+
+
+def _index_bootstrap_task(task: Tuple[np.ndarray, np.ndarray, int, int, int]) -> np.ndarray:
+    a, b, resamples, seed, chunk_index = task
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    rows = max(1, MATRIX_BUDGET // max(a.size, b.size))
+    differences = []
+    for start in range(0, resamples, rows):
+        size = min(rows, resamples - start)
+        mean_a = a[rng.integers(0, a.size, (size, a.size))].mean(axis=1)
+        mean_b = b[rng.integers(0, b.size, (size, b.size))].mean(axis=1)
+        differences.append(mean_a - mean_b)
+    return np.concatenate(differences)
+
+
+def _little_bootstrap_task(task: Tuple[np.ndarray, np.ndarray, int, int, int, int, float]) -> Tuple[float, float]:
+    subset_a, subset_b, n_a, n_b, resamples, seed, alpha = task
+    rng = np.random.default_rng(seed)
+    differences = []
+    rows = max(1, MATRIX_BUDGET // max(subset_a.size, subset_b.size))
+    for start in range(0, resamples, rows):
+        size = min(rows, resamples - start)
+        # Each row of counts is a (Poisson-approximated) n-point resample of the b-point subsample;
+        # independent Poisson draws are much cheaper than one multinomial per row
+        counts_a = rng.poisson(n_a / subset_a.size, (size, subset_a.size)).astype(np.float64)
+        counts_b = rng.poisson(n_b / subset_b.size, (size, subset_b.size)).astype(np.float64)
+        differences.append(counts_a @ subset_a / counts_a.sum(axis=1) - counts_b @ subset_b / counts_b.sum(axis=1))
+    # Spread around this subsample's own estimate; the caller re-centres it on the full-sample estimate
+    centre = subset_a.mean() - subset_b.mean()
+    lower, upper = np.quantile(np.concatenate(differences) - centre, [alpha / 2.0, 1.0 - alpha / 2.0])
+    return float(lower), float(upper)
+
+
+def _default_workers(draws: int) -> int:
+    return (os.cpu_count() or 1) if draws >= PARALLEL_MIN_DRAWS else 1
+
+
+def _run_tasks(function, tasks: List[tuple], workers: int) -> list:
+    if workers <= 1 or len(tasks) == 1:
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(function, tasks))
+
+
+def bootstrap_mean_difference(a: np.ndarray, b: np.ndarray, resamples: int = 1000, confidence: float = 0.95,
+                              seed: Optional[int] = None, workers: Optional[int] = None,
+                              method: str = 'auto', subsets: int = 16, subset_exponent: float = 0.6
+                              ) -> ConfidenceInterval:
+    """
+    Percentile bootstrap CI for mean(a) - mean(b).
+    method: 'index' (full resamples), 'blb' (Bag of Little Bootstraps) or
+    'auto' (blb above BLB_THRESHOLD rows). workers defaults to every CPU
+    when there are at least PARALLEL_MIN_DRAWS draws to make, else to 1.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    seed = seed if seed is not None else int(np.random.SeedSequence().entropy)
+    alpha = 1.0 - confidence
+    estimate = float(a.mean() - b.mean())
+    if method == 'auto':
+        method = 'blb' if max(a.size, b.size) > BLB_THRESHOLD else 'index'
+
+    if method == 'index':
+        if workers is None:
+            workers = _default_workers(resamples * (a.size + b.size))
+        chunk_count = max(1, min(workers, resamples))
+        shares = [resamples // chunk_count + (index < resamples % chunk_count) for index in range(chunk_count)]
+        tasks = [(a, b, share, seed, index) for index, share in enumerate(shares) if share]
+        differences = np.concatenate(_run_tasks(_index_bootstrap_task, tasks, workers))
+        lower, upper = np.quantile(differences, [alpha / 2.0, 1.0 - alpha / 2.0])
+        return ConfidenceInterval(estimate, float(lower), float(upper), confidence, method, resamples)
+
+    if method != 'blb':
+        raise ValueError("method must be 'auto', 'index' or 'blb'")
+
+    # Subsamples are drawn here, so workers only ever receive b-point arrays
+    plan = _blb_plan(a.size, b.size, subsets, subset_exponent, seed)
+    return _blb_interval([(a[index_a], b[index_b], task_seed) for index_a, index_b, task_seed in plan],
+                         a.size, b.size, estimate, resamples, confidence, workers)
+
+
+def _blb_plan(n_a: int, n_b: int, subsets: int, subset_exponent: float,
+              seed: int) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+    """Row indices of each BLB subsample of a and b, plus the seed of its resampling task"""
+    size_a = min(n_a, max(2, int(n_a ** subset_exponent)))
+    size_b = min(n_b, max(2, int(n_b ** subset_exponent)))
+    rng = np.random.default_rng(seed)
+    plan = []
+    for _ in range(subsets):
+        index_a = rng.choice(n_a, size_a, replace=False)
+        index_b = rng.choice(n_b, size_b, replace=False)
+        plan.append((index_a, index_b, int(rng.integers(2 ** 63))))
+    return plan
+
+
+def _blb_interval(subsamples: List[Tuple[np.ndarray, np.ndarray, int]], n_a: int, n_b: int, estimate: float,
+                  resamples: int, confidence: float, workers: Optional[int]) -> ConfidenceInterval:
+    per_subset = resamples // len(subsamples) or 1
+    if workers is None:
+        subset_a, subset_b, _ = subsamples[0]
+        workers = _default_workers(per_subset * len(subsamples) * (subset_a.size + subset_b.size))
+    tasks = [(subset_a, subset_b, n_a, n_b, per_subset, task_seed, 1.0 - confidence)
+             for subset_a, subset_b, task_seed in subsamples]
+    offsets = np.array(_run_tasks(_little_bootstrap_task, tasks, workers))
+    return ConfidenceInterval(estimate, estimate + float(offsets[:, 0].mean()), estimate + float(offsets[:, 1].mean()),
+                              confidence, 'blb', per_subset * len(subsamples))
+
+
+def load_columns(path: str, columns: Sequence[str] = RESULT_COLUMNS) -> Dict[str, np.ndarray]:
+    """Result columns as arrays; .npy files are memory-mapped rather than read"""
+    if path.endswith('.npy'):
+        results = open_results(path)
+        return {name: results[name] for name in columns}
+    chunks = list(iter_result_chunks(path))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in columns}
+
+
+def _histogram_bins(a: ColumnSummary, b: ColumnSummary, integral: bool) -> Tuple[float, float, int]:
+    """Lowest edge, width and count of bins shared by both samples of a column"""
+    low = min(a.min_value, b.min_value)
+    span = max(a.max_value, b.max_value) - low
+    if integral and span < HISTOGRAM_BINS:
+        return low, 1.0, int(span) + 1
+    return low, span / HISTOGRAM_BINS or 1.0, HISTOGRAM_BINS
+
+
+def scan_results(path: str, bins: Dict[str, Tuple[float, float, int]], indices: np.ndarray,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    One pass over a results file: per-column counts over (low, width, count)
+    bins, and the rows at the given sorted, unique positions.
+    """
+    counts = {name: np.zeros(count, dtype=np.int64) for name, (_, _, count) in bins.items()}
+    gathered = [np.empty(0, dtype=RESULT_DTYPE)]
+    start = 0
+    for chunk in iter_result_chunks(path, chunk_rows):
+        for name, (low, width, count) in bins.items():
+            index = ((np.asarray(chunk[name], dtype=np.float64) - low) / width).astype(np.int64)
+            counts[name] += np.bincount(np.clip(index, 0, count - 1), minlength=count)
+        end = start + len(chunk)
+        first, last = np.searchsorted(indices, [start, end])
+        gathered.append(chunk[indices[first:last] - start])
+        start = end
+    return counts, np.concatenate(gathered)
+
+
+def compare_results(path_a: str, path_b: str, resamples: int = 1000, confidence: float = 0.95,
+                    seed: Optional[int] = 0, workers: Optional[int] = None,
+                    summaries_a: Optional[Dict[str, ColumnSummary]] = None,
+                    summaries_b: Optional[Dict[str, ColumnSummary]] = None,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, subsets: int = 16,
+                    subset_exponent: float = 0.6) -> Dict[str, Dict[str, object]]:
+    """
+    Welch t, Mann-Whitney and a bootstrap CI of the mean difference for every
+    result column. Pass summaries already computed by summarize_results to skip
+    recomputing them. workers=None lets each bootstrap size its own pool.
+    Files up to BLB_THRESHOLD rows are tested in memory; larger ones are
+    streamed, with Mann-Whitney from histograms and the Bag of Little
+    Bootstraps over subsamples gathered from the files.
+    """
+    summaries_a = summaries_a or summarize_results(path_a, chunk_rows)
+    summaries_b = summaries_b or summarize_results(path_b, chunk_rows)
+    n_a, n_b = summaries_a[RESULT_COLUMNS[0]].count, summaries_b[RESULT_COLUMNS[0]].count
+
+    if max(n_a, n_b) <= BLB_THRESHOLD:
+        columns_a = load_columns(path_a)
+        columns_b = load_columns(path_b)
+        return {name: {
+            'welch': welch_t_test(summaries_a[name], summaries_b[name]),
+            'mann_whitney': mann_whitney_u(columns_a[name], columns_b[name]),
+            'bootstrap': bootstrap_mean_difference(columns_a[name], columns_b[name], resamples, confidence,
+                                                   seed=seed, workers=workers, subsets=subsets,
+                                                   subset_exponent=subset_exponent),
+        } for name in RESULT_COLUMNS}
+
+    bins = {name: _histogram_bins(summaries_a[name], summaries_b[name], RESULT_DTYPE[name].kind in 'iu')
+            for name in RESULT_COLUMNS}
+    seed = seed if seed is not None else int(np.random.SeedSequence().entropy)
+    plan = _blb_plan(n_a, n_b, subsets, subset_exponent, seed)
+    # Every subsample row of a file is fetched in the same pass as its histograms
+    scanned = []
+    for side, path in enumerate((path_a, path_b)):
+        wanted = np.unique(np.concatenate([step[side] for step in plan]))
+        counts, rows = scan_results(path, bins, wanted, chunk_rows)
+        scanned.append((counts, rows, [np.searchsorted(wanted, step[side]) for step in plan]))
+    (counts_a, rows_a, positions_a), (counts_b, rows_b, positions_b) = scanned
+
+    report = {}
+    for name in RESULT_COLUMNS:
+        values_a = rows_a[name].astype(np.float64)
+        values_b = rows_b[name].astype(np.float64)
+        subsamples = [(values_a[index_a], values_b[index_b], task_seed)
+                      for index_a, index_b, (_, _, task_seed) in zip(positions_a, positions_b, plan)]
+        estimate = summaries_a[name].mean - summaries_b[name].mean
+        report[name] = {
+            'welch': welch_t_test(summaries_a[name], summaries_b[name]),
+            'mann_whitney': mann_whitney_counts(counts_a[name], counts_b[name]),
+            'bootstrap': _blb_interval(subsamples, n_a, n_b, estimate, resamples, confidence, workers),
+        }
+    return report
+
+
+def format_report(report: Dict[str, Dict[str, object]]) -> str:
+    lines = []
+    for name, tests in report.items():
+        welch, mann_whitney, interval = tests['welch'], tests['mann_whitney'], tests['bootstrap']
+        lines.append(f"{name}:")
+        lines.append(f"  Welch t = {welch.statistic:.3f} (df {welch.detail['df']:.1f}), p = {welch.p_value:.3g}")
+        lines.append(f"  Mann-Whitney U = {mann_whitney.statistic:.0f}, p = {mann_whitney.p_value:.3g}, "
+                     f"P(a > b) = {mann_whitney.effect:.3f}")
+        lines.append(f"  Mean difference {interval.estimate:.4f}, {interval.confidence:.0%} CI "
+                     f"[{interval.lower:.4f}, {interval.upper:.4f}] ({interval.method}, {interval.resamples} resamples)")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    from quality_simulation import MonteCarloSimulator
+
+    directory = tempfile.mkdtemp()
+    rows = 10_000_000
+    simulation = MonteCarloSimulator(seed=7, workers=1).run(rows, output_dir=directory)
+
+    started = time.perf_counter()
+    report = compare_results(simulation.output_files['high'], simulation.output_files['low'])
+    print(format_report(report))
+    print(f"\nTests on {rows:,} rows per level in {time.perf_counter() - started:.1f}s")
+    for path in simulation.output_files.values():
+        os.remove(path)
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Micro-Batching Scheduler
+==========================================
+Buffers interaction events from many sessions for a few milliseconds (or
+until a batch fills up) and runs micro-state detection, intensity scoring
+and transition prediction for the whole batch as vectorized kernels.
+
+Each session keeps its own EnhancedEmotionalResonanceAI state; callers get a
+Future per event that resolves to the same PersonalizationInsight that
+track_enhanced_interaction would have returned. The batch limit adapts to
+the measured per-event service cost so that waiting plus scoring a full
+batch fits inside a configurable latency budget.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from er_ai_enhanced import (EmotionalIntensity, EmotionalState, EnhancedEmotionalResonanceAI,
+                            INTENSITY_CLASSIFIER, PersonalizationInsight, UserInteraction)
+from model_config import CompiledModelConfig, register_precompiled
+from target_features import micro_state_trigger_masks, target_features
+
+# Behavioral score columns feeding the intensity score, with their weights
+INTENSITY_FEATURES = (
+    ('impulsive_behavior', 0.3),
+    ('deep_consideration', 0.2),
+    ('confident_clicking', 0.2),
+    ('overwhelmed_scrolling', 0.3)
+)
+
+# Transition adjustments applied when an action appears in the last three interactions
+TRANSITION_ACTION_BOOSTS = (
+    ('search', EmotionalState.FRUSTRATED.value, 0.2),
+    ('add_to_cart', EmotionalState.CONFIDENT.value, 0.3)
+)
+
+_STOP = object()
+
+
+def _compile_micro_state_model(config: CompiledModelConfig) -> Dict[str, Any]:
+    """Indicator bounds for every micro-state as [state, indicator] matrices"""
+    patterns = config.enhanced['micro_state_patterns']
+    states = tuple(patterns.keys())
+    indicators: List[str] = []
+    for pattern in patterns.values():
+        indicators.extend(name for name in pattern['behavioral_indicators'] if name not in indicators)
+
+    lower = np.full((len(states), len(indicators)), np.inf)
+    upper = np.full((len(states), len(indicators)), np.inf)
+    for row, pattern in enumerate(patterns.values()):
+        for name, threshold in pattern['behavioral_indicators'].items():
+            column = indicators.index(name)
+            if isinstance(threshold, tuple):
+                lower[row, column], upper[row, column] = threshold
+            else:
+                lower[row, column] = threshold
+
+    for array in (lower, upper):
+        array.flags.writeable = False
+
+    return {
+        'states': states,
+        'detected_states': tuple(EmotionalState(state) for state in states),
+        'indicators': tuple(indicators),
+        'lower': lower,
+        'upper': upper
+    }
+
+
+register_precompiled('micro_state_model', _compile_micro_state_model)
+
+
+def detect_micro_states_batch(config: CompiledModelConfig, behavioral_scores: List[Dict[str, float]],
+                              recent_targets: List[List[str]]) -> List[List[EmotionalState]]:
+    """Vectorized EnhancedEmotionalResonanceAI._detect_micro_emotional_states over many sessions"""
+    model = config.derived('micro_state_model', _compile_micro_state_model)
+
+    # Missing indicators are NaN, which fails every bound comparison
+    scores = np.array([[row.get(name, np.nan) for name in model['indicators']] for row in behavioral_scores],
+                      dtype=np.float64).reshape(len(behavioral_scores), len(model['indicators']))
+    values = scores[:, None, :]
+    hits = (values >= model['lower']) & (values <= model['upper'])
+    indicator_score = hits.sum(axis=2) * 0.25
+
+    features = target_features(config)
+    trigger_masks = [micro_state_trigger_masks(config)[state] for state in model['states']]
+    trigger_matches = np.zeros_like(indicator_score)
+    for row, targets in enumerate(recent_targets):
+        recent_mask = features.union_mask(targets)
+        for column, trigger_mask in enumerate(trigger_masks):
+            trigger_matches[row, column] = (recent_mask & trigger_mask).bit_count()
+
+    detected = (indicator_score + trigger_matches * 0.2) >= 0.5
+
+    results = []
+    for row in detected:
+        states = [model['detected_states'][column] for column in np.flatnonzero(row)]
+        results.append(states if states else [EmotionalState.CURIOUS])
+    return results
+
+
+def calculate_intensity_batch(behavioral_scores: List[Dict[str, float]],
+                              recent_frequencies: List[Optional[int]]) -> List[EmotionalIntensity]:
+    """Vectorized EnhancedEmotionalResonanceAI._calculate_emotional_intensity over many sessions"""
+    features = np.array([[row.get(name, 0) for name, _ in INTENSITY_FEATURES] for row in behavioral_scores],
+                        dtype=np.float64).reshape(len(behavioral_scores), len(INTENSITY_FEATURES))
+
+    # Accumulate column by column so the float arithmetic matches the per-event path
+    intensity_score = np.zeros(len(behavioral_scores))
+    for column, (_, weight) in enumerate(INTENSITY_FEATURES):
+        intensity_score = intensity_score + features[:, column] * weight
+
+    frequencies = np.array([-1 if f is None else f for f in recent_frequencies], dtype=np.float64)
+    intensity_score = np.where(frequencies >= 0,
+                               intensity_score + np.minimum(0.4, frequencies * 0.1),
+                               intensity_score)
+
+    return INTENSITY_CLASSIFIER.labels_for(INTENSITY_CLASSIFIER.classify_many(intensity_score))
+
+
+def predict_transitions_batch(config: CompiledModelConfig, current_states: List[Optional[str]],
+                              recent_actions: List[List[str]]) -> List[Dict[str, float]]:
+    """Vectorized EnhancedEmotionalResonanceAI._predict_emotional_transitions over many sessions"""
+    index = config.transition_index
+    matrix = config.transition_matrix
+    transitions = config.enhanced['emotional_transitions']
+
+    rows = np.array([index.get(state, -1) if state is not None else -1 for state in current_states],
+                    dtype=np.intp)
+    probabilities = np.where((rows >= 0)[:, None], matrix[np.maximum(rows, 0)], 0.0)
+
+    boosted = np.zeros((len(current_states), len(TRANSITION_ACTION_BOOSTS)), dtype=bool)
+    for column, (action, target_state, boost) in enumerate(TRANSITION_ACTION_BOOSTS):
+        boosted[:, column] = [action in actions for actions in recent_actions]
+        probabilities[:, index[target_state]] += np.where(boosted[:, column], boost, 0.0)
+
+    totals = probabilities.sum(axis=1, keepdims=True)
+    probabilities = np.divide(probabilities, totals, out=probabilities, where=totals > 0)
+
+    results = []
+    for row, state in enumerate(current_states):
+        if state is None:
+            results.append({})
+            continue
+        # Same keys, in the same order, as the per-event dictionary path
+        keys = list(transitions.get(state, {}).keys())
+        for column, (_, target_state, _) in enumerate(TRANSITION_ACTION_BOOSTS):
+            if boosted[row, column] and target_state not in keys:
+                keys.append(target_state)
+        results.append({key: float(probabilities[row, index[key]]) for key in keys})
+    return results
+
+
+class _PendingEvent:
+    __slots__ = ('session_id', 'action', 'target', 'duration', 'context', 'kwargs',
+                 'interaction', 'future', 'enqueued_at')
+
+    def __init__(self, session_id: str, action: str, target: str, duration: float,
+                 context: Optional[Dict[str, Any]], kwargs: Dict[str, Any], future: Future, enqueued_at: float):
+        self.session_id = session_id
+        self.action = action
+        self.target = target
+        self.duration = duration
+        self.context = context
+        self.kwargs = kwargs
+        # Built on the worker from the session's engine, which only the worker touches
+        self.interaction: Optional[UserInteraction] = None
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class _CloseSession:
+    __slots__ = ('session_id',)
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+
+class MicroBatchScheduler:
+    """
+    Collects events for up to max_wait_ms or max_batch_size events and scores
+    them in vectorized batches. Events from the same session are applied in
+    arrival order, one per wave, because each depends on the previous profile.
+    """
+
+    def __init__(self, max_batch_size: int = 256, max_wait_ms: float = 5.0,
+                 latency_budget_ms: float = 50.0, min_batch_size: int = 8,
+                 engine_factory: Callable[[], EnhancedEmotionalResonanceAI] = EnhancedEmotionalResonanceAI):
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min(min_batch_size, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.latency_budget_ms = latency_budget_ms
+        self.engine_factory = engine_factory
+        self.engines: Dict[str, EnhancedEmotionalResonanceAI] = {}
+
+        # Adaptive batch limit, derived from the measured per-event service cost
+        self.batch_size = max_batch_size
+        self.cost_per_event_ms: Optional[float] = None
+        self.latencies_ms: Deque[float] = deque(maxlen=2048)
+        self.batch_sizes: Deque[int] = deque(maxlen=512)
+        self.events_processed = 0
+        self._started_at: Optional[float] = None
+
+        self._queue: 'queue.Queue[Any]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # Lifecycle
+    def start(self) -> 'MicroBatchScheduler':
+        with self._lock:
+            if self._worker is None:
+                self._started_at = time.perf_counter()
+                self._worker = threading.Thread(target=self._run, name='er-ai-micro-batcher', daemon=True)
+                self._worker.start()
+        return self
+
+    def close(self) -> None:
+        """Drain queued events and stop the worker"""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join()
+
+    def __enter__(self) -> 'MicroBatchScheduler':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Submission
+    def submit(self, session_id: str, action: str, target: str, duration: float = 1.0,
+               context: Dict[str, Any] = None, **kwargs) -> 'Future[PersonalizationInsight]':
+        """Queue one event; the returned future resolves to its PersonalizationInsight
+
+        The interaction is built on the worker thread, so signals that are not
+        supplied (including the timestamp) come from the session engine's clock
+        and rng when the event is scored.
+        """
+        if self._worker is None:
+            self.start()
+
+        future: Future = Future()
+        self._queue.put(_PendingEvent(session_id, action, target, duration, context, kwargs,
+                                      future, time.perf_counter()))
+        return future
+
+    def close_session(self, session_id: str) -> None:
+        """Forget a session's engine state once the events already submitted for it are scored"""
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(_CloseSession(session_id))
+                return
+        self.engines.pop(session_id, None)
+
+    def _engine_for(self, session_id: str) -> EnhancedEmotionalResonanceAI:
+        engine = self.engines.get(session_id)
+        if engine is None:
+            engine = self.engines.setdefault(session_id, self.engine_factory())
+        return engine
+
+    # Worker
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            if isinstance(first, _CloseSession):
+                self.engines.pop(first.session_id, None)
+                continue
+
+            batch = [first]
+            closing: Optional[_CloseSession] = None
+            deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    event = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                if isinstance(event, _CloseSession):
+                    # Score what came before the close, then drop the engine
+                    closing = event
+                    break
+                batch.append(event)
+
+            self.process_batch(batch)
+            if closing is not None:
+                self.engines.pop(closing.session_id, None)
+
+        # Drain anything submitted before close(), in order
+        leftovers: List[_PendingEvent] = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(event, _CloseSession):
+                if leftovers:
+                    self.process_batch(leftovers)
+                    leftovers = []
+                self.engines.pop(event.session_id, None)
+            elif event is not _STOP:
+                leftovers.append(event)
+        if leftovers:
+            self.process_batch(leftovers)
+
+    def process_batch(self, batch: List[_PendingEvent]) -> None:
+        """Score a batch of events wave by wave and resolve their futures"""
+        started = time.perf_counter()
+        waves: List[List[_PendingEvent]] = []
+        depth: Dict[str, int] = {}
+        for event in batch:
+            wave = depth.get(event.session_id, 0)
+            depth[event.session_id] = wave + 1
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(event)
+
+        for wave in waves:
+            try:
+                insights = self._process_wave(wave)
+            except Exception as error:  # Fail the wave's futures rather than the worker
+                for event in wave:
+                    if not event.future.done():
+                        event.future.set_exception(error)
+                continue
+
+            finished = time.perf_counter()
+            for event, insight in zip(wave, insights):
+                self.latencies_ms.append((finished - event.enqueued_at) * 1000.0)
+                event.future.set_result(insight)
+
+        self.events_processed += len(batch)
+        self.batch_sizes.append(len(batch))
+        self._adapt_batch_size(len(batch), (time.perf_counter() - started) * 1000.0)
+
+    def _process_wave(self, wave: List[_PendingEvent]) -> List[PersonalizationInsight]:
+        """
+        One event per session: per-session features, then the vectorized kernels.
+        Each engine's clock is read in the same order as track_enhanced_interaction
+        reads it. If the wave fails, every engine's history is rolled back.
+        """
+        engines = [self._engine_for(event.session_id) for event in wave]
+        marks = [(len(engine.interaction_history), len(engine.emotional_history)) for engine in engines]
+        try:
+            return self._score_wave(engines, wave)
+        except Exception:
+            for engine, (interactions, profiles) in zip(engines, marks):
+                del engine.interaction_history[interactions:]
+                del engine.emotional_history[profiles:]
+            raise
+
+    def _score_wave(self, engines: List[EnhancedEmotionalResonanceAI],
+                    wave: List[_PendingEvent]) -> List[PersonalizationInsight]:
+        config = engines[0].model_config
+
+        recent_windows, behavioral_scores, recent_targets, recent_actions = [], [], [], []
+        frequencies, current_states = [], []
+        for engine, event in zip(engines, wave):
+            event.interaction = engine._create_interaction(event.action, event.target, event.duration,
+                                                           event.context, session_id=event.session_id,
+                                                           **event.kwargs)
+            engine.interaction_history.append(event.interaction)
+            recent = engine.interaction_history[-10:]
+            recent_windows.append(recent)
+            behavioral_scores.append(engine._analyze_behavioral_patterns(recent))
+            recent_targets.append([i.target for i in recent[-3:]])
+            recent_actions.append([i.action for i in recent[-3:]])
+            # After behavioral scoring and only for 5+ interactions, as _calculate_emotional_intensity does
+            if len(recent) >= 5:
+                now = engine.clock()
+                frequencies.append(len([i for i in recent[-5:] if (now - i.timestamp).seconds < 60]))
+            else:
+                frequencies.append(None)
+            current_states.append(engine.emotional_history[-1].primary_state.value
+                                   if engine.emotional_history else None)
+
+        micro_states = detect_micro_states_batch(config, behavioral_scores, recent_targets)
+        intensities = calculate_intensity_batch(behavioral_scores, frequencies)
+        transitions = predict_transitions_batch(config, current_states, recent_actions)
+
+        insights = []
+        for row, engine in enumerate(engines):
+            profile = engine._assemble_emotional_profile(recent_windows[row], behavioral_scores[row],
+                                                         micro_states[row], intensities[row], transitions[row])
+            engine.emotional_history.append(profile)
+            insights.append(engine._generate_enhanced_personalization_insights(profile))
+        return insights
+
+    def _adapt_batch_size(self, batch_size: int, service_ms: float) -> None:
+        """Size batches so that max_wait_ms plus scoring a full batch stays within the budget"""
+        cost = service_ms / batch_size
+        self.cost_per_event_ms = cost if self.cost_per_event_ms is None else \
+            0.8 * self.cost_per_event_ms + 0.2 * cost
+        
+        headroom_ms = max(0.0, self.latency_budget_ms - self.max_wait_ms)
+        affordable = int(headroom_ms / max(self.cost_per_event_ms, 1e-6))
+        self.batch_size = max(self.min_batch_size, min(self.max_batch_size, affordable))
+
+    # Metrics
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        return float(np.percentile(np.fromiter(self.latencies_ms, dtype=np.float64), percentile))
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            'events_processed': self.events_processed,
+            'throughput_per_second': self.events_processed / elapsed if elapsed > 0 else 0.0,
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'current_batch_limit': self.batch_size,
+            'cost_per_event_ms': self.cost_per_event_ms or 0.0,
+            'p50_latency_ms': self.latency_percentile(50),
+            'p99_latency_ms': self.latency_percentile(99),
+            'active_sessions': len(self.engines)
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    actions = ['view', 'hover', 'scroll', 'click', 'search', 'add_to_cart', 'compare']
+    targets = ['product_page', 'price_comparison', 'review_reading', 'story_engagement', 'checkout']
+
+    for batch_limit in (1, 16, 256):
+        with MicroBatchScheduler(max_batch_size=batch_limit, max_wait_ms=2.0) as scheduler:
+            futures = [
+                scheduler.submit(f"session_{n % 200}", random.choice(actions), random.choice(targets),
+                                 duration=random.uniform(0.5, 12.0))
+                for n in range(5000)
+            ]
+            for future in futures:
+                future.result()
+            stats = scheduler.stats()
+        print(f"batch<= {batch_limit:3d}: {stats['throughput_per_second']:8.0f} events/s, "
+              f"mean batch {stats['mean_batch_size']:6.1f}, p99 {stats['p99_latency_ms']:7.1f}ms")
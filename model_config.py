@@ -0,0 +1,379 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Model Configuration
+=====================================
+Loads the model tables (transition probabilities, micro-state patterns,
+behavioral models, pattern templates, predictive models, emotional
+pattern weights) from an external JSON or TOML file.
+
+A loaded file is validated once and compiled into an immutable
+CompiledModelConfig (read-only mappings, tuples and, on first use,
+read-only NumPy arrays) that every engine instance shares. ModelConfigStore swaps in a
+new compiled config atomically on reload, so workers pick up tuning
+changes without a restart.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'er_ai_models.json')
+SUPPORTED_VERSIONS = (1,)
+
+REQUIRED_SECTIONS = {
+    'prototype': ('emotional_patterns',),
+    'enhanced': ('emotional_transitions', 'micro_state_patterns', 'behavioral_models', 'contextual_weights'),
+    'behavioral': ('dwell_time_models', 'scroll_velocity_models', 'interaction_sequence_models',
+                   'multi_session_models', 'pattern_templates', 'predictive_models')
+}
+
+
+class ModelConfigError(ValueError):
+    """Raised when a model configuration file fails validation"""
+
+
+logger = logging.getLogger(__name__)
+
+# Derived structures compiled on every load, before the new config is swapped in
+_precompiled: Dict[str, Callable[['CompiledModelConfig'], Any]] = {}
+
+
+def register_precompiled(name: str, builder: Callable[['CompiledModelConfig'], Any]) -> None:
+    """
+    Build config.derived(name, builder) as part of loading every config, so a
+    file that validates but cannot compile (e.g. overlapping ranges) is
+    rejected instead of breaking the engines on first use
+    """
+    _precompiled[name] = builder
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert parsed config data into immutable structures"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if value == 'inf':
+        return math.inf
+    if value == '-inf':
+        return -math.inf
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Convert frozen config data back into plain JSON-serializable structures"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, float) and math.isinf(value):
+        return 'inf' if value > 0 else '-inf'
+    return value
+
+
+class CompiledModelConfig:
+    """Validated, immutable model tables plus their array-backed forms"""
+
+    def __init__(self, raw: Dict[str, Any], source: str = '<memory>', generation: int = 0):
+        _validate(raw)
+        self.source = source
+        self.generation = generation
+        self.version = raw['version']
+
+        self.prototype: Mapping[str, Any] = _freeze(raw['prototype'])
+        self.enhanced: Mapping[str, Any] = _freeze(raw['enhanced'])
+        self.behavioral: Mapping[str, Any] = _freeze(raw['behavioral'])
+
+        # Row/column order of the dense transition matrix
+        transitions = self.enhanced['emotional_transitions']
+        states = list(transitions.keys())
+        for targets in transitions.values():
+            states.extend(state for state in targets if state not in states)
+        self.transition_states: Tuple[str, ...] = tuple(states)
+        self.transition_index: Mapping[str, int] = MappingProxyType(
+            {state: index for index, state in enumerate(states)}
+        )
+
+        self._derived: Dict[str, Any] = {}
+        self._derived_lock = threading.Lock()
+
+    @property
+    def transition_matrix(self) -> 'np.ndarray':
+        """Dense read-only transition matrix: row = current state, column = next state"""
+        return self.derived('transition_matrix', _compile_transition_matrix)
+
+    def derived(self, name: str, builder: Callable[['CompiledModelConfig'], Any]) -> Any:
+        """Build a derived structure once per compiled config and share it between engines"""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = builder(self)
+                    self._derived[name] = value
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-data form suitable for writing back out as JSON"""
+        return {
+            'version': self.version,
+            'prototype': _thaw(self.prototype),
+            'enhanced': _thaw(self.enhanced),
+            'behavioral': _thaw(self.behavioral)
+        }
+
+
+def _compile_transition_matrix(config: CompiledModelConfig) -> 'np.ndarray':
+    import numpy as np
+    size = len(config.transition_states)
+    matrix = np.zeros((size, size))
+    for source_state, targets in config.enhanced['emotional_transitions'].items():
+        for target_state, probability in targets.items():
+            matrix[config.transition_index[source_state], config.transition_index[target_state]] = probability
+    matrix.flags.writeable = False
+    return matrix
+
+
+def _validate(raw: Dict[str, Any]) -> None:
+    """Check structure and value ranges before anything is compiled"""
+    if not isinstance(raw, dict):
+        raise ModelConfigError("model config must be a mapping")
+    if raw.get('version') not in SUPPORTED_VERSIONS:
+        raise ModelConfigError(f"unsupported model config version: {raw.get('version')!r}")
+
+    for section, keys in REQUIRED_SECTIONS.items():
+        if not isinstance(raw.get(section), dict):
+            raise ModelConfigError(f"missing section '{section}'")
+        for key in keys:
+            if not isinstance(raw[section].get(key), dict):
+                raise ModelConfigError(f"missing table '{section}.{key}'")
+
+    for pattern, kind in LEAF_RULES:
+        _check_leaves(raw, pattern.split('.'), kind, ())
+
+    for state, targets in raw['enhanced']['emotional_transitions'].items():
+        total = sum(targets.values())
+        if targets and abs(total - 1.0) > 1e-6:
+            raise ModelConfigError(f"transition probabilities for '{state}' sum to {total:.4f}, expected 1")
+
+    for state, pattern in raw['enhanced']['micro_state_patterns'].items():
+        if not isinstance(pattern.get('behavioral_indicators'), dict) or not isinstance(pattern.get('triggers'), list):
+            raise ModelConfigError(f"micro-state pattern '{state}' needs behavioral_indicators and triggers")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def _is_range(value: Any) -> bool:
+    if not isinstance(value, list) or len(value) != 2:
+        return False
+    lower, upper = (math.inf if bound == 'inf' else bound for bound in value)
+    return _is_number(lower) and _is_number(upper) and lower <= upper
+
+
+def _is_strings(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+LEAF_KINDS: Dict[str, Tuple[Callable[[Any], bool], str]] = {
+    'number': (_is_number, "a number"),
+    'probability': (lambda value: _is_number(value) and 0.0 <= value <= 1.0, "a probability within [0, 1]"),
+    'range': (_is_range, "a [lower, upper] pair with lower <= upper"),
+    'number_or_range': (lambda value: _is_number(value) or _is_range(value), "a number or a [lower, upper] pair"),
+    'numbers': (lambda value: isinstance(value, list) and all(_is_number(item) for item in value), "a list of numbers"),
+    'flag_or_number': (lambda value: isinstance(value, bool) or _is_number(value), "a boolean or a number"),
+    'string': (lambda value: isinstance(value, str), "a string"),
+    'strings': (_is_strings, "a list of strings"),
+}
+
+# Leaf type of every table the engines read; '*' matches any key. Optional tables may be absent,
+# but everything on the way to a leaf must be a table.
+LEAF_RULES: Tuple[Tuple[str, str], ...] = (
+    ('prototype.emotional_patterns.*.*', 'number'),
+    ('enhanced.emotional_transitions.*.*', 'probability'),
+    ('enhanced.micro_state_patterns.*.behavioral_indicators.*', 'number_or_range'),
+    ('enhanced.micro_state_patterns.*.triggers', 'strings'),
+    ('enhanced.behavioral_models.dwell_time_analyzer.thresholds.*', 'range'),
+    ('enhanced.behavioral_models.scroll_velocity_analyzer.patterns.*', 'range'),
+    ('enhanced.behavioral_models.interaction_sequence_analyzer.patterns.*', 'strings'),
+    ('enhanced.behavioral_models.multi_session_tracker.continuity_factors.*', 'number'),
+    ('enhanced.contextual_weights.*', 'number'),
+    ('behavioral.dwell_time_models.micro_attention_patterns.*.range', 'range'),
+    ('behavioral.dwell_time_models.micro_attention_patterns.*.indicators', 'strings'),
+    ('behavioral.dwell_time_models.dwell_time_sequences.*', 'numbers'),
+    ('behavioral.dwell_time_models.contextual_adjustments.*', 'number'),
+    ('behavioral.scroll_velocity_models.velocity_patterns.*.velocity_range', 'range'),
+    ('behavioral.scroll_velocity_models.velocity_patterns.*.consistency', 'number'),
+    ('behavioral.scroll_velocity_models.velocity_patterns.*.indicators', 'strings'),
+    ('behavioral.scroll_velocity_models.scroll_direction_patterns.*.forward_ratio', 'number'),
+    ('behavioral.scroll_velocity_models.scroll_direction_patterns.*.indicators', 'strings'),
+    ('behavioral.scroll_velocity_models.velocity_transitions.*.*', 'numbers'),
+    ('behavioral.scroll_velocity_models.contextual_adjustments.*', 'number'),
+    ('behavioral.interaction_sequence_models.behavioral_sequences.*.pattern', 'strings'),
+    ('behavioral.interaction_sequence_models.behavioral_sequences.*.timing', 'numbers'),
+    ('behavioral.interaction_sequence_models.behavioral_sequences.*.indicators', 'strings'),
+    ('behavioral.interaction_sequence_models.micro_interaction_patterns.*.*', 'flag_or_number'),
+    ('behavioral.multi_session_models.session_progression_patterns.*.stages', 'strings'),
+    ('behavioral.multi_session_models.session_progression_patterns.*.typical_duration', 'numbers'),
+    ('behavioral.multi_session_models.session_progression_patterns.*.indicators', 'strings'),
+    ('behavioral.multi_session_models.loyalty_indicators.return_frequency.*.days_between', 'range'),
+    ('behavioral.multi_session_models.loyalty_indicators.return_frequency.*.score', 'number'),
+    ('behavioral.multi_session_models.loyalty_indicators.engagement_depth.*.*', 'number'),
+    ('behavioral.multi_session_models.loyalty_indicators.behavioral_consistency.*.*', 'number'),
+    ('behavioral.multi_session_models.churn_prediction_factors.*.*', 'number'),
+    ('behavioral.pattern_templates.*.dwell_time_range', 'range'),
+    ('behavioral.pattern_templates.*.scroll_velocity_range', 'range'),
+    ('behavioral.pattern_templates.*.interaction_frequency', 'string'),
+    ('behavioral.pattern_templates.*.depth_indicators', 'strings'),
+    ('behavioral.pattern_templates.*.emotional_correlations', 'strings'),
+    ('behavioral.predictive_models.next_action_prediction.sequence_models.*.likely_next', 'strings'),
+    ('behavioral.predictive_models.next_action_prediction.sequence_models.*.probabilities', 'numbers'),
+    ('behavioral.predictive_models.session_outcome_prediction.*.*', 'probability'),
+    ('behavioral.predictive_models.lifetime_value_prediction.behavioral_indicators.*.*', 'number'),
+)
+
+
+def _check_leaves(node: Any, pattern: List[str], kind: str, path: Tuple[str, ...]) -> None:
+    """Walk one LEAF_RULES pattern through the raw config and check every leaf it reaches"""
+    if not pattern:
+        check, description = LEAF_KINDS[kind]
+        if not check(node):
+            raise ModelConfigError(f"{'.'.join(path)} must be {description}, got {node!r}")
+        return
+    if not isinstance(node, dict):
+        raise ModelConfigError(f"{'.'.join(path)} must be a table, got {node!r}")
+    key, rest = pattern[0], pattern[1:]
+    if key == '*':
+        for name, child in node.items():
+            _check_leaves(child, rest, kind, path + (name,))
+    elif key in node:
+        _check_leaves(node[key], rest, kind, path + (key,))
+
+
+def load_raw_config(path: str) -> Dict[str, Any]:
+    """Parse a JSON or TOML model config file without compiling it"""
+    if path.endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as handle:
+            return tomllib.load(handle)
+    with open(path, 'r', encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def write_config(config: Dict[str, Any], path: str) -> None:
+    """Validate and atomically write a model config as JSON"""
+    _validate(config)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as handle:
+        json.dump(config, handle, indent=2)
+        handle.write('\n')
+    os.replace(temporary_path, path)
+
+
+class ModelConfigStore:
+    """
+    Holds the current compiled config for one file.
+    Readers take `store.current` (a single attribute read); reloads compile the
+    new file fully before swapping the reference, so readers never see a
+    half-loaded config and a bad file leaves the previous one in place.
+    """
+
+    def __init__(self, path: str = DEFAULT_CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.current: CompiledModelConfig = self._load(generation=0)
+
+    def _load(self, generation: int) -> CompiledModelConfig:
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        # Recorded before compiling, so a bad file is not retried until it changes again
+        self._mtime_ns = mtime_ns
+        config = CompiledModelConfig(load_raw_config(self.path), source=self.path, generation=generation)
+        for name, builder in list(_precompiled.items()):
+            try:
+                config.derived(name, builder)
+            except Exception as error:
+                raise ModelConfigError(f"{name} does not compile: {error}") from error
+        return config
+
+    def reload(self) -> CompiledModelConfig:
+        """Recompile the file and swap it in; raises ModelConfigError and keeps the old config on failure"""
+        with self._lock:
+            try:
+                config = self._load(generation=self.current.generation + 1)
+            except Exception as error:
+                logger.error("reload of %s failed, keeping generation %d: %s",
+                             self.path, self.current.generation, error)
+                raise ModelConfigError(f"reload of {self.path} failed: {error}") from error
+            self.current = config
+            return config
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the file's modification time has changed"""
+        try:
+            changed = os.stat(self.path).st_mtime_ns != self._mtime_ns
+        except OSError:
+            return False
+        if changed:
+            self.reload()
+        return changed
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Poll the file in a daemon thread and hot-reload on change"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except ModelConfigError:
+                    pass  # Logged by reload(); keep serving the last good config
+                except Exception:
+                    logger.exception("model config watcher for %s failed", self.path)
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=watch, name='model-config-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self, timeout: Optional[float] = None) -> None:
+        """Stop the watcher thread and wait for it to exit"""
+        watcher, self._watcher = self._watcher, None
+        self._stop_watching.set()
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join(timeout)
+
+
+_stores: Dict[str, ModelConfigStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(path: str = DEFAULT_CONFIG_PATH) -> ModelConfigStore:
+    """Process-wide store for a config file, shared by every engine that uses it"""
+    path = os.path.abspath(path)
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = ModelConfigStore(path)
+                _stores[path] = store
+    return store
+
+
+def warm_start(path: str = DEFAULT_CONFIG_PATH, vectorized: bool = False) -> ModelConfigStore:
+    """
+    Load and compile a config ahead of the first request (e.g. at module scope in a
+    serverless handler). vectorized=True also builds the NumPy-backed structures.
+    """
+    store = get_config_store(path)
+    if vectorized:
+        store.current.transition_matrix
+    return store
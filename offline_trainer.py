@@ -0,0 +1,433 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Offline Trainer
+===========================
+Fits the engine's emotional transition matrix and pattern weights from
+archived interaction logs, and writes them out as a model config.
+
+Logs are NDJSON clickstreams in the replay format (timestamp, session_id,
+action, target, duration, context). Events carrying an emotional_state,
+whether inferred at serving time or reported by the user, are the labels.
+Training is a map-reduce over a process pool:
+
+    map     each newline-aligned byte range of a log file (gzip files
+            whole) is parsed and its events are spilled to partition files
+            by session hash, so every session lands in one partition
+    reduce  each partition groups its sessions in time order and counts
+              - transitions between consecutive distinct labels
+              - for every label, the prototype's behavioral scores over the
+                preceding window (feature/label co-occurrence)
+              - the session's outcome (purchase or cart abandonment) per label
+    combine partial counts are summed and fitted against the base config
+            as a prior:
+              P(to | from)     = (count + a x prior) / (row total + a)
+              P(e | f)         = (sum of f over e-labelled windows + b x prior share)
+                                 / (sum of f over all labelled windows + b)
+              weight(e, f)     = P(e | f) x column weight
+            i.e. how strongly a behavioral signal indicates each emotion. The
+            configured weights are on their own scale, so each column f is
+            normalized across emotions first: prior share = weight / column
+            weight, where column weight is the sum of f's configured weights.
+            Fitting a signal that never fires gives back its configured weight.
+
+Only (emotion, pattern) pairs already in the config are fitted, so the
+output validates and loads like any hand-tuned config.
+"""
+
+import glob
+import gzip
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from er_ai_enhanced import EmotionalState as EnhancedState
+from er_ai_prototype import EmotionalResonanceAI, EmotionalState as PrototypeState, UserInteraction
+from model_config import DEFAULT_CONFIG_PATH, CompiledModelConfig, ModelConfigStore, load_raw_config, write_config
+
+# Label vocabulary: every state either engine can report
+STATES: Tuple[str, ...] = tuple(dict.fromkeys([state.value for state in EnhancedState] +
+                                              [state.value for state in PrototypeState]))
+STATE_INDEX = {state: index for index, state in enumerate(STATES)}
+# The transition table belongs to the enhanced engine, so only its states may appear there
+TRANSITION_STATES = frozenset(state.value for state in EnhancedState)
+
+OUTCOMES = ('purchase', 'abandonment')
+PURCHASE_ACTIONS = ('purchase', 'checkout')
+CART_ACTIONS = ('add_to_cart',)
+
+DEFAULT_SPLIT_BYTES = 64 << 20
+DEFAULT_WINDOW_MINUTES = 10
+DEFAULT_TRANSITION_SMOOTHING = 10.0
+DEFAULT_PATTERN_SMOOTHING = 10.0
+
+
+def _pattern_features(config: CompiledModelConfig) -> Tuple[str, ...]:
+    features: List[str] = []
+    for weights in config.prototype['emotional_patterns'].values():
+        features.extend(name for name in weights if name not in features)
+    return tuple(features)
+
+
+@dataclass
+class TrainingCounts:
+    """Sufficient statistics of a set of logs; partial counts merge by addition"""
+    features: Tuple[str, ...]
+    transitions: np.ndarray = None  # [from state, to state]
+    cooccurrence: np.ndarray = None  # [label state, feature]: summed feature values
+    feature_totals: np.ndarray = None  # [feature] over all labelled windows
+    labels: np.ndarray = None  # [state]
+    outcomes: np.ndarray = None  # [label state, outcome]
+    events: int = 0
+    sessions: int = 0
+
+    def __post_init__(self):
+        states, features = len(STATES), len(self.features)
+        if self.transitions is None:
+            self.transitions = np.zeros((states, states), dtype=np.int64)
+            self.cooccurrence = np.zeros((states, features))
+            self.feature_totals = np.zeros(features)
+            self.labels = np.zeros(states, dtype=np.int64)
+            self.outcomes = np.zeros((states, len(OUTCOMES)), dtype=np.int64)
+
+    def merge(self, other: 'TrainingCounts') -> 'TrainingCounts':
+        if other.features != self.features:
+            raise ValueError("cannot merge counts over different feature sets")
+        self.transitions += other.transitions
+        self.cooccurrence += other.cooccurrence
+        self.feature_totals += other.feature_totals
+        self.labels += other.labels
+        self.outcomes += other.outcomes
+        self.events += other.events
+        self.sessions += other.sessions
+        return self
+
+
+def split_logs(paths: Sequence[str], split_bytes: int = DEFAULT_SPLIT_BYTES) -> List[Tuple[str, int, int]]:
+    """(path, start, end) byte ranges; a line belongs to the range its first byte falls in"""
+    splits = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if path.endswith('.gz') or size <= split_bytes:
+            splits.append((path, 0, -1))
+            continue
+        splits.extend((path, start, min(start + split_bytes, size)) for start in range(0, size, split_bytes))
+    return splits
+
+
+def _read_split(path: str, start: int, end: int) -> Iterator[bytes]:
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as handle:
+            yield from handle
+        return
+    with open(path, 'rb') as handle:
+        if start > 0:
+            # Skip the line straddling the start; the previous range owns it
+            handle.seek(start - 1)
+            position = start - 1 + len(handle.readline())
+        else:
+            position = 0
+        for line in handle:
+            if end >= 0 and position >= end:
+                break
+            position += len(line)
+            yield line
+
+
+def _map_split(task: Tuple[int, str, int, int, str, int]) -> int:
+    """Parse one byte range and spill its events, partitioned by session"""
+    task_id, path, start, end, spill_dir, partitions = task
+    buckets: Dict[int, List[Tuple]] = {}
+    events = 0
+    for line in _read_split(path, start, end):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        session_id = record['session_id']
+        timestamp = record['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        buckets.setdefault(zlib.crc32(session_id.encode('utf-8')) % partitions, []).append((
+            session_id, timestamp, record['action'], record.get('target', ''), record.get('duration', 1.0),
+            record.get('context') or {}, record.get('emotional_state')
+        ))
+        events += 1
+    for partition, rows in buckets.items():
+        with open(os.path.join(spill_dir, f"m{task_id:06d}-p{partition:05d}.pkl"), 'wb') as handle:
+            pickle.dump(rows, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    return events
+
+
+# One scoring engine per process and base config
+_engines: Dict[str, EmotionalResonanceAI] = {}
+
+
+def _engine(config_path: str) -> EmotionalResonanceAI:
+    engine = _engines.get(config_path)
+    if engine is None:
+        engine = _engines[config_path] = EmotionalResonanceAI(config_store=ModelConfigStore(config_path))
+    return engine
+
+
+def _reduce_partition(task: Tuple[str, int, str, float]) -> TrainingCounts:
+    """Count transitions, co-occurrences and outcomes for every session of one partition"""
+    spill_dir, partition, config_path, window_minutes = task
+    engine = _engine(config_path)
+    features = _pattern_features(engine.config_store.current)
+    feature_index = {name: column for column, name in enumerate(features)}
+    counts = TrainingCounts(features)
+    window = timedelta(minutes=window_minutes)
+
+    sessions: Dict[str, List[Tuple]] = {}
+    for path in sorted(glob.glob(os.path.join(spill_dir, f"m*-p{partition:05d}.pkl"))):
+        with open(path, 'rb') as handle:
+            for row in pickle.load(handle):
+                sessions.setdefault(row[0], []).append(row)
+
+    for rows in sessions.values():
+        rows.sort(key=lambda row: row[1])
+        counts.events += len(rows)
+        counts.sessions += 1
+        actions = {row[2] for row in rows}
+        outcome = (0 if actions.intersection(PURCHASE_ACTIONS)
+                   else 1 if actions.intersection(CART_ACTIONS) else None)
+
+        interactions = [UserInteraction(timestamp, action, target, duration, context)
+                        for _, timestamp, action, target, duration, context, _ in rows]
+        previous = None
+        window_start = 0
+        for position, row in enumerate(rows):
+            label = STATE_INDEX.get(row[6]) if row[6] is not None else None
+            if label is None:
+                continue
+            if previous is not None and previous != label:
+                counts.transitions[previous, label] += 1
+            previous = label
+
+            # Behavioral scores the prototype would have seen when this label was produced
+            while rows[window_start][1] < row[1] - window:
+                window_start += 1
+            scores = engine._calculate_behavioral_scores(interactions[window_start:position + 1])
+            vector = np.zeros(len(features))
+            for name, value in scores.items():
+                column = feature_index.get(name)
+                if column is not None:
+                    vector[column] = value
+            counts.cooccurrence[label] += vector
+            counts.feature_totals += vector
+            counts.labels[label] += 1
+            if outcome is not None:
+                counts.outcomes[label, outcome] += 1
+    return counts
+
+
+def fit_transitions(counts: TrainingCounts, prior: Mapping[str, Mapping[str, float]],
+                    smoothing: float = DEFAULT_TRANSITION_SMOOTHING) -> Dict[str, Dict[str, float]]:
+    """Transition rows from counts, shrunk towards the prior rows; unobserved rows keep the prior"""
+    fitted: Dict[str, Dict[str, float]] = {}
+    targets = [index for index, state in enumerate(STATES) if state in TRANSITION_STATES]
+    observed_states = [STATES[index] for index in targets if counts.transitions[index, targets].any()]
+    for state in list(prior) + [state for state in observed_states if state not in prior]:
+        prior_row = prior.get(state, {})
+        observed = counts.transitions[STATE_INDEX[state]] if state in STATE_INDEX else None
+        total = int(observed[targets].sum()) if observed is not None else 0
+        if total == 0:
+            fitted[state] = dict(prior_row)
+            continue
+        alpha = smoothing if prior_row else 0.0
+        row = {}
+        for index in targets:
+            target = STATES[index]
+            probability = (observed[index] + alpha * prior_row.get(target, 0.0)) / (total + alpha)
+            if probability > 0:
+                row[target] = round(float(probability), 9)
+        fitted[state] = row
+    return fitted
+
+
+def fit_pattern_weights(counts: TrainingCounts, prior: Mapping[str, Mapping[str, float]],
+                        smoothing: float = DEFAULT_PATTERN_SMOOTHING) -> Dict[str, Dict[str, float]]:
+    """
+    Soft P(emotion | behavioral signal) for each configured pair, shrunk towards
+    the configured weight's share of its column and scaled back by the column's
+    total configured weight
+    """
+    column = {name: index for index, name in enumerate(counts.features)}
+    column_weights: Dict[str, float] = {}
+    for emotion, weights in prior.items():
+        if emotion in STATE_INDEX:
+            for name, weight in weights.items():
+                column_weights[name] = column_weights.get(name, 0.0) + weight
+
+    fitted: Dict[str, Dict[str, float]] = {}
+    for emotion, weights in prior.items():
+        row = STATE_INDEX.get(emotion)
+        fitted[emotion] = {}
+        for name, weight in weights.items():
+            scale = column_weights.get(name, 0.0)
+            if row is None or name not in column or scale <= 0:
+                fitted[emotion][name] = weight
+                continue
+            together = counts.cooccurrence[row, column[name]]
+            total = counts.feature_totals[column[name]]
+            share = (together + smoothing * weight / scale) / (total + smoothing)
+            fitted[emotion][name] = round(float(scale * share), 6)
+    return fitted
+
+
+@dataclass
+class TrainingResult:
+    """Fitted config plus the counts and timings behind it"""
+    config: Dict[str, Any]
+    counts: TrainingCounts
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def conversion_by_state(self) -> Dict[str, float]:
+        """Share of labelled windows, per state, in sessions that ended in a purchase"""
+        totals = self.counts.outcomes.sum(axis=1)
+        return {STATES[index]: float(self.counts.outcomes[index, 0] / totals[index])
+                for index in np.flatnonzero(totals)}
+
+
+class OfflineTrainer:
+    """Map-reduce training of transitions and pattern weights over a process pool"""
+
+    def __init__(self, base_config_path: str = DEFAULT_CONFIG_PATH, workers: Optional[int] = None,
+                 partitions: Optional[int] = None, split_bytes: int = DEFAULT_SPLIT_BYTES,
+                 window_minutes: float = DEFAULT_WINDOW_MINUTES,
+                 transition_smoothing: float = DEFAULT_TRANSITION_SMOOTHING,
+                 pattern_smoothing: float = DEFAULT_PATTERN_SMOOTHING):
+        self.base_config_path = os.path.abspath(base_config_path)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.partitions = partitions or 4 * self.workers
+        self.split_bytes = split_bytes
+        self.window_minutes = window_minutes
+        self.transition_smoothing = transition_smoothing
+        self.pattern_smoothing = pattern_smoothing
+
+    def train(self, paths: Sequence[str], spill_dir: Optional[str] = None) -> TrainingResult:
+        base = CompiledModelConfig(load_raw_config(self.base_config_path), source=self.base_config_path)
+        own_spill = spill_dir is None
+        spill_dir = spill_dir or tempfile.mkdtemp(prefix='er_ai_training_')
+        timings: Dict[str, float] = {}
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        execute = pool.map if pool is not None else map
+        try:
+            started = time.perf_counter()
+            splits = split_logs(paths, self.split_bytes)
+            map_tasks = [(task_id, path, start, end, spill_dir, self.partitions)
+                         for task_id, (path, start, end) in enumerate(splits)]
+            mapped = sum(execute(_map_split, map_tasks))
+            timings['map'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            reduce_tasks = [(spill_dir, partition, self.base_config_path, self.window_minutes)
+                            for partition in range(self.partitions)]
+            counts = TrainingCounts(_pattern_features(base))
+            for partial in execute(_reduce_partition, reduce_tasks):
+                counts.merge(partial)
+            timings['reduce'] = time.perf_counter() - started
+            if counts.events != mapped:
+                raise RuntimeError(f"reduce saw {counts.events} events, map spilled {mapped}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if own_spill:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+
+        config = base.to_dict()
+        config['enhanced']['emotional_transitions'] = fit_transitions(
+            counts, base.to_dict()['enhanced']['emotional_transitions'], self.transition_smoothing)
+        config['prototype']['emotional_patterns'] = fit_pattern_weights(
+            counts, base.to_dict()['prototype']['emotional_patterns'], self.pattern_smoothing)
+        return TrainingResult(config, counts, timings)
+
+    def train_to(self, paths: Sequence[str], output_path: str) -> TrainingResult:
+        """Train and write the fitted config (validated, atomically replaced)"""
+        result = self.train(paths)
+        write_config(result.config, output_path)
+        return result
+
+
+def write_synthetic_logs(directory: str, sessions: int, files: int = 4, seed: int = 0,
+                         transitions: Optional[Mapping[str, Mapping[str, float]]] = None) -> List[str]:
+    """NDJSON logs of sessions whose behavior follows a hidden emotional state chain; ~40% of events labelled"""
+    rng = np.random.default_rng(seed)
+    transitions = transitions or load_raw_config(DEFAULT_CONFIG_PATH)['enhanced']['emotional_transitions']
+    behaviors = {
+        'frustrated': (['search', 'search', 'remove_from_cart', 'click'], (1, 6)),
+        'excited': (['click', 'add_to_cart', 'view', 'click'], (1, 8)),
+        'contemplative': (['view', 'add_to_wishlist', 'scroll', 'view'], (30, 120)),
+        'curious': (['hover', 'view', 'scroll', 'hover'], (4, 40)),
+        'delighted': (['view', 'add_to_cart', 'purchase', 'click'], (5, 30)),
+    }
+    default_behavior = (['view', 'scroll', 'click', 'hover'], (2, 20))
+    paths = [os.path.join(directory, f"interactions-{index:03d}.ndjson") for index in range(files)]
+    handles = [open(path, 'w', encoding='utf-8') for path in paths]
+    try:
+        start = datetime(2026, 9, 1)
+        for session in range(sessions):
+            state = 'curious'
+            timestamp = start + timedelta(seconds=float(rng.uniform(0, 30 * 86400)))
+            handle = handles[session % files]
+            for _ in range(int(rng.integers(8, 40))):
+                if rng.random() < 0.25 and transitions.get(state):
+                    targets = list(transitions[state])
+                    probabilities = np.array([transitions[state][target] for target in targets])
+                    state = targets[int(rng.choice(len(targets), p=probabilities / probabilities.sum()))]
+                actions, (low, high) = behaviors.get(state, default_behavior)
+                duration = float(rng.uniform(low, high))
+                timestamp += timedelta(seconds=duration)
+                event = {'timestamp': timestamp.isoformat(), 'session_id': f"s{seed}-{session}",
+                         'action': actions[int(rng.integers(len(actions)))],
+                         'target': f"product_{int(rng.integers(200))}", 'duration': duration,
+                         'context': {'scroll_speed': float(rng.uniform(0.2, 4.0))}}
+                if rng.random() < 0.4:
+                    event['emotional_state'] = state
+                handle.write(json.dumps(event) + '\n')
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit transition matrix and pattern weights from interaction logs")
+    parser.add_argument('logs', nargs='*', help="NDJSON(.gz) interaction logs; synthetic logs when omitted")
+    parser.add_argument('--output', help="where to write the fitted config")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sessions', type=int, default=20_000, help="synthetic sessions when no logs are given")
+    args = parser.parse_args()
+
+    directory = None
+    paths = args.logs
+    if not paths:
+        directory = tempfile.mkdtemp(prefix='er_ai_logs_')
+        paths = write_synthetic_logs(directory, args.sessions)
+
+    trainer = OfflineTrainer(workers=args.workers)
+    started = time.perf_counter()
+    result = trainer.train_to(paths, args.output) if args.output else trainer.train(paths)
+    elapsed = time.perf_counter() - started
+    counts = result.counts
+    print(f"{counts.events:,} events / {counts.sessions:,} sessions / {int(counts.labels.sum()):,} labels "
+          f"in {elapsed:.1f}s with {trainer.workers} worker(s): {counts.events / elapsed:,.0f} events/s "
+          f"(map {result.timings['map']:.1f}s, reduce {result.timings['reduce']:.1f}s)")
+    print("fitted curious ->", {state: round(p, 3) for state, p in
+                                result.config['enhanced']['emotional_transitions']['curious'].items()})
+    print("fitted frustrated weights ->", result.config['prototype']['emotional_patterns']['frustrated'])
+    print("conversion by state ->", {state: round(rate, 3) for state, rate in result.conversion_by_state().items()})
+
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
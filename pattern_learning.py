@@ -0,0 +1,304 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Pattern Learning
+============================
+Online learning of EmotionalResonanceAI.emotional_patterns from outcomes.
+
+The prototype scores an emotion as the sum of its pattern weights x
+behavioral scores, divided by the number of patterns. The learner turns
+that into a softmax over emotions and follows the gradient of
+reward x log p(target):
+    purchase     reinforces the emotion the engine inferred (reward +1)
+    abandonment  penalizes it (reward -1)
+    feedback     an explicit emotion label, used as the target (reward +1)
+Only the (emotion, pattern) pairs in the configured patterns are learned,
+and weights are kept non-negative, so the model keeps its structure and
+its meaning.
+
+Every thread records outcomes into its own LearnerWorker. The worker
+buffers examples and computes the gradient of each full mini-batch in one
+vectorized step, then adds it to a private accumulator. The worker's own
+lock is uncontended except while flush_all() runs. Every merge_every
+mini-batches the worker merges its accumulated gradient into the shared
+weights under a short lock. Merging publishes a new immutable
+PatternWeights snapshot. Engines read the current snapshot without
+locking and pick it up on their next inference.
+
+A worker also flushes once its oldest unmerged outcome is max_delay
+seconds old, so low-traffic threads still train. flush_all() flushes every
+worker, including those of threads that have exited.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from model_config import CompiledModelConfig
+
+# Outcome -> (reward, whether the target is an explicit label rather than the inferred emotion)
+OUTCOMES: Dict[str, Tuple[float, bool]] = {
+    'purchase': (1.0, False),
+    'abandonment': (-1.0, False),
+    'feedback': (1.0, True),
+}
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MERGE_EVERY = 4
+# Seconds an outcome may wait in a worker before it is trained on and merged
+DEFAULT_MAX_DELAY = 5.0
+# Softmax temperature: engine scores are averages of 0-1 signals, so differences are small
+DEFAULT_TEMPERATURE = 0.05
+
+
+@dataclass(frozen=True)
+class PatternWeights:
+    """One published version of the weight matrix [emotion, behavioral pattern]"""
+    version: int
+    emotions: Tuple[str, ...]
+    features: Tuple[str, ...]
+    matrix: np.ndarray
+    # Per emotion: the feature columns it has patterns for
+    columns: Tuple[Tuple[int, ...], ...]
+
+    def as_patterns(self) -> Dict[str, Dict[str, float]]:
+        """The weights in emotional_patterns form"""
+        return {emotion: {self.features[column]: float(self.matrix[row, column]) for column in self.columns[row]}
+                for row, emotion in enumerate(self.emotions)}
+
+
+class PatternLearner:
+    """Shared pattern weights, updated by mini-batch SGD from per-worker gradient accumulators"""
+
+    def __init__(self, patterns: Mapping[str, Mapping[str, float]], learning_rate: float = 0.1,
+                 batch_size: int = DEFAULT_BATCH_SIZE, merge_every: int = DEFAULT_MERGE_EVERY,
+                 temperature: float = DEFAULT_TEMPERATURE, max_delay: Optional[float] = DEFAULT_MAX_DELAY):
+        if learning_rate <= 0:
+            raise ValueError("learning_rate must be positive")
+        if batch_size < 1 or merge_every < 1:
+            raise ValueError("batch_size and merge_every must be at least 1")
+        if temperature <= 0:
+            raise ValueError("temperature must be positive")
+        if max_delay is not None and max_delay < 0:
+            raise ValueError("max_delay must be non-negative")
+        self.learning_rate = learning_rate
+        self.temperature = temperature
+        self.batch_size = batch_size
+        self.merge_every = merge_every
+        self.max_delay = max_delay
+
+        emotions = tuple(patterns)
+        features: List[str] = []
+        for weights in patterns.values():
+            features.extend(name for name in weights if name not in features)
+        self.emotions = emotions
+        self.features = tuple(features)
+        self.emotion_index = {emotion: row for row, emotion in enumerate(emotions)}
+        self.feature_index = {feature: column for column, feature in enumerate(self.features)}
+
+        matrix = np.zeros((len(emotions), len(features)))
+        self.mask = np.zeros_like(matrix, dtype=bool)
+        for row, weights in enumerate(patterns.values()):
+            for name, weight in weights.items():
+                matrix[row, self.feature_index[name]] = weight
+                self.mask[row, self.feature_index[name]] = True
+        # The engine divides each emotion's score by its number of patterns
+        self.pattern_counts = np.maximum(self.mask.sum(axis=1), 1).astype(np.float64)
+        self._columns = tuple(tuple(self.feature_index[name] for name in weights) for weights in patterns.values())
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Every worker, so flush_all() reaches buffers of threads that have exited
+        self._workers: List['LearnerWorker'] = []
+        self._current = self._publish(0, matrix)
+        self.examples = 0
+        self.merges = 0
+
+    @classmethod
+    def from_config(cls, config: CompiledModelConfig, **options) -> 'PatternLearner':
+        return cls(config.prototype['emotional_patterns'], **options)
+
+    def _publish(self, version: int, matrix: np.ndarray) -> PatternWeights:
+        matrix.flags.writeable = False
+        return PatternWeights(version, self.emotions, self.features, matrix, self._columns)
+
+    @property
+    def current(self) -> PatternWeights:
+        """Latest published weights; read without locking"""
+        return self._current
+
+    def worker(self) -> 'LearnerWorker':
+        """The calling thread's worker"""
+        worker = getattr(self._local, 'worker', None)
+        if worker is None:
+            worker = self._local.worker = LearnerWorker(self)
+            with self._lock:
+                self._workers.append(worker)
+        return worker
+
+    def observe(self, behavioral_scores: Mapping[str, float], inferred: str, outcome: str,
+                label: Optional[str] = None) -> None:
+        """Record an outcome through the calling thread's worker"""
+        self.worker().observe(behavioral_scores, inferred, outcome, label)
+
+    def flush(self) -> None:
+        """Train on and merge whatever the calling thread's worker still holds"""
+        self.worker().flush()
+
+    def flush_all(self) -> None:
+        """Train on and merge what every worker holds, e.g. at shutdown; workers of exited threads are dropped"""
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.flush()
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.thread.is_alive()]
+
+    def _merge(self, gradient: np.ndarray, examples: int) -> None:
+        with self._lock:
+            matrix = self._current.matrix + self.learning_rate * gradient / examples
+            np.maximum(matrix, 0.0, out=matrix)
+            matrix[~self.mask] = 0.0
+            self._current = self._publish(self._current.version + 1, matrix)
+            self.examples += examples
+            self.merges += 1
+
+    def scores(self, features: np.ndarray, matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        """Engine emotion scores for a [examples, features] matrix"""
+        matrix = self._current.matrix if matrix is None else matrix
+        return features @ matrix.T / self.pattern_counts
+
+    def stats(self) -> Dict[str, int]:
+        return {'version': self._current.version, 'examples': self.examples, 'merges': self.merges}
+
+
+class LearnerWorker:
+    """Per-thread example buffer and gradient accumulator; touches shared state only when merging"""
+
+    def __init__(self, learner: PatternLearner):
+        self.learner = learner
+        self.thread = threading.current_thread()
+        self.lock = threading.Lock()
+        self._features: List[np.ndarray] = []
+        self._targets: List[int] = []
+        self._rewards: List[float] = []
+        self._gradient = np.zeros((len(learner.emotions), len(learner.features)))
+        self._examples = 0
+        self._batches = 0
+        # When the oldest outcome not yet merged arrived (time.monotonic), None when nothing is pending
+        self._oldest: Optional[float] = None
+
+    def observe(self, behavioral_scores: Mapping[str, float], inferred: str, outcome: str,
+                label: Optional[str] = None) -> None:
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown outcome {outcome!r}; expected one of {sorted(OUTCOMES)}")
+        reward, labeled = OUTCOMES[outcome]
+        target = label if labeled else inferred
+        if target is None:
+            raise ValueError(f"outcome {outcome!r} needs an emotion label")
+        row = self.learner.emotion_index.get(target)
+        if row is None:
+            return  # an emotion without patterns has nothing to learn
+
+        features = np.zeros(len(self.learner.features))
+        for name, value in behavioral_scores.items():
+            column = self.learner.feature_index.get(name)
+            if column is not None:
+                features[column] = value
+        max_delay = self.learner.max_delay
+        with self.lock:
+            self._features.append(features)
+            self._targets.append(row)
+            self._rewards.append(reward)
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            if len(self._targets) >= self.learner.batch_size:
+                self._step()
+            if max_delay is not None and self._oldest is not None and now - self._oldest >= max_delay:
+                self._flush()
+
+    def _step(self) -> None:
+        """One vectorized mini-batch gradient: reward x (onehot(target) - softmax) outer features"""
+        learner = self.learner
+        features = np.vstack(self._features)
+        targets = np.asarray(self._targets)
+        rewards = np.asarray(self._rewards)
+        self._features, self._targets, self._rewards = [], [], []
+
+        scores = learner.scores(features) / learner.temperature
+        probabilities = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        residual = -probabilities
+        residual[np.arange(len(targets)), targets] += 1.0
+        residual *= rewards[:, None]
+        self._gradient += (residual.T @ features) / (learner.pattern_counts[:, None] * learner.temperature)
+        self._examples += len(targets)
+        self._batches += 1
+        if self._batches >= learner.merge_every:
+            self._merge()
+
+    def _merge(self) -> None:
+        if self._examples:
+            self.learner._merge(self._gradient, self._examples)
+        self._gradient = np.zeros_like(self._gradient)
+        self._examples = 0
+        self._batches = 0
+        self._oldest = None
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._targets:
+            self._step()
+        self._merge()
+
+
+if __name__ == "__main__":
+    import time
+
+    from model_config import get_config_store
+
+    config = get_config_store().current
+    learner = PatternLearner.from_config(config, learning_rate=0.1)
+    rng = np.random.default_rng(11)
+
+    # Hidden "true" weights: the configured ones, perturbed
+    truth = np.where(learner.mask, np.clip(learner.current.matrix + rng.normal(0, 0.6, learner.mask.shape), 0, None), 0)
+
+    def session_batch(size: int) -> Tuple[np.ndarray, np.ndarray]:
+        features = rng.random((size, len(learner.features))) ** 3
+        return features, np.argmax(learner.scores(features, truth), axis=1)
+
+    evaluation, evaluation_truth = session_batch(20_000)
+
+    def accuracy() -> float:
+        return float(np.mean(np.argmax(learner.scores(evaluation), axis=1) == evaluation_truth))
+
+    def train(sessions: int) -> None:
+        worker = learner.worker()
+        features, truths = session_batch(sessions)
+        inferred = np.argmax(learner.scores(features), axis=1)
+        for row in range(sessions):
+            scores = dict(zip(learner.features, features[row]))
+            predicted = learner.emotions[inferred[row]]
+            if row % 10 == 0:
+                worker.observe(scores, predicted, 'feedback', learner.emotions[truths[row]])
+            else:
+                worker.observe(scores, predicted, 'purchase' if inferred[row] == truths[row] else 'abandonment')
+        worker.flush()
+
+    print(f"accuracy with configured weights: {accuracy():.3f}")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=train, args=(25_000,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f"after {learner.examples:,} outcomes from 4 workers: {accuracy():.3f} "
+          f"({learner.examples / elapsed:,.0f} outcomes/s, {learner.merges} merges)")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Quality Simulation
+==============================
+Vectorized Monte-Carlo engine behind testing_framework: simulates task
+completion time, errors and satisfaction for any number of quality levels.
+
+Each quality level is a QualityProfile with one Distribution per result
+column. Users are simulated in fixed-size chunks, each with its own NumPy
+Generator whose seed is derived from (seed, level, chunk index). A run
+therefore reproduces exactly from its seed, however the chunks are spread
+over worker processes. Workers return mergeable column summaries (and
+optionally the rows, streamed to .npy files), so memory stays bounded for
+any number of users.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from results_io import RESULT_COLUMNS, RESULT_DTYPE, ColumnSummary, ResultsWriter
+
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+# Parameter names per distribution kind, in Generator argument order
+DISTRIBUTION_PARAMS = {
+    'uniform': ('low', 'high'),
+    'integers': ('low', 'high'),  # inclusive of high, like random.randint
+    'normal': ('mean', 'std'),
+    'lognormal': ('mean', 'sigma'),
+    'poisson': ('lam',),
+    'beta': ('a', 'b'),
+}
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """A sampling rule for one result column, optionally scaled and clipped"""
+    kind: str
+    params: Tuple[float, ...]
+    scale: float = 1.0
+    offset: float = 0.0
+    clip: Optional[Tuple[float, float]] = None
+
+    def __post_init__(self):
+        if self.kind not in DISTRIBUTION_PARAMS:
+            raise ValueError(f"Unknown distribution kind {self.kind!r}")
+        if len(self.params) != len(DISTRIBUTION_PARAMS[self.kind]):
+            raise ValueError(f"{self.kind} takes parameters {DISTRIBUTION_PARAMS[self.kind]}")
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        if self.kind == 'uniform':
+            values = rng.uniform(self.params[0], self.params[1], size)
+        elif self.kind == 'integers':
+            values = rng.integers(int(self.params[0]), int(self.params[1]), size, endpoint=True)
+        elif self.kind == 'normal':
+            values = rng.normal(self.params[0], self.params[1], size)
+        elif self.kind == 'lognormal':
+            values = rng.lognormal(self.params[0], self.params[1], size)
+        elif self.kind == 'poisson':
+            values = rng.poisson(self.params[0], size)
+        else:
+            values = rng.beta(self.params[0], self.params[1], size)
+
+        if self.scale != 1.0 or self.offset != 0.0:
+            values = values * self.scale + self.offset
+        if self.clip is not None:
+            values = np.clip(values, self.clip[0], self.clip[1])
+        return values
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> 'Distribution':
+        clip = spec.get('clip')
+        return cls(kind=spec['kind'], params=tuple(spec['params']), scale=spec.get('scale', 1.0),
+                   offset=spec.get('offset', 0.0), clip=tuple(clip) if clip is not None else None)
+
+
+@dataclass(frozen=True)
+class QualityProfile:
+    """Distributions of the three result columns for one quality level"""
+    name: str
+    task_completion_time: Distribution
+    errors_encountered: Distribution
+    user_satisfaction_score: Distribution
+
+    def simulate(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        results = np.empty(size, dtype=RESULT_DTYPE)
+        for column in RESULT_COLUMNS:
+            results[column] = getattr(self, column).sample(rng, size)
+        return results
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict[str, Dict[str, Any]]) -> 'QualityProfile':
+        return cls(name, **{column: Distribution.from_dict(spec[column]) for column in RESULT_COLUMNS})
+
+
+# The distributions simulate_user_interaction draws from
+DEFAULT_PROFILES: Dict[str, QualityProfile] = {
+    'high': QualityProfile(
+        'high',
+        task_completion_time=Distribution('uniform', (10.0, 30.0)),
+        errors_encountered=Distribution('integers', (0, 1)),
+        user_satisfaction_score=Distribution('uniform', (4.0, 5.0)),
+    ),
+    'low': QualityProfile(
+        'low',
+        task_completion_time=Distribution('uniform', (30.0, 90.0)),
+        errors_encountered=Distribution('integers', (2, 5)),
+        user_satisfaction_score=Distribution('uniform', (1.0, 3.5)),
+    ),
+}
+
+
+def profiles_from_dict(spec: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, QualityProfile]:
+    """Build profiles from a {level: {column: {kind, params, ...}}} mapping (e.g. loaded JSON)"""
+    return {name: QualityProfile.from_dict(name, columns) for name, columns in spec.items()}
+
+
+def chunk_generator(seed: int, level_index: int, chunk_index: int) -> np.random.Generator:
+    """Independent, reproducible stream for one chunk of one quality level"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(level_index, chunk_index)))
+
+
+def _simulate_task(task: Tuple[QualityProfile, int, int, int, int, bool]):
+    profile, seed, level_index, chunk_index, size, keep_rows = task
+    results = profile.simulate(chunk_generator(seed, level_index, chunk_index), size)
+    summaries = {column: ColumnSummary(seed=chunk_index) for column in RESULT_COLUMNS}
+    for column in RESULT_COLUMNS:
+        summaries[column].update(results[column])
+    return summaries, (results if keep_rows else None)
+
+
+@dataclass
+class SimulationResult:
+    """Per-level column summaries of one Monte-Carlo run"""
+    seed: int
+    users_per_level: int
+    summaries: Dict[str, Dict[str, ColumnSummary]] = field(default_factory=dict)
+    output_files: Dict[str, str] = field(default_factory=dict)
+
+    def means(self) -> Dict[str, Dict[str, float]]:
+        return {level: {column: summary.mean for column, summary in columns.items()}
+                for level, columns in self.summaries.items()}
+
+
+class MonteCarloSimulator:
+    """Chunked, seeded, multi-process simulation over any number of quality levels"""
+
+    def __init__(self, profiles: Optional[Dict[str, QualityProfile]] = None, seed: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, workers: Optional[int] = None):
+        self.profiles = dict(profiles or DEFAULT_PROFILES)
+        # A missing seed is drawn once, so the run can still be reproduced from self.seed
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy)
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    def _chunk_sizes(self, num_users: int) -> List[int]:
+        full, remainder = divmod(num_users, self.chunk_size)
+        return [self.chunk_size] * full + ([remainder] if remainder else [])
+
+    def _level_index(self, level: str) -> int:
+        return list(self.profiles).index(level)
+
+    def iter_chunks(self, level: str, num_users: int) -> Iterator[np.ndarray]:
+        """Simulate one level in-process, chunk by chunk"""
+        profile = self.profiles[level]
+        level_index = self._level_index(level)
+        for chunk_index, size in enumerate(self._chunk_sizes(num_users)):
+            yield profile.simulate(chunk_generator(self.seed, level_index, chunk_index), size)
+
+    def simulate(self, level: str, num_users: int) -> np.ndarray:
+        """All results for one level as one structured array (for modest num_users)"""
+        chunks = list(self.iter_chunks(level, num_users))
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=RESULT_DTYPE)
+
+    def run(self, num_users: int, levels: Optional[Sequence[str]] = None,
+            output_dir: Optional[str] = None) -> SimulationResult:
+        """
+        Simulate num_users per level and summarize every column.
+        With output_dir, rows are also streamed to <level>_quality_results.npy.
+        """
+        levels = list(levels or self.profiles)
+        keep_rows = output_dir is not None
+        tasks = [
+            (self.profiles[level], self.seed, self._level_index(level), chunk_index, size, keep_rows)
+            for level in levels
+            for chunk_index, size in enumerate(self._chunk_sizes(num_users))
+        ]
+        result = SimulationResult(self.seed, num_users,
+                                  {level: {column: ColumnSummary() for column in RESULT_COLUMNS} for level in levels})
+        writers = {}
+        if keep_rows:
+            for level in levels:
+                path = os.path.join(output_dir, f"{level}_quality_results.npy")
+                writers[level] = ResultsWriter(path)
+                result.output_files[level] = path
+
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            outputs = pool.map(_simulate_task, tasks) if pool is not None else map(_simulate_task, tasks)
+            for (profile, *_), (summaries, rows) in zip(tasks, outputs):
+                for column, summary in summaries.items():
+                    result.summaries[profile.name][column].merge(summary)
+                if rows is not None:
+                    writers[profile.name].write(rows)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            for writer in writers.values():
+                writer.close()
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from results_io import format_describe
+
+    parser = argparse.ArgumentParser(description="Vectorized quality-level Monte-Carlo simulation")
+    parser.add_argument('--users', type=int, default=10_000_000, help="users per quality level")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    profiles = dict(DEFAULT_PROFILES)
+    profiles['medium'] = QualityProfile(
+        'medium',
+        task_completion_time=Distribution('lognormal', (3.6, 0.3)),
+        errors_encountered=Distribution('poisson', (1.5,)),
+        user_satisfaction_score=Distribution('normal', (3.5, 0.6), clip=(1.0, 5.0)),
+    )
+
+    simulator = MonteCarloSimulator(profiles, seed=args.seed, workers=args.workers)
+    started = time.perf_counter()
+    result = simulator.run(args.users)
+    elapsed = time.perf_counter() - started
+
+    for level, summaries in result.summaries.items():
+        print(f"\n--- {level} quality ---")
+        print(format_describe(summaries))
+    total = args.users * len(profiles)
+    print(f"\n{total:,} simulated users in {elapsed:.1f}s ({total / elapsed:,.0f} users/s, "
+          f"{simulator.workers} workers, seed {result.seed})")
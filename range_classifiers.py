@@ -0,0 +1,148 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Range Classifiers
+=============================
+Range and threshold models compiled into sorted breakpoint arrays.
+
+Classification is a binary search, so a single value costs O(log n).
+Scalar lookups use bisect over plain tuples; NumPy is only imported when
+a whole array of sessions is bucketed in one np.searchsorted call.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Sequence, Tuple
+
+NO_MATCH = -1
+
+
+class RangeClassifier:
+    """
+    Non-overlapping inclusive [lower, upper] ranges.
+    Where two ranges share a boundary, the lower range wins, matching a
+    first-match scan over ranges listed in ascending order.
+    """
+
+    def __init__(self, labels: Sequence[Any], lowers: Sequence[float], uppers: Sequence[float]):
+        order = sorted(range(len(labels)), key=lambda i: float(lowers[i]))
+        self.labels: Tuple[Any, ...] = tuple(labels[i] for i in order)
+        self._lower_bounds: Tuple[float, ...] = tuple(float(lowers[i]) for i in order)
+        self._upper_bounds: Tuple[float, ...] = tuple(float(uppers[i]) for i in order)
+        
+        if any(upper < lower for lower, upper in zip(self._lower_bounds, self._upper_bounds)):
+            raise ValueError("range upper bound below lower bound")
+        if any(lower < upper for lower, upper in zip(self._lower_bounds[1:], self._upper_bounds)):
+            raise ValueError("ranges overlap")
+        
+        self._arrays = None
+
+    def _bound_arrays(self):
+        if self._arrays is None:
+            import numpy as np
+            lowers = np.array(self._lower_bounds, dtype=np.float64)
+            uppers = np.array(self._upper_bounds, dtype=np.float64)
+            lowers.flags.writeable = False
+            uppers.flags.writeable = False
+            self._arrays = (lowers, uppers)
+        return self._arrays
+
+    @property
+    def lowers(self):
+        """Sorted lower bounds as a read-only array"""
+        return self._bound_arrays()[0]
+
+    @property
+    def uppers(self):
+        """Sorted upper bounds as a read-only array"""
+        return self._bound_arrays()[1]
+
+    @classmethod
+    def from_ranges(cls, ranges: Dict[Any, Tuple[float, float]]) -> 'RangeClassifier':
+        """Compile a {label: (lower, upper)} table"""
+        labels = list(ranges.keys())
+        return cls(labels, [ranges[label][0] for label in labels], [ranges[label][1] for label in labels])
+
+    def classify_index(self, value: float) -> int:
+        """Index of the range containing value, or NO_MATCH"""
+        index = bisect_left(self._upper_bounds, value)
+        if index < len(self._upper_bounds) and self._lower_bounds[index] <= value:
+            return index
+        return NO_MATCH
+
+    def classify(self, value: float) -> Any:
+        """Label of the range containing value, or None"""
+        index = self.classify_index(value)
+        return self.labels[index] if index != NO_MATCH else None
+
+    def candidate_indices(self, value: float) -> List[int]:
+        """Every range containing value, in scan order (two when value sits on a shared boundary)"""
+        index = self.classify_index(value)
+        if index == NO_MATCH:
+            return []
+        if index + 1 < len(self._lower_bounds) and self._lower_bounds[index + 1] == value:
+            return [index, index + 1]
+        return [index]
+
+    def classify_many(self, values: Sequence[float]) -> 'np.ndarray':
+        """Range index for every value (NO_MATCH where no range applies)"""
+        import numpy as np
+        lowers, uppers = self._bound_arrays()
+        values = np.asarray(values, dtype=np.float64)
+        indices = np.searchsorted(uppers, values, side='left')
+        clipped = np.minimum(indices, len(uppers) - 1)
+        matched = (indices < len(uppers)) & (lowers[clipped] <= values)
+        return np.where(matched, indices, NO_MATCH)
+
+    def labels_for(self, indices: Sequence[int]) -> List[Any]:
+        return [self.labels[i] if i != NO_MATCH else None for i in indices]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+class ThresholdClassifier:
+    """
+    Monotone threshold ladder: level i applies once the value passes the
+    i-th breakpoint. strict=True means "value > breakpoint", strict=False
+    means "value >= breakpoint".
+    """
+
+    def __init__(self, breakpoints: Sequence[float], labels: Sequence[Any], strict: bool = True):
+        if len(labels) != len(breakpoints) + 1:
+            raise ValueError("a threshold ladder needs one more label than breakpoints")
+        self._breakpoints: Tuple[float, ...] = tuple(float(b) for b in breakpoints)
+        if any(later < earlier for earlier, later in zip(self._breakpoints, self._breakpoints[1:])):
+            raise ValueError("breakpoints must be sorted")
+        self.labels: Tuple[Any, ...] = tuple(labels)
+        self.strict = strict
+        # "value > b" counts breakpoints strictly below value (bisect_left / side='left')
+        self._side = 'left' if strict else 'right'
+        self._bisect = bisect_left if strict else bisect_right
+        self._array = None
+
+    @property
+    def breakpoints(self):
+        """Breakpoints as a read-only array"""
+        if self._array is None:
+            import numpy as np
+            array = np.array(self._breakpoints, dtype=np.float64)
+            array.flags.writeable = False
+            self._array = array
+        return self._array
+
+    def classify_index(self, value: float) -> int:
+        return self._bisect(self._breakpoints, value)
+
+    def classify(self, value: float) -> Any:
+        return self.labels[self.classify_index(value)]
+
+    def classify_many(self, values: Sequence[float]) -> 'np.ndarray':
+        import numpy as np
+        return np.searchsorted(self.breakpoints, np.asarray(values, dtype=np.float64), side=self._side)
+
+    def classify_many_labels(self, values: Sequence[float]) -> 'np.ndarray':
+        """Labels for every value; intended for numeric labels such as intensity levels"""
+        import numpy as np
+        return np.asarray(self.labels)[self.classify_many(values)]
+
+    def labels_for(self, indices: Sequence[int]) -> List[Any]:
+        return [self.labels[i] for i in indices]
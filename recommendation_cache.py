@@ -0,0 +1,137 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Recommendation Cache
+================================
+Shared recommendation lists per (emotion, intensity, catalog version).
+
+Thousands of sessions sit in the same emotional state at once, and without
+a cache each one ranks the catalog again for the same answer. A
+RecommendationCache keeps one immutable SKU list per key in a bounded LRU
+shared by every engine of a kind. Because the catalog version is part of
+the key, a rebuilt catalog never serves stale lists. invalidate() also
+bumps a generation counter that drops everything at once, e.g. after an
+in-place catalog edit that keeps its version; CatalogStore.reload() does
+this for every shared cache. A list computed while an
+invalidation happened is returned but not stored. Per-user re-ranking is
+applied to a copy on the way out, so the shared list stays the same for
+everyone.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_MAX_ENTRIES = 4096
+
+CacheKey = Tuple[str, Optional[str], Hashable]
+
+
+def rerank(skus: Sequence[str], user_scores: Mapping[str, float]) -> List[str]:
+    """Order SKUs by a user's scores, best first; unscored SKUs count as 0 and ties keep the shared order"""
+    return sorted(skus, key=lambda sku: -user_scores.get(sku, 0.0))
+
+
+class RecommendationCache:
+    """Bounded LRU of SKU lists keyed by (emotion, intensity, catalog version)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: 'OrderedDict[CacheKey, Tuple[str, ...]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, emotion: str, intensity: Optional[str], catalog_version: Hashable,
+            compute: Callable[[], Sequence[str]],
+            user_scores: Optional[Mapping[str, float]] = None) -> List[str]:
+        """Cached list for the key, computing it on a miss; re-ranked by user_scores when given"""
+        key = (emotion, intensity, catalog_version)
+        with self._lock:
+            skus = self._entries.get(key)
+            if skus is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            generation = self.generation
+
+        if skus is None:
+            # Ranked outside the lock; stored only if no invalidation happened meanwhile
+            skus = tuple(compute())
+            with self._lock:
+                if generation == self.generation:
+                    self._entries[key] = skus
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+
+        return rerank(skus, user_scores) if user_scores else list(skus)
+
+    def invalidate(self) -> int:
+        """Drop every entry and start a new generation, which is returned"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            return self.generation
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'generation': self.generation, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_caches: Dict[str, RecommendationCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_recommendation_cache(name: str) -> RecommendationCache:
+    """Process-wide cache for one kind of recommendation list, e.g. 'prototype' or 'enhanced'"""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = _caches[name] = RecommendationCache()
+    return cache
+
+
+def invalidate_all() -> None:
+    """Invalidate every shared cache, e.g. after the catalog was edited in place"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from er_ai_enhanced import EmotionalIntensity, EmotionalState, EnhancedEmotionalResonanceAI
+
+    engine = EnhancedEmotionalResonanceAI(rng=random.Random(1))
+    states = list(EmotionalState)
+    intensities = list(EmotionalIntensity)
+    requests = [(random.choice(states), random.choice(intensities)) for _ in range(100_000)]
+
+    cache = engine.recommendation_cache
+    version = engine.catalog_index.version
+
+    started = time.perf_counter()
+    for state, _ in requests:
+        engine._rank_base_products(state)
+    uncached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for state, intensity in requests:
+        cache.get(state.value, intensity.value, version, lambda: engine._rank_base_products(state))
+    cached = time.perf_counter() - started
+
+    print(f"ranking every request: {len(requests) / uncached:12,.0f} requests/s")
+    print(f"shared cache:          {len(requests) / cached:12,.0f} requests/s")
+    print(engine.recommendation_cache.stats())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Replay Engine
+===============================
+Replays recorded clickstreams through EnhancedEmotionalResonanceAI and
+AdvancedBehavioralPatternRecognition under a baseline and a candidate model
+config, and diffs the resulting emotional profiles, insights and session
+patterns.
+
+Replays run in event time: every engine gets a ReplayClock that is moved to
+each event's timestamp, and a random source seeded from the session (or
+user) id, so the baseline and candidate runs see identical inputs and
+differ only by config. Users are fanned out across worker processes; the
+diff comes back as NumPy columns (one row per event, one row per session).
+"""
+
+import json
+import os
+import random
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from behavioral_pattern_recognition import AdvancedBehavioralPatternRecognition
+from er_ai_enhanced import EmotionalIntensity, EmotionalState, EnhancedEmotionalResonanceAI
+from model_config import ModelConfigStore
+
+STATE_CODES = {state: code for code, state in enumerate(EmotionalState)}
+INTENSITY_CODES = {intensity: code for code, intensity in enumerate(EmotionalIntensity)}
+
+# Columns of a recorded event forwarded to track_enhanced_interaction when present
+SIGNAL_FIELDS = ('scroll_velocity', 'dwell_time', 'click_pressure', 'mouse_trajectory', 'device_orientation')
+
+
+class ReplayClock:
+    """Clock injected into the engines; returns the time of the event being replayed"""
+
+    def __init__(self, start: Optional[datetime] = None):
+        self.now = start or datetime(1970, 1, 1)
+
+    def advance_to(self, timestamp: datetime) -> None:
+        self.now = timestamp
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def _seed(key: str) -> int:
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def _parse_event(record: Dict[str, Any]) -> Dict[str, Any]:
+    event = dict(record)
+    if isinstance(event.get('timestamp'), str):
+        event['timestamp'] = datetime.fromisoformat(event['timestamp'])
+    event.setdefault('user_id', event['session_id'])
+    event.setdefault('context', {})
+    event.setdefault('duration', 1.0)
+    return event
+
+
+def load_events(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Read an NDJSON clickstream and group it by user, each user's events in time order"""
+    users: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                event = _parse_event(json.loads(line))
+                users.setdefault(event['user_id'], []).append(event)
+    for events in users.values():
+        events.sort(key=lambda event: event['timestamp'])
+    return users
+
+
+def group_events(events: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group in-memory events by user, each user's events in time order"""
+    users: Dict[str, List[Dict[str, Any]]] = {}
+    for record in events:
+        event = _parse_event(record)
+        users.setdefault(event['user_id'], []).append(event)
+    for user_events in users.values():
+        user_events.sort(key=lambda event: event['timestamp'])
+    return users
+
+
+@dataclass
+class UserReplay:
+    """Everything one config produced for one user's traffic"""
+    event_rows: List[Tuple]  # (session_id, event index, timestamp, primary, intensity, confidence, next, stage, tone, products)
+    session_rows: Dict[str, Tuple]  # session_id -> (pattern types, overall engagement, decision readiness)
+
+
+def replay_user(user_id: str, events: List[Dict[str, Any]], config_store: ModelConfigStore) -> UserReplay:
+    """Replay one user's sessions under one config in event time"""
+    clock = ReplayClock(events[0]['timestamp'])
+    behavioral = AdvancedBehavioralPatternRecognition(config_store=config_store, clock=clock,
+                                                      rng=random.Random(_seed(user_id)))
+    sessions: Dict[str, EnhancedEmotionalResonanceAI] = {}
+    session_events: Dict[str, List[Dict[str, Any]]] = {}
+    event_rows = []
+
+    for event in events:
+        clock.advance_to(event['timestamp'])
+        session_id = event['session_id']
+        engine = sessions.get(session_id)
+        if engine is None:
+            engine = sessions[session_id] = EnhancedEmotionalResonanceAI(
+                config_store=config_store, clock=clock, rng=random.Random(_seed(session_id))
+            )
+            session_events[session_id] = []
+
+        signals = {field: event[field] for field in SIGNAL_FIELDS if field in event}
+        insight = engine.track_enhanced_interaction(event['action'], event['target'], event['duration'],
+                                                    event['context'], session_id=session_id,
+                                                    timestamp=event['timestamp'], **signals)
+        profile = engine.emotional_history[-1]
+        event_rows.append((
+            session_id, len(session_events[session_id]), event['timestamp'],
+            STATE_CODES[profile.primary_state], INTENSITY_CODES[profile.intensity], profile.confidence,
+            STATE_CODES[profile.predicted_next_state], profile.emotional_journey_stage,
+            insight.tone, tuple(insight.products)
+        ))
+        session_events[session_id].append(event)
+
+    session_rows = {}
+    for session_id, recorded in session_events.items():
+        clock.advance_to(recorded[-1]['timestamp'])
+        analysis = behavioral.analyze_advanced_behavioral_patterns(user_id, session_id, recorded)
+        scores = analysis['behavioral_scores']
+        session_rows[session_id] = (
+            '|'.join(sorted(pattern.pattern_type.value for pattern in analysis['session_patterns'])),
+            float(scores.get('overall_engagement', 0.0)),
+            float(scores.get('decision_readiness', 0.0))
+        )
+
+    return UserReplay(event_rows, session_rows)
+
+
+# Per-process config stores, loaded once by the pool initializer
+_worker_stores: Dict[str, ModelConfigStore] = {}
+
+
+def _init_worker(baseline_path: str, candidate_path: str) -> None:
+    _worker_stores['baseline'] = ModelConfigStore(baseline_path)
+    _worker_stores['candidate'] = ModelConfigStore(candidate_path)
+
+
+def _replay_chunk(users: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Tuple[str, UserReplay, UserReplay]]:
+    return [
+        (user_id, replay_user(user_id, events, _worker_stores['baseline']),
+         replay_user(user_id, events, _worker_stores['candidate']))
+        for user_id, events in users
+    ]
+
+
+class ReplayDiff:
+    """Columnar baseline-vs-candidate diff: one row per event and one row per session"""
+
+    def __init__(self, event_columns: Dict[str, np.ndarray], session_columns: Dict[str, np.ndarray]):
+        self.event_columns = event_columns
+        self.session_columns = session_columns
+
+    @classmethod
+    def from_replays(cls, results: List[Tuple[str, UserReplay, UserReplay]]) -> 'ReplayDiff':
+        events: Dict[str, List[Any]] = {name: [] for name in (
+            'session_id', 'user_id', 'event_index', 'timestamp',
+            'baseline_state', 'candidate_state', 'baseline_intensity', 'candidate_intensity',
+            'baseline_confidence', 'candidate_confidence', 'baseline_next_state', 'candidate_next_state',
+            'stage_changed', 'tone_changed', 'products_changed'
+        )}
+        sessions: Dict[str, List[Any]] = {name: [] for name in (
+            'session_id', 'user_id', 'events', 'state_changes', 'baseline_patterns', 'candidate_patterns',
+            'patterns_changed', 'engagement_delta', 'decision_readiness_delta'
+        )}
+
+        for user_id, baseline, candidate in results:
+            changes: Dict[str, int] = {}
+            counts: Dict[str, int] = {}
+            for base_row, cand_row in zip(baseline.event_rows, candidate.event_rows):
+                session_id, index, timestamp, b_state, b_intensity, b_conf, b_next, b_stage, b_tone, b_products = base_row
+                _, _, _, c_state, c_intensity, c_conf, c_next, c_stage, c_tone, c_products = cand_row
+                events['session_id'].append(session_id)
+                events['user_id'].append(user_id)
+                events['event_index'].append(index)
+                events['timestamp'].append(timestamp)
+                events['baseline_state'].append(b_state)
+                events['candidate_state'].append(c_state)
+                events['baseline_intensity'].append(b_intensity)
+                events['candidate_intensity'].append(c_intensity)
+                events['baseline_confidence'].append(b_conf)
+                events['candidate_confidence'].append(c_conf)
+                events['baseline_next_state'].append(b_next)
+                events['candidate_next_state'].append(c_next)
+                events['stage_changed'].append(b_stage != c_stage)
+                events['tone_changed'].append(b_tone != c_tone)
+                events['products_changed'].append(b_products != c_products)
+                counts[session_id] = counts.get(session_id, 0) + 1
+                changes[session_id] = changes.get(session_id, 0) + (b_state != c_state)
+
+            for session_id, (b_patterns, b_engagement, b_readiness) in baseline.session_rows.items():
+                c_patterns, c_engagement, c_readiness = candidate.session_rows[session_id]
+                sessions['session_id'].append(session_id)
+                sessions['user_id'].append(user_id)
+                sessions['events'].append(counts.get(session_id, 0))
+                sessions['state_changes'].append(changes.get(session_id, 0))
+                sessions['baseline_patterns'].append(b_patterns)
+                sessions['candidate_patterns'].append(c_patterns)
+                sessions['patterns_changed'].append(b_patterns != c_patterns)
+                sessions['engagement_delta'].append(c_engagement - b_engagement)
+                sessions['decision_readiness_delta'].append(c_readiness - b_readiness)
+
+        event_types = {'event_index': np.int32, 'timestamp': 'datetime64[us]',
+                       'baseline_state': np.int8, 'candidate_state': np.int8,
+                       'baseline_intensity': np.int8, 'candidate_intensity': np.int8,
+                       'baseline_next_state': np.int8, 'candidate_next_state': np.int8,
+                       'baseline_confidence': np.float64, 'candidate_confidence': np.float64,
+                       'stage_changed': bool, 'tone_changed': bool, 'products_changed': bool}
+        session_types = {'events': np.int32, 'state_changes': np.int32, 'patterns_changed': bool,
+                         'engagement_delta': np.float64, 'decision_readiness_delta': np.float64}
+        return cls(
+            {name: np.array(values, dtype=event_types.get(name, str)) for name, values in events.items()},
+            {name: np.array(values, dtype=session_types.get(name, str)) for name, values in sessions.items()}
+        )
+
+    def summary(self) -> Dict[str, float]:
+        events = self.event_columns
+        total = len(events['session_id'])
+        if total == 0:
+            return {'events': 0, 'sessions': 0}
+        return {
+            'events': total,
+            'sessions': len(self.session_columns['session_id']),
+            'state_change_rate': float(np.mean(events['baseline_state'] != events['candidate_state'])),
+            'intensity_change_rate': float(np.mean(events['baseline_intensity'] != events['candidate_intensity'])),
+            'next_state_change_rate': float(np.mean(events['baseline_next_state'] != events['candidate_next_state'])),
+            'mean_confidence_delta': float(np.mean(events['candidate_confidence'] - events['baseline_confidence'])),
+            'tone_change_rate': float(np.mean(events['tone_changed'])),
+            'products_change_rate': float(np.mean(events['products_changed'])),
+            'session_pattern_change_rate': float(np.mean(self.session_columns['patterns_changed']))
+        }
+
+    def save(self, path: str) -> None:
+        """Write both tables to one compressed .npz (event_* and session_* arrays)"""
+        arrays = {f"event_{name}": column for name, column in self.event_columns.items()}
+        arrays.update({f"session_{name}": column for name, column in self.session_columns.items()})
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'ReplayDiff':
+        with np.load(path) as data:
+            return cls({name[6:]: data[name] for name in data.files if name.startswith('event_')},
+                       {name[8:]: data[name] for name in data.files if name.startswith('session_')})
+
+
+class ReplayEvaluator:
+    """Replays traffic under a baseline and a candidate config and diffs the results"""
+
+    def __init__(self, baseline_config: str, candidate_config: str, workers: Optional[int] = None,
+                 users_per_chunk: int = 64):
+        self.baseline_config = baseline_config
+        self.candidate_config = candidate_config
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.users_per_chunk = users_per_chunk
+
+    def evaluate(self, users: Dict[str, List[Dict[str, Any]]]) -> ReplayDiff:
+        items = list(users.items())
+        chunks = [items[start:start + self.users_per_chunk] for start in range(0, len(items), self.users_per_chunk)]
+
+        if self.workers <= 1:
+            _init_worker(self.baseline_config, self.candidate_config)
+            results = [row for chunk in chunks for row in _replay_chunk(chunk)]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.baseline_config, self.candidate_config)) as pool:
+                results = [row for rows in pool.map(_replay_chunk, chunks) for row in rows]
+
+        return ReplayDiff.from_replays(results)
+
+    def evaluate_file(self, path: str) -> ReplayDiff:
+        return self.evaluate(load_events(path))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Replay a recorded clickstream under two model configs")
+    parser.add_argument('events', help="NDJSON clickstream (session_id, user_id, timestamp, action, target, ...)")
+    parser.add_argument('candidate', help="candidate model config")
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'config', 'er_ai_models.json'))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='replay_diff.npz')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    diff = ReplayEvaluator(args.baseline, args.candidate, workers=args.workers).evaluate_file(args.events)
+    diff.save(args.output)
+    elapsed = time.perf_counter() - started
+
+    for name, value in diff.summary().items():
+        print(f"{name:28} {value}")
+    print(f"replayed in {elapsed:.1f}s, diff written to {args.output}")
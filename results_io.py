@@ -0,0 +1,233 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Results I/O
+=======================
+Columnar storage and streaming summaries for simulated test results.
+
+Results are NumPy structured arrays (task_completion_time,
+errors_encountered, user_satisfaction_score) stored as .npy files. A
+ResultsWriter appends chunks to a .npy file and patches the row count into
+its fixed-size header on close, so the simulator can write any number of
+rows in bulk without holding them all. Readers memory-map the file and
+walk it in chunks. The legacy comma-separated .txt files are read in
+chunks too.
+
+summarize_results() computes describe()-style statistics in one pass and
+bounded memory: exact count, mean, std, min and max, with quartiles from a
+KLL sketch, linearly interpolated between ranks as pandas does (exact until
+a column outgrows the sketch, approximate after that).
+"""
+
+import math
+import os
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from streaming_statistics import KLLSketch
+
+RESULT_DTYPE = np.dtype([
+    ('task_completion_time', '<f8'),
+    ('errors_encountered', '<i4'),
+    ('user_satisfaction_score', '<f8'),
+])
+RESULT_COLUMNS = RESULT_DTYPE.names
+
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Header padded to a fixed size so the final row count can be written in place
+_NPY_HEADER_SIZE = 256
+
+
+def as_results_array(results) -> np.ndarray:
+    """Structured results array from an array or a sequence of (time, errors, satisfaction) tuples"""
+    if isinstance(results, np.ndarray) and results.dtype == RESULT_DTYPE:
+        return results
+    if isinstance(results, np.ndarray) and results.dtype.names:
+        converted = np.empty(len(results), dtype=RESULT_DTYPE)
+        for name in RESULT_COLUMNS:
+            converted[name] = results[name]
+        return converted
+    return np.array([tuple(row) for row in results], dtype=RESULT_DTYPE)
+
+
+def _npy_header(dtype: np.dtype, rows: int) -> bytes:
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+    header = header.encode('latin1')
+    padding = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError("dtype description does not fit in the fixed .npy header")
+    body = header + b' ' * padding + b'\n'
+    return _NPY_MAGIC + len(body).to_bytes(2, 'little') + body
+
+
+class ResultsWriter:
+    """Appends result chunks to a .npy file; the row count is finalized on close"""
+
+    def __init__(self, path: str, dtype: np.dtype = RESULT_DTYPE):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.handle = open(path, 'wb')
+        self.handle.write(_npy_header(self.dtype, 0))
+
+    def __enter__(self) -> 'ResultsWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, chunk) -> None:
+        """Append a chunk of results (structured array or sequence of tuples)"""
+        chunk = as_results_array(chunk) if self.dtype == RESULT_DTYPE else np.asarray(chunk, dtype=self.dtype)
+        self.handle.write(np.ascontiguousarray(chunk).tobytes())
+        self.rows += len(chunk)
+
+    def close(self) -> None:
+        if self.handle.closed:
+            return
+        self.handle.seek(0)
+        self.handle.write(_npy_header(self.dtype, self.rows))
+        self.handle.close()
+
+
+def write_results(path: str, results) -> None:
+    """Write a whole results set to a .npy file in one bulk write"""
+    with ResultsWriter(path) as writer:
+        writer.write(results)
+
+
+def open_results(path: str) -> np.ndarray:
+    """Memory-map a .npy results file"""
+    return np.load(path, mmap_mode='r')
+
+
+def _parse_text_chunk(lines: List[str]) -> np.ndarray:
+    chunk = np.empty(len(lines), dtype=RESULT_DTYPE)
+    raw = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+    for index, name in enumerate(RESULT_COLUMNS):
+        chunk[name] = raw[:, index]
+    return chunk
+
+
+def iter_result_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[np.ndarray]:
+    """Yield a results file (.npy or legacy comma-separated text) as structured chunks"""
+    if path.endswith('.npy'):
+        results = open_results(path)
+        for start in range(0, len(results), chunk_rows):
+            yield results[start:start + chunk_rows]
+        return
+
+    with open(path, 'r', encoding='utf-8') as handle:
+        while True:
+            lines = [line for line in islice(handle, chunk_rows) if line.strip()]
+            if not lines:
+                return
+            yield _parse_text_chunk(lines)
+
+
+class ColumnSummary:
+    """One-pass count/mean/std/min/max (Chan merge) plus KLL quartiles for one column"""
+
+    def __init__(self, sketch_k: int = 400, seed: Optional[int] = 0):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self.sketch = KLLSketch(k=sketch_k, seed=seed)
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        batch_mean = float(values.mean())
+        deviations = values - batch_mean
+        self._merge_moments(values.size, batch_mean, float(deviations @ deviations))
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+        self.sketch.update(values)
+
+    def merge(self, other: 'ColumnSummary') -> None:
+        """Merge a summary of another chunk (e.g. from a worker process)"""
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self.sketch.merge(other.sketch)
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, as pandas describe() reports)"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+    def describe(self) -> Dict[str, float]:
+        if self.count == 0:
+            return {'count': 0}
+        q1, median, q3 = self.sketch.interpolated_quantiles([0.25, 0.5, 0.75])
+        return {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min_value,
+                '25%': q1, '50%': median, '75%': q3, 'max': self.max_value}
+
+
+def summarize_chunks(chunks: Iterable[np.ndarray], columns: Sequence[str] = RESULT_COLUMNS) -> Dict[str, ColumnSummary]:
+    summaries = {name: ColumnSummary() for name in columns}
+    for chunk in chunks:
+        for name in columns:
+            summaries[name].update(chunk[name])
+    return summaries
+
+
+def summarize_results(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, ColumnSummary]:
+    """Stream a results file once and summarize every column"""
+    return summarize_chunks(iter_result_chunks(path, chunk_rows))
+
+
+def format_describe(summaries: Dict[str, ColumnSummary]) -> str:
+    """Render summaries as a describe()-style table"""
+    names = list(summaries)
+    tables = {name: summaries[name].describe() for name in names}
+    rows = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+    width = max(len(name) for name in names) + 2
+    lines = [' ' * 6 + ''.join(f"{name:>{width}}" for name in names)]
+    for row in rows:
+        lines.append(f"{row:<6}" + ''.join(f"{tables[name].get(row, float('nan')):>{width}.6f}" for name in names))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(42)
+    path = os.path.join(tempfile.mkdtemp(), 'results.npy')
+    rows = 20_000_000
+    chunk = 1_000_000
+
+    started = time.perf_counter()
+    with ResultsWriter(path) as writer:
+        for _ in range(rows // chunk):
+            block = np.empty(chunk, dtype=RESULT_DTYPE)
+            block['task_completion_time'] = rng.uniform(10, 30, chunk)
+            block['errors_encountered'] = rng.integers(0, 2, chunk, endpoint=True)
+            block['user_satisfaction_score'] = rng.uniform(4.0, 5.0, chunk)
+            writer.write(block)
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summaries = summarize_results(path)
+    analyzed = time.perf_counter() - started
+
+    print(format_describe(summaries))
+    print(f"\nwrote {rows:,} rows in {written:.1f}s, summarized in {analyzed:.1f}s "
+          f"({os.path.getsize(path) / 1e6:.0f} MB)")
+    os.remove(path)
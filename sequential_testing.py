@@ -0,0 +1,176 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Sequential Testing
+==============================
+Early-stopping experiment mode for the quality simulator.
+
+Users are simulated in vectorized batches per quality level. Only running
+moments are kept per (level, metric). After every batch each comparison
+is scored with a mixture SPRT (mSPRT): a normal mixture over the effect
+size gives a likelihood ratio that is valid at every look, and
+p_n = min(p_{n-1}, 1 / Lambda_n) is an always-valid p-value. A comparison
+is conclusive as soon as p_n drops below its Bonferroni share of alpha.
+Levels whose comparisons are all settled stop being simulated, and the run
+ends when nothing is left open (or max_users is reached).
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from quality_simulation import MonteCarloSimulator, chunk_generator
+from results_io import RESULT_COLUMNS
+from streaming_statistics import DecayedMoments
+
+
+def msprt_likelihood_ratio(n: int, mean_difference: float, variance: float, tau2: float) -> float:
+    """
+    Normal-mixture SPRT statistic for n paired observations of a difference
+    with per-pair variance `variance` and mixing variance tau2 on the effect.
+    """
+    if n == 0 or variance <= 0:
+        return 1.0
+    spread = variance + n * tau2
+    log_ratio = 0.5 * math.log(variance / spread) + (n * n * tau2 * mean_difference ** 2) / (2.0 * variance * spread)
+    return math.exp(min(log_ratio, 700.0))
+
+
+@dataclass
+class SequentialComparison:
+    """Always-valid state of one (treatment, control, metric) comparison"""
+    treatment: str
+    control: str
+    metric: str
+    alpha: float
+    p_value: float = 1.0
+    mean_difference: float = 0.0
+    decided_at: Optional[int] = None  # users per level when it became conclusive
+
+    @property
+    def conclusive(self) -> bool:
+        return self.decided_at is not None
+
+
+@dataclass
+class SequentialResult:
+    """Outcome of a sequential run"""
+    seed: int
+    comparisons: List[SequentialComparison]
+    users_per_level: Dict[str, int]
+    batches: int
+    stopped_early: bool
+    max_users: int
+
+    @property
+    def users_simulated(self) -> int:
+        return sum(self.users_per_level.values())
+
+    @property
+    def users_saved(self) -> int:
+        """Users a fixed-horizon run at max_users would have simulated beyond this one"""
+        return self.max_users * len(self.users_per_level) - self.users_simulated
+
+
+@dataclass
+class SequentialExperiment:
+    """
+    mSPRT early stopping over a MonteCarloSimulator's quality levels.
+    Every level is compared against `control` (default: the first level) on
+    every metric; stop_on='any' settles a level pair at its first
+    conclusive metric, 'all' waits for every metric.
+    """
+    simulator: MonteCarloSimulator
+    alpha: float = 0.05
+    batch_size: int = 10_000
+    max_users: int = 10_000_000
+    effect_size: float = 0.1  # mixture scale in standard deviations of one observation
+    metrics: Sequence[str] = RESULT_COLUMNS
+    control: Optional[str] = None
+    stop_on: str = 'any'
+    comparisons: List[SequentialComparison] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.stop_on not in ('any', 'all'):
+            raise ValueError("stop_on must be 'any' or 'all'")
+        levels = list(self.simulator.profiles)
+        self.control = self.control or levels[0]
+        treatments = [level for level in levels if level != self.control]
+        # Bonferroni split, so the family of comparisons keeps error rate alpha
+        share = self.alpha / max(1, len(treatments) * len(self.metrics))
+        self.comparisons = [SequentialComparison(level, self.control, metric, share)
+                            for level in treatments for metric in self.metrics]
+
+    def _pair_settled(self, treatment: str) -> bool:
+        decided = [comparison.conclusive for comparison in self.comparisons if comparison.treatment == treatment]
+        return any(decided) if self.stop_on == 'any' else all(decided)
+
+    def _active_levels(self) -> List[str]:
+        open_treatments = [level for level in dict.fromkeys(c.treatment for c in self.comparisons)
+                           if not self._pair_settled(level)]
+        return ([self.control] + open_treatments) if open_treatments else []
+
+    def run(self) -> SequentialResult:
+        simulator = self.simulator
+        moments: Dict[Tuple[str, str], DecayedMoments] = {
+            (level, metric): DecayedMoments(decay=1.0) for level in simulator.profiles for metric in self.metrics
+        }
+        users = {level: 0 for level in simulator.profiles}
+        batches = 0
+
+        active = self._active_levels()
+        while active and users[self.control] < self.max_users:
+            size = min(self.batch_size, self.max_users - users[self.control])
+            for level in active:
+                # Same stream a fixed-horizon run with chunk_size == batch_size would draw
+                rng = chunk_generator(simulator.seed, simulator._level_index(level), batches)
+                results = simulator.profiles[level].simulate(rng, size)
+                for metric in self.metrics:
+                    moments[(level, metric)].update(results[metric])
+                users[level] += size
+            batches += 1
+
+            for comparison in self.comparisons:
+                if comparison.conclusive or comparison.treatment not in active:
+                    continue
+                treatment = moments[(comparison.treatment, comparison.metric)]
+                control = moments[(comparison.control, comparison.metric)]
+                n = users[comparison.treatment]
+                variance = treatment.variance + control.variance
+                tau2 = (self.effect_size ** 2) * variance / 2.0
+                comparison.mean_difference = treatment.mean - control.mean
+                ratio = msprt_likelihood_ratio(n, comparison.mean_difference, variance, tau2)
+                comparison.p_value = min(comparison.p_value, 1.0 / ratio)
+                if comparison.p_value <= comparison.alpha:
+                    comparison.decided_at = n
+            active = self._active_levels()
+
+        return SequentialResult(simulator.seed, self.comparisons, users, batches,
+                                stopped_early=not active, max_users=self.max_users)
+
+
+if __name__ == "__main__":
+    import time
+
+    from quality_simulation import DEFAULT_PROFILES, Distribution, QualityProfile
+
+    profiles = dict(DEFAULT_PROFILES)
+    # Levels progressively closer to 'high', so they need progressively more users to separate
+    for name, shift in (('near_high', 0.5), ('very_near_high', 0.1)):
+        profiles[name] = QualityProfile(
+            name,
+            task_completion_time=Distribution('uniform', (10.0 + shift, 30.0 + shift)),
+            errors_encountered=Distribution('integers', (0, 1)),
+            user_satisfaction_score=Distribution('uniform', (4.0 - shift / 10, 5.0 - shift / 10)),
+        )
+
+    started = time.perf_counter()
+    experiment = SequentialExperiment(MonteCarloSimulator(profiles, seed=11), batch_size=5_000, max_users=5_000_000)
+    result = experiment.run()
+    elapsed = time.perf_counter() - started
+
+    for comparison in result.comparisons:
+        status = f"conclusive at {comparison.decided_at:,} users" if comparison.conclusive else "open"
+        print(f"{comparison.treatment:>15} vs {comparison.control} {comparison.metric:<24} "
+              f"diff {comparison.mean_difference:+8.4f}  p {comparison.p_value:.2e}  {status}")
+    print(f"\n{result.users_simulated:,} users simulated in {result.batches} batches ({elapsed * 1000:.0f} ms); "
+          f"a fixed {result.max_users:,}-user run would need {result.users_saved:,} more")
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink ER-AI Session Snapshots
+===================================
+Compact, versioned binary snapshots of an EnhancedEmotionalResonanceAI
+session: its interaction history, emotional history (which stability and
+momentum depend on), behavioral patterns and session data.
+
+A snapshot is either FULL or a DELTA carrying only the records appended
+since an earlier snapshot, so a session can be checkpointed continuously
+and moved to another worker without replaying its events.
+
+Layout (little endian):
+    header   magic 'ERSS', u16 version, u8 kind, u8 reserved,
+             u32 base interactions, u32 base profiles
+    strings  u32 count, then (u32 length, utf-8 bytes) per string
+    records  u32 interaction count, interaction records (each followed by its
+             trajectory points and, since version 2, a u8 flag and the
+             trajectory features when present),
+             u32 profile count, profile records
+    state    u32 string index of the JSON-encoded patterns/session data
+Every repeated string (actions, targets, states, triggers, dict keys) is
+stored once in the string table and referenced by index.
+
+Interaction contexts and session state are JSON. Since version 3 datetimes
+in them are stored as {"$datetime": ISO 8601} and decoded back to
+datetimes; any other value JSON cannot represent is rejected with
+SnapshotError rather than stored as its str().
+"""
+
+import json
+import struct
+from dataclasses import astuple
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from er_ai_enhanced import (EmotionalIntensity, EmotionalProfile, EmotionalState, EnhancedEmotionalResonanceAI,
+                            TrajectoryFeatures, UserInteraction)
+
+MAGIC = b'ERSS'
+SNAPSHOT_VERSION = 3
+# Versions decode_session still reads; version 1 has no trajectory features,
+# versions before 3 stored datetimes in contexts and state as plain strings
+READABLE_VERSIONS = (1, 2, 3)
+
+FULL = 0
+DELTA = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+_HEADER = struct.Struct('<4sHBBII')
+_COUNT = struct.Struct('<I')
+# timestamp (µs), tz flag, action, target, duration, scroll velocity, dwell, pressure,
+# orientation, session id, context, trajectory point count
+_INTERACTION = struct.Struct('<qBIIddddIIII')
+_POINT = struct.Struct('<dd')
+# points, kept points, duration, path length, straightness, mean/peak speed, jerk, curvature,
+# pause count, pause time (TrajectoryFeatures field order)
+_TRAJECTORY_FEATURES = struct.Struct('<II7dId')
+_FLAG = struct.Struct('<B')
+# primary, secondary, intensity, confidence, stability, momentum, predicted next, journey stage
+_PROFILE = struct.Struct('<IIIdddII')
+# Trajectory point count meaning "mouse_trajectory is None"
+_NO_TRAJECTORY = 0xFFFFFFFF
+
+_STATES = {state.value: state for state in EmotionalState}
+
+# (interaction count, profile count) already covered by a previous snapshot
+SnapshotMark = Tuple[int, int]
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is malformed, from an unknown version, or does not fit the target session"""
+
+
+class _StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return position
+
+    def encode(self) -> bytes:
+        parts = [_COUNT.pack(len(self.strings))]
+        for value in self.strings:
+            data = value.encode('utf-8')
+            parts.append(_COUNT.pack(len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+
+def _encode_timestamp(timestamp: datetime) -> Tuple[int, int]:
+    if timestamp.tzinfo is not None:
+        return (timestamp.astimezone(timezone.utc).replace(tzinfo=None) - _EPOCH) // _MICROSECOND, 1
+    return (timestamp - _EPOCH) // _MICROSECOND, 0
+
+
+def _decode_timestamp(micros: int, aware: int) -> datetime:
+    timestamp = _EPOCH + timedelta(microseconds=micros)
+    return timestamp.replace(tzinfo=timezone.utc) if aware else timestamp
+
+
+_DATETIME_TAG = '$datetime'
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    raise SnapshotError(f"cannot snapshot a {type(value).__name__} value: {value!r}")
+
+
+def _json_object(mapping: Dict[str, Any]) -> Any:
+    if len(mapping) == 1 and _DATETIME_TAG in mapping:
+        return datetime.fromisoformat(mapping[_DATETIME_TAG])
+    return mapping
+
+
+def _encode_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+
+def _decode_json(text: str) -> Any:
+    return json.loads(text, object_hook=_json_object)
+
+
+_LAYOUTS: Dict[Tuple[int, str], struct.Struct] = {}
+
+
+def _layout(count: int, codes: str) -> struct.Struct:
+    """Cached struct for `count` repetitions of each type code, e.g. (3, 'Id') -> '<3I3d'"""
+    layout = _LAYOUTS.get((count, codes))
+    if layout is None:
+        layout = _LAYOUTS[(count, codes)] = struct.Struct('<' + ''.join(f'{count}{code}' for code in codes))
+    return layout
+
+
+def _encode_mapping(mapping: Dict[str, float], strings: _StringTable, parts: List[bytes]) -> None:
+    """u32 count, then every key index, then every value"""
+    parts.append(_COUNT.pack(len(mapping)))
+    if mapping:
+        parts.append(_layout(len(mapping), 'Id').pack(*(strings(key) for key in mapping), *mapping.values()))
+
+
+def _encode_list(values: List[str], strings: _StringTable, parts: List[bytes]) -> None:
+    parts.append(_COUNT.pack(len(values)))
+    if values:
+        parts.append(_layout(len(values), 'I').pack(*(strings(value) for value in values)))
+
+
+def snapshot_mark(engine: EnhancedEmotionalResonanceAI) -> SnapshotMark:
+    """Position a later delta should start from"""
+    return len(engine.interaction_history), len(engine.emotional_history)
+
+
+def encode_session(engine: EnhancedEmotionalResonanceAI, since: Optional[SnapshotMark] = None) -> bytes:
+    """Full snapshot of a session, or a delta of everything appended after `since`"""
+    base_interactions, base_profiles = since or (0, 0)
+    if base_interactions > len(engine.interaction_history) or base_profiles > len(engine.emotional_history):
+        raise SnapshotError("delta base is ahead of the session state")
+
+    strings = _StringTable()
+    parts: List[bytes] = []
+
+    interactions = engine.interaction_history[base_interactions:]
+    parts.append(_COUNT.pack(len(interactions)))
+    for interaction in interactions:
+        micros, aware = _encode_timestamp(interaction.timestamp)
+        trajectory = interaction.mouse_trajectory
+        parts.append(_INTERACTION.pack(
+            micros, aware, strings(interaction.action), strings(interaction.target),
+            interaction.duration, interaction.scroll_velocity, interaction.dwell_time, interaction.click_pressure,
+            strings(interaction.device_orientation), strings(interaction.session_id),
+            strings(_encode_json(interaction.context)),
+            _NO_TRAJECTORY if trajectory is None else len(trajectory)
+        ))
+        if trajectory:
+            parts.extend(_POINT.pack(x, y) for x, y in trajectory)
+        features = interaction.trajectory_features
+        parts.append(_FLAG.pack(features is not None))
+        if features is not None:
+            parts.append(_TRAJECTORY_FEATURES.pack(*astuple(features)))
+
+    profiles = engine.emotional_history[base_profiles:]
+    parts.append(_COUNT.pack(len(profiles)))
+    for profile in profiles:
+        parts.append(_PROFILE.pack(
+            strings(profile.primary_state.value), strings(profile.secondary_state.value),
+            strings(profile.intensity.value), profile.confidence, profile.stability, profile.emotional_momentum,
+            strings(profile.predicted_next_state.value), strings(profile.emotional_journey_stage)
+        ))
+        _encode_list(profile.triggers, strings, parts)
+        _encode_list([state.value for state in profile.micro_states], strings, parts)
+        _encode_mapping(profile.transition_probability, strings, parts)
+        _encode_mapping(profile.contextual_factors, strings, parts)
+
+    state = {'behavioral_patterns': engine.behavioral_patterns, 'session_data': engine.session_data}
+    parts.append(_COUNT.pack(strings(_encode_json(state))))
+
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, DELTA if since else FULL, 0, base_interactions, base_profiles)
+    return header + strings.encode() + b''.join(parts)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def take(self, layout: struct.Struct) -> Tuple:
+        values = layout.unpack_from(self.view, self.offset)
+        self.offset += layout.size
+        return values
+
+    def count(self) -> int:
+        return self.take(_COUNT)[0]
+
+    def indices(self) -> Tuple[int, ...]:
+        count = self.count()
+        if not count:
+            return ()
+        return self.take(_layout(count, 'I'))
+
+    def mapping(self, strings: List[str]) -> Dict[str, float]:
+        count = self.count()
+        if not count:
+            return {}
+        values = self.take(_layout(count, 'Id'))
+        return {strings[key]: value for key, value in zip(values[:count], values[count:])}
+
+
+def decode_session(data: bytes) -> Dict[str, Any]:
+    """Parse a snapshot into its header fields, records and state"""
+    reader = _Reader(data)
+    try:
+        magic, version, kind, _, base_interactions, base_profiles = reader.take(_HEADER)
+        if magic != MAGIC:
+            raise SnapshotError("not a session snapshot")
+        if version not in READABLE_VERSIONS:
+            raise SnapshotError(f"unsupported snapshot version {version}")
+
+        strings = []
+        for _ in range(reader.count()):
+            length = reader.count()
+            strings.append(bytes(reader.view[reader.offset:reader.offset + length]).decode('utf-8'))
+            reader.offset += length
+
+        states = _STATES
+        contexts: Dict[int, Dict[str, Any]] = {}
+
+        interactions = []
+        for _ in range(reader.count()):
+            (micros, aware, action, target, duration, scroll_velocity, dwell_time, click_pressure,
+             orientation, session_id, context, points) = reader.take(_INTERACTION)
+            if context not in contexts:
+                contexts[context] = _decode_json(strings[context])
+            trajectory = None if points == _NO_TRAJECTORY else [reader.take(_POINT) for _ in range(points)]
+            features = None
+            if version >= 2 and reader.take(_FLAG)[0]:
+                features = TrajectoryFeatures(*reader.take(_TRAJECTORY_FEATURES))
+            interactions.append(UserInteraction(
+                timestamp=_decode_timestamp(micros, aware),
+                action=strings[action],
+                target=strings[target],
+                duration=duration,
+                context=dict(contexts[context]),
+                scroll_velocity=scroll_velocity,
+                dwell_time=dwell_time,
+                click_pressure=click_pressure,
+                mouse_trajectory=trajectory,
+                device_orientation=strings[orientation],
+                session_id=strings[session_id],
+                trajectory_features=features
+            ))
+
+        profiles = []
+        for _ in range(reader.count()):
+            (primary, secondary, intensity, confidence, stability, momentum,
+             predicted, stage) = reader.take(_PROFILE)
+            triggers = [strings[index] for index in reader.indices()]
+            micro_states = [states[strings[index]] for index in reader.indices()]
+            profiles.append(EmotionalProfile(
+                primary_state=states[strings[primary]],
+                secondary_state=states[strings[secondary]],
+                intensity=EmotionalIntensity(strings[intensity]),
+                confidence=confidence,
+                triggers=triggers,
+                stability=stability,
+                micro_states=micro_states,
+                transition_probability=reader.mapping(strings),
+                emotional_momentum=momentum,
+                contextual_factors=reader.mapping(strings),
+                predicted_next_state=states[strings[predicted]],
+                emotional_journey_stage=strings[stage]
+            ))
+
+        state = _decode_json(strings[reader.count()])
+    except (struct.error, IndexError, KeyError, ValueError) as error:
+        if isinstance(error, SnapshotError):
+            raise
+        raise SnapshotError(f"corrupt session snapshot: {error}") from error
+
+    return {
+        'kind': kind,
+        'base': (base_interactions, base_profiles),
+        'interactions': interactions,
+        'profiles': profiles,
+        'behavioral_patterns': state['behavioral_patterns'],
+        'session_data': state['session_data']
+    }
+
+
+def restore_session(data: bytes, engine: Optional[EnhancedEmotionalResonanceAI] = None,
+                    engine_factory=EnhancedEmotionalResonanceAI) -> EnhancedEmotionalResonanceAI:
+    """
+    Apply a snapshot. A FULL snapshot replaces the engine's session state (a new
+    engine is created when none is given); a DELTA must be applied to an engine
+    whose state is exactly at the delta's base.
+    """
+    decoded = decode_session(data)
+
+    if decoded['kind'] == FULL:
+        engine = engine if engine is not None else engine_factory()
+        engine.interaction_history = decoded['interactions']
+        engine.emotional_history = decoded['profiles']
+    else:
+        if engine is None:
+            raise SnapshotError("a delta snapshot needs the engine it was taken against")
+        if snapshot_mark(engine) != decoded['base']:
+            raise SnapshotError(f"delta base {decoded['base']} does not match session state {snapshot_mark(engine)}")
+        engine.interaction_history.extend(decoded['interactions'])
+        engine.emotional_history.extend(decoded['profiles'])
+
+    engine.behavioral_patterns = decoded['behavioral_patterns']
+    engine.session_data = decoded['session_data']
+    return engine
+
+
+class SessionCheckpointer:
+    """Produces a full snapshot first, then deltas since the previous checkpoint"""
+
+    def __init__(self, engine: EnhancedEmotionalResonanceAI):
+        self.engine = engine
+        self.mark: Optional[SnapshotMark] = None
+
+    def checkpoint(self) -> bytes:
+        data = encode_session(self.engine, since=self.mark)
+        self.mark = snapshot_mark(self.engine)
+        return data
+
+    def reset(self) -> None:
+        """Make the next checkpoint a full snapshot again"""
+        self.mark = None
+
+
+if __name__ == "__main__":
+    import time
+
+    engine = EnhancedEmotionalResonanceAI()
+    for step in range(40):
+        engine.track_enhanced_interaction(['view', 'hover', 'search', 'add_to_cart'][step % 4],
+                                          f"product_{step % 7}", duration=1.0 + step % 5)
+
+    checkpointer = SessionCheckpointer(engine)
+    full = checkpointer.checkpoint()
+    engine.track_enhanced_interaction('add_to_cart', 'product_3', duration=2.0)
+    delta = checkpointer.checkpoint()
+
+    started = time.perf_counter()
+    migrated = restore_session(full)
+    restore_session(delta, migrated)
+    elapsed_us = (time.perf_counter() - started) * 1e6
+
+    print(f"full snapshot: {len(full)} bytes ({len(engine.interaction_history)} interactions), "
+          f"delta: {len(delta)} bytes, restore: {elapsed_us:.0f}µs")
+    print(f"migrated state matches: {migrated.emotional_history == engine.emotional_history}")
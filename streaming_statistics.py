@@ -0,0 +1,383 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Streaming Statistics
+================================
+Constant-memory accumulators for long-term behavioral profiles and
+unbounded event streams.
+
+The decayed accumulators absorb a whole session at a time and age
+everything seen before it. The KLL sketch and trend accumulator are
+undecayed, mergeable summaries that can be maintained per session, per
+user or per shard and combined afterwards. None of them keep raw
+observations.
+"""
+
+import numpy as np
+from typing import List, Sequence
+
+
+class DecayedMoments:
+    """Exponentially-decayed running mean and variance (Welford/Chan merge)"""
+
+    def __init__(self, decay: float = 0.8):
+        if not 0.0 < decay <= 1.0:
+            raise ValueError("decay must be in (0, 1]")
+        self.decay = decay
+        self.weight = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: Sequence[float]) -> None:
+        """Decay the existing moments and merge in a batch of new observations"""
+        values = np.asarray(values, dtype=np.float64)
+        self.weight *= self.decay
+        self.m2 *= self.decay
+
+        if values.size == 0:
+            return
+
+        batch_weight = float(values.size)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        self._merge(batch_weight, batch_mean, batch_m2)
+
+    def update_value(self, value: float) -> None:
+        """Decay the existing moments and merge in a single observation"""
+        self.update([value])
+
+    def merge(self, other: 'DecayedMoments') -> None:
+        """Merge another accumulator into this one without applying decay"""
+        if other.weight > 0:
+            self._merge(other.weight, other.mean, other.m2)
+
+    def _merge(self, weight: float, mean: float, m2: float) -> None:
+        total = self.weight + weight
+        delta = mean - self.mean
+        self.mean += delta * weight / total
+        self.m2 += m2 + delta * delta * self.weight * weight / total
+        self.weight = total
+
+    @property
+    def variance(self) -> float:
+        """Weighted population variance"""
+        return self.m2 / self.weight if self.weight > 0 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def __bool__(self) -> bool:
+        return self.weight > 0
+
+
+class DecayedHistogramSketch:
+    """Geometric-bucket histogram with exponential decay, used for percentile estimates"""
+
+    def __init__(self, low: float = 1.0, high: float = 10000.0, num_buckets: int = 64,
+                 decay: float = 0.8):
+        if not 0.0 < low < high:
+            raise ValueError("bucket bounds must satisfy 0 < low < high")
+        self.decay = decay
+        self.edges = np.geomspace(low, high, num_buckets + 1)
+        # Bucket 0 is underflow (< low), the last bucket is overflow (>= high)
+        self.counts = np.zeros(num_buckets + 2, dtype=np.float64)
+        self.min_value = np.inf
+        self.max_value = -np.inf
+
+    def update(self, values: Sequence[float]) -> None:
+        """Decay existing counts and add a batch of new observations"""
+        values = np.asarray(values, dtype=np.float64)
+        self.counts *= self.decay
+
+        if values.size == 0:
+            return
+
+        buckets = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(buckets, minlength=len(self.counts))
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+
+    def merge(self, other: 'DecayedHistogramSketch') -> None:
+        """Merge another sketch with identical bucket edges"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("cannot merge sketches with different bucket edges")
+        self.counts += other.counts
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    @property
+    def total_weight(self) -> float:
+        return float(self.counts.sum())
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-th quantile (0-1) by interpolating inside the target bucket"""
+        total = self.total_weight
+        if total <= 0:
+            raise ValueError("quantile of an empty sketch")
+
+        cumulative = np.cumsum(self.counts)
+        target = q * total
+        bucket = int(np.searchsorted(cumulative, target, side='left'))
+        bucket = min(bucket, len(self.counts) - 1)
+
+        # Bucket bounds, clamped to the observed range
+        lower = self.edges[bucket - 1] if bucket > 0 else self.min_value
+        upper = self.edges[bucket] if bucket < len(self.edges) else self.max_value
+        lower = max(lower, self.min_value)
+        upper = min(upper, self.max_value)
+        if upper <= lower:
+            return float(lower)
+
+        previous = cumulative[bucket - 1] if bucket > 0 else 0.0
+        fraction = (target - previous) / max(self.counts[bucket], 1e-12)
+        fraction = min(1.0, max(0.0, fraction))
+        return float(lower + (upper - lower) * fraction)
+
+    def percentiles(self, percentiles: Sequence[float]) -> List[float]:
+        """Estimate several percentiles (0-100) at once"""
+        return [self.quantile(p / 100.0) for p in percentiles]
+
+    def __bool__(self) -> bool:
+        return self.total_weight > 0
+
+
+class KLLSketch:
+    """
+    Mergeable KLL quantile sketch.
+    Keeps O(k log n) items regardless of stream length; rank error is roughly 1.7/k.
+    """
+
+    def __init__(self, k: int = 200, seed: int = None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self.min_value = np.inf
+        self.max_value = -np.inf
+        self.compactors: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def update(self, values: Sequence[float]) -> None:
+        """Add a batch of observations"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+
+        self.count += values.size
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+
+        if values.size > 8 * self.k:
+            # Bulk batch: sort once and keep every 2^level-th item, which is what
+            # `level` rounds of compaction would do, instead of cascading through them
+            level = int(np.ceil(np.log2(values.size / self.k)))
+            stride = 1 << level
+            sampled = np.sort(values)[int(self._rng.integers(0, stride))::stride]
+            while len(self.compactors) <= level:
+                self.compactors.append(np.empty(0, dtype=np.float64))
+            self.compactors[level] = np.concatenate([self.compactors[level], sampled])
+        else:
+            self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> None:
+        """Merge another sketch (e.g. from a different shard) into this one"""
+        if other.count == 0:
+            return
+
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+
+        self.count += other.count
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0, dtype=np.float64))
+
+                items = np.sort(items)
+                # An odd item out stays at this level
+                kept = items[:len(items) % 2]
+                paired = items[len(items) % 2:]
+                offset = int(self._rng.integers(0, 2))
+                promoted = paired[offset::2]
+
+                self.compactors[level] = kept
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+            level += 1
+
+    def _weighted_items(self):
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([
+            np.full(len(items), 2.0 ** level) for level, items in enumerate(self.compactors)
+        ])
+        order = np.argsort(values, kind='mergesort')
+        return values[order], weights[order]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Estimate several quantiles (0-1) at once"""
+        if self.count == 0:
+            raise ValueError("quantile of an empty sketch")
+
+        values, weights = self._weighted_items()
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min_value)
+            elif q >= 1:
+                results.append(self.max_value)
+            else:
+                index = int(np.searchsorted(cumulative, q * total, side='left'))
+                results.append(float(values[min(index, len(values) - 1)]))
+        return results
+
+    def interpolated_quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        Quantiles (0-1) interpolated linearly between neighbouring ranks, like
+        numpy's and pandas' default. Exact while the sketch holds every item;
+        afterwards each retained item stands at the middle of the ranks it covers.
+        """
+        if self.count == 0:
+            raise ValueError("quantile of an empty sketch")
+
+        values, weights = self._weighted_items()
+        # 0-based rank of each retained item: the middle of the ranks its weight covers
+        ranks = np.cumsum(weights) - (weights + 1.0) / 2.0
+        last = self.count - 1
+        if ranks[0] > 0:
+            ranks, values = np.concatenate([[0.0], ranks]), np.concatenate([[self.min_value], values])
+        if ranks[-1] < last:
+            ranks, values = np.concatenate([ranks, [last]]), np.concatenate([values, [self.max_value]])
+        positions = np.clip(np.asarray(qs, dtype=np.float64), 0.0, 1.0) * last
+        return [float(value) for value in np.interp(positions, ranks, values)]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def percentiles(self, percentiles: Sequence[float]) -> List[float]:
+        """Estimate several percentiles (0-100) at once"""
+        return self.quantiles([p / 100.0 for p in percentiles])
+
+    def mean_above(self, threshold: float) -> float:
+        """Approximate mean of the observations strictly above a threshold"""
+        values, weights = self._weighted_items()
+        above = values > threshold
+        if not above.any():
+            return float('nan')
+        return float(np.average(values[above], weights=weights[above]))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class OnlineTrendAccumulator:
+    """
+    Running least-squares slope of a signal against its position in the stream.
+    Matches np.polyfit(range(n), values, 1)[0] without keeping the values, and
+    merges shards in stream order.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xx = 0.0
+        self.c_xy = 0.0
+        self.c_yy = 0.0
+        self.max_value = -np.inf
+
+    def update(self, values: Sequence[float]) -> None:
+        """Append a batch of observations to the end of the stream"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+
+        positions = np.arange(self.count, self.count + values.size, dtype=np.float64)
+        batch = OnlineTrendAccumulator()
+        batch.count = values.size
+        batch.mean_x = float(positions.mean())
+        batch.mean_y = float(values.mean())
+        dx = positions - batch.mean_x
+        dy = values - batch.mean_y
+        batch.c_xx = float(dx @ dx)
+        batch.c_xy = float(dx @ dy)
+        batch.c_yy = float(dy @ dy)
+        batch.max_value = float(values.max())
+        self._combine(batch)
+
+    def merge(self, other: 'OnlineTrendAccumulator') -> None:
+        """Append another accumulator's stream after this one"""
+        if other.count == 0:
+            return
+
+        shifted = OnlineTrendAccumulator()
+        shifted.count = other.count
+        shifted.mean_x = other.mean_x + self.count
+        shifted.mean_y = other.mean_y
+        shifted.c_xx = other.c_xx
+        shifted.c_xy = other.c_xy
+        shifted.c_yy = other.c_yy
+        shifted.max_value = other.max_value
+        self._combine(shifted)
+
+    def _combine(self, other: 'OnlineTrendAccumulator') -> None:
+        total = self.count + other.count
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        factor = self.count * other.count / total
+
+        self.c_xx += other.c_xx + dx * dx * factor
+        self.c_xy += other.c_xy + dx * dy * factor
+        self.c_yy += other.c_yy + dy * dy * factor
+        self.mean_x += dx * other.count / total
+        self.mean_y += dy * other.count / total
+        self.max_value = max(self.max_value, other.max_value)
+        self.count = total
+
+    @property
+    def slope(self) -> float:
+        return self.c_xy / self.c_xx if self.c_xx > 0 else 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.mean_y
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the signal"""
+        return float(np.sqrt(self.c_yy / self.count)) if self.count else 0.0
+
+
+class SignalStream:
+    """Quantile sketch plus trend accumulator for one behavioral signal"""
+
+    def __init__(self, k: int = 200, seed: int = None):
+        self.sketch = KLLSketch(k=k, seed=seed)
+        self.trend = OnlineTrendAccumulator()
+
+    def update(self, values: Sequence[float]) -> None:
+        self.sketch.update(values)
+        self.trend.update(values)
+
+    def merge(self, other: 'SignalStream') -> None:
+        """Merge a shard that follows this one in stream order"""
+        self.sketch.merge(other.sketch)
+        self.trend.merge(other.trend)
+
+    def __len__(self) -> int:
+        return self.trend.count
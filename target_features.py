@@ -0,0 +1,158 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Target Features
+===========================
+Interned interaction targets with precomputed feature bitmasks.
+
+The analyzers keep asking whether a target string contains a trigger or
+category keyword ('price', 'review', 'price_comparison', ...). A
+TargetFeatureTable assigns every keyword a bit and, the first time it sees
+a target, runs the substring checks once to build that target's mask and
+gives the target an integer ID. From then on every check is a dict hit and
+a bitwise AND. The table is a bounded LRU shared by every session that uses
+the same compiled model config (it is rebuilt when the config reloads,
+since the trigger vocabulary comes from the config).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Sequence, Tuple
+
+from model_config import CompiledModelConfig, register_precompiled
+
+# Category keywords the analyzers test targets against, besides the micro-state triggers
+CATEGORY_FEATURES = ('product', 'price', 'story', 'sustainability', 'review')
+
+DEFAULT_MAX_TARGETS = 65536
+
+
+class TargetFeatureTable:
+    """Bounded LRU from target string to (target ID, feature bitmask)"""
+
+    def __init__(self, features: Sequence[str], max_targets: int = DEFAULT_MAX_TARGETS):
+        if max_targets < 1:
+            raise ValueError("max_targets must be at least 1")
+        self.features = tuple(dict.fromkeys(features))
+        self.bits: Dict[str, int] = {feature: 1 << index for index, feature in enumerate(self.features)}
+        self.max_targets = max_targets
+        self._entries: 'OrderedDict[str, Tuple[int, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def for_config(cls, config: CompiledModelConfig) -> 'TargetFeatureTable':
+        """Category keywords plus every micro-state trigger in the config"""
+        features = list(CATEGORY_FEATURES)
+        for pattern in config.enhanced['micro_state_patterns'].values():
+            features.extend(pattern['triggers'])
+        return cls(features)
+
+    def mask_of(self, *features: str) -> int:
+        """Bitmask of the given keywords (raises KeyError for unknown ones)"""
+        mask = 0
+        for feature in features:
+            mask |= self.bits[feature]
+        return mask
+
+    def lookup(self, target: str) -> Tuple[int, int]:
+        """(target ID, feature mask) of a target, computing it on first sight"""
+        entry = self._entries.get(target)
+        if entry is not None:
+            try:
+                self._entries.move_to_end(target)
+            except KeyError:  # evicted by another thread in between
+                pass
+            return entry
+        return self._insert(target)
+
+    def _insert(self, target: str) -> Tuple[int, int]:
+        mask = 0
+        for feature, bit in self.bits.items():
+            if feature in target:
+                mask |= bit
+        with self._lock:
+            entry = self._entries.get(target)
+            if entry is None:
+                entry = (self._next_id, mask)
+                self._next_id += 1
+                self._entries[target] = entry
+                self.misses += 1
+                while len(self._entries) > self.max_targets:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def mask(self, target: str) -> int:
+        return self.lookup(target)[1]
+
+    def intern(self, target: str) -> int:
+        return self.lookup(target)[0]
+
+    def union_mask(self, targets: Iterable[str]) -> int:
+        """OR of the masks of several targets, e.g. a session's recent targets"""
+        mask = 0
+        for target in targets:
+            mask |= self.lookup(target)[1]
+        return mask
+
+    def has(self, target: str, mask: int) -> bool:
+        """Whether the target contains any keyword in mask"""
+        return bool(self.lookup(target)[1] & mask)
+
+    def stats(self) -> Dict[str, int]:
+        return {'targets': len(self._entries), 'features': len(self.features),
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def target_features(config: CompiledModelConfig) -> TargetFeatureTable:
+    """The feature table shared by every engine on this config"""
+    return config.derived('target_features', TargetFeatureTable.for_config)
+
+
+def _compile_trigger_masks(config: CompiledModelConfig) -> Dict[str, int]:
+    table = target_features(config)
+    return {state: table.mask_of(*pattern['triggers'])
+            for state, pattern in config.enhanced['micro_state_patterns'].items()}
+
+
+def micro_state_trigger_masks(config: CompiledModelConfig) -> Dict[str, int]:
+    """Micro-state name -> mask of its triggers; matched triggers are (mask & targets).bit_count()"""
+    return config.derived('micro_state_trigger_masks', _compile_trigger_masks)
+
+
+register_precompiled('target_features', TargetFeatureTable.for_config)
+register_precompiled('micro_state_trigger_masks', _compile_trigger_masks)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from model_config import get_config_store
+
+    config = get_config_store().current
+    table = target_features(config)
+    masks = micro_state_trigger_masks(config)
+    targets = [f"{random.choice(['product_page', 'price_comparison', 'review_reading', 'story_engagement'])}_{n}"
+               for n in range(2000)]
+    events = [random.choice(targets) for _ in range(200_000)]
+
+    started = time.perf_counter()
+    for target in events:
+        matched = sum(1 for trigger in config.enhanced['micro_state_patterns']['hesitant']['triggers']
+                      if trigger in target)
+    substring = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for target in events:
+        matched = (table.mask(target) & masks['hesitant']).bit_count()
+    bitmask = time.perf_counter() - started
+
+    print(f"substring checks: {len(events) / substring:12,.0f} targets/s")
+    print(f"bitmask checks:   {len(events) / bitmask:12,.0f} targets/s")
+    print(table.stats())
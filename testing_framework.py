@@ -41,16 +41,48 @@ def run_simulated_tests(num_users=100):
 
     return high_quality_results, low_quality_results
 
+def run_vectorized_tests(num_users=100, seed=None, profiles=None):
+    """
+    Vectorized, seeded counterpart of run_simulated_tests.
+    Returns one structured results array per quality level; see
+    quality_simulation.MonteCarloSimulator for chunked multi-process runs.
+    """
+    from quality_simulation import MonteCarloSimulator
+
+    simulator = MonteCarloSimulator(profiles, seed=seed, workers=1)
+    return {level: simulator.simulate(level, num_users) for level in simulator.profiles}
+
+def run_sequential_tests(max_users=1_000_000, batch_size=1000, alpha=0.05, seed=None, profiles=None):
+    """
+    Sequential (mSPRT) counterpart of run_vectorized_tests: simulates in
+    batches and stops once every quality level differs conclusively from the
+    first one. Returns a sequential_testing.SequentialResult.
+    """
+    from quality_simulation import MonteCarloSimulator
+    from sequential_testing import SequentialExperiment
+
+    simulator = MonteCarloSimulator(profiles, seed=seed, workers=1)
+    return SequentialExperiment(simulator, alpha=alpha, batch_size=batch_size, max_users=max_users).run()
+
+def save_results(path, results):
+    """
+    Saves results in bulk: .npy paths get a structured columnar array,
+    anything else the comma-separated text format, written in one call.
+    """
+    if path.endswith('.npy'):
+        from results_io import write_results
+        write_results(path, results)
+        return
+
+    with open(path, 'w') as f:
+        f.write(''.join(f"{result[0]},{result[1]},{result[2]}\n" for result in results))
+
 if __name__ == '__main__':
     high_results, low_results = run_simulated_tests()
 
-    # Save results to a file for analysis
-    with open('high_quality_results.txt', 'w') as f:
-        for result in high_results:
-            f.write(f"{result[0]},{result[1]},{result[2]}\n")
-
-    with open('low_quality_results.txt', 'w') as f:
-        for result in low_results:
-            f.write(f"{result[0]},{result[1]},{result[2]}\n")
+    # Save results to files for analysis
+    for name, results in (('high_quality_results', high_results), ('low_quality_results', low_results)):
+        save_results(f"{name}.txt", results)
+        save_results(f"{name}.npy", results)
 
-    print("Simulated test data saved to high_quality_results.txt and low_quality_results.txt")
+    print("Simulated test data saved to high_quality_results.{txt,npy} and low_quality_results.{txt,npy}")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3.11
+"""
+CanvasThink Trajectory Features
+===============================
+Turns raw mouse trajectories into compact TrajectoryFeatures vectors.
+
+A trajectory is a list of (x, y) points sampled at a fixed rate, or of
+(x, y, t) points with timestamps in seconds. Each one is compressed with
+Douglas-Peucker, which keeps only the vertices that move the path by more
+than epsilon pixels. Curvature is measured on those vertices, so sensor
+jitter does not count as turning. Speed, jerk and pauses come from the raw
+samples.
+
+Batches are processed as one ragged array. All trajectories are
+concatenated, every per-segment quantity is computed in one pass, and the
+results are reduced per trajectory with bincount. A pause is a run of
+segments slower than PAUSE_SPEED lasting at least MIN_PAUSE. With
+timestamped samples, this includes the gap a browser leaves when it stops
+emitting moves over a still pointer. Only the feature vector is kept on
+the interaction, never the points.
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from er_ai_enhanced import TrajectoryFeatures
+
+# Sampling interval assumed for (x, y) points: one per animation frame
+DEFAULT_SAMPLE_INTERVAL = 1.0 / 60.0
+# Douglas-Peucker tolerance in pixels
+DEFAULT_EPSILON = 2.0
+# A segment slower than this (pixels per second) is part of a pause...
+PAUSE_SPEED = 20.0
+# ...and a run of them counts once it lasts this long (seconds)
+MIN_PAUSE = 0.25
+# Floor on segment durations, so duplicate timestamps do not divide by zero
+MIN_DT = 1e-3
+
+Trajectory = Sequence[Sequence[float]]
+
+
+def _as_points(trajectory: Trajectory, sample_interval: float) -> np.ndarray:
+    """(n, 3) array of x, y, t"""
+    points = np.asarray(trajectory, dtype=np.float64).reshape(len(trajectory), -1)
+    if points.shape[1] == 3:
+        return points
+    if points.shape[1] != 2:
+        raise ValueError("trajectory points must be (x, y) or (x, y, t)")
+    return np.column_stack((points, np.arange(len(points)) * sample_interval))
+
+
+def _douglas_peucker_batch(xy: np.ndarray, starts: np.ndarray, ends: np.ndarray, epsilon: float) -> np.ndarray:
+    """
+    Keep-mask over concatenated trajectories (first/last point indices in
+    starts/ends). Every open segment of every trajectory is split in the
+    same vectorized pass, one recursion level per iteration.
+    """
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[starts] = keep[ends] = True
+    open_segments = ends - starts >= 2
+    seg_start, seg_end = starts[open_segments], ends[open_segments]
+    while len(seg_start):
+        interior = seg_end - seg_start - 1
+        first = np.concatenate(([0], np.cumsum(interior)[:-1]))
+        segment = np.repeat(np.arange(len(seg_start)), interior)
+        index = np.arange(len(segment)) - first[segment] + seg_start[segment] + 1
+
+        chord = xy[seg_end] - xy[seg_start]
+        length = np.hypot(chord[:, 0], chord[:, 1])
+        offsets = xy[index] - xy[seg_start][segment]
+        cross = np.abs(chord[segment, 0] * offsets[:, 1] - chord[segment, 1] * offsets[:, 0])
+        distance = np.where(length[segment] > 0, cross / np.maximum(length[segment], 1e-12),
+                            np.hypot(offsets[:, 0], offsets[:, 1]))
+
+        # Farthest interior point per segment, the first one on ties
+        farthest = np.maximum.reduceat(distance, first)
+        candidates = np.flatnonzero(distance == farthest[segment])
+        _, first_candidate = np.unique(segment[candidates], return_index=True)
+        split = index[candidates[first_candidate]]
+
+        splitting = farthest > epsilon
+        split, left, right = split[splitting], seg_start[splitting], seg_end[splitting]
+        keep[split] = True
+        seg_start = np.concatenate((left, split))
+        seg_end = np.concatenate((split, right))
+        open_segments = seg_end - seg_start >= 2
+        seg_start, seg_end = seg_start[open_segments], seg_end[open_segments]
+    return keep
+
+
+def douglas_peucker(xy: np.ndarray, epsilon: float = DEFAULT_EPSILON) -> np.ndarray:
+    """Indices of the vertices Douglas-Peucker keeps (always the first and the last)"""
+    xy = np.asarray(xy, dtype=np.float64)
+    if not len(xy):
+        return np.arange(0)
+    return np.flatnonzero(_douglas_peucker_batch(xy, np.array([0]), np.array([len(xy) - 1]), epsilon))
+
+
+def compress_trajectory(trajectory: Trajectory, epsilon: float = DEFAULT_EPSILON) -> List[tuple]:
+    """The Douglas-Peucker simplification of a trajectory, as points of the same shape"""
+    if not len(trajectory):
+        return []
+    points = np.asarray(trajectory, dtype=np.float64).reshape(len(trajectory), -1)
+    return [tuple(point) for point in points[douglas_peucker(points[:, :2], epsilon)].tolist()]
+
+
+def extract_features_batch(trajectories: Sequence[Trajectory], sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+                           epsilon: float = DEFAULT_EPSILON) -> List[Optional[TrajectoryFeatures]]:
+    """Features for many trajectories at once; None for empty ones"""
+    arrays = [_as_points(trajectory, sample_interval) if len(trajectory) else None for trajectory in trajectories]
+    present = [index for index, points in enumerate(arrays) if points is not None]
+    results: List[Optional[TrajectoryFeatures]] = [None] * len(arrays)
+    if not present:
+        return results
+
+    batch = len(present)
+    counts = np.array([len(arrays[index]) for index in present])
+    points = np.concatenate([arrays[index] for index in present])
+    owner = np.repeat(np.arange(batch), counts)
+
+    # Segments between consecutive samples of the same trajectory
+    steps = np.diff(points, axis=0)
+    segment_owner = owner[1:]
+    valid = segment_owner == owner[:-1]
+    distance = np.hypot(steps[:, 0], steps[:, 1])
+    dt = np.maximum(steps[:, 2], MIN_DT)
+    speed = distance / dt
+
+    owners = segment_owner[valid]
+    path_length = np.bincount(owners, distance[valid], minlength=batch)
+    duration = np.bincount(owners, dt[valid], minlength=batch)
+    peak_speed = np.zeros(batch)
+    np.maximum.at(peak_speed, owners, speed[valid])
+
+    # Acceleration between consecutive segments, jerk between consecutive accelerations
+    accel_valid = valid[1:] & valid[:-1]
+    acceleration = np.diff(speed) / ((dt[1:] + dt[:-1]) / 2)
+    jerk_valid = accel_valid[1:] & accel_valid[:-1]
+    jerk = np.abs(np.diff(acceleration)) / dt[1:-1]
+    jerk_owner = segment_owner[2:][jerk_valid]
+    jerk_count = np.bincount(jerk_owner, minlength=batch)
+    mean_jerk = np.bincount(jerk_owner, jerk[jerk_valid], minlength=batch) / np.maximum(jerk_count, 1)
+
+    # Pauses: maximal runs of slow segments; boundary segments are never slow, so runs stay within a trajectory
+    slow = valid & (speed < PAUSE_SPEED)
+    run_start = slow & ~np.concatenate(([False], slow[:-1]))
+    run_id = np.cumsum(run_start) - 1
+    run_time = np.bincount(run_id[slow], dt[slow], minlength=int(run_start.sum()))
+    run_owner = segment_owner[run_start]
+    pauses = run_time >= MIN_PAUSE
+    pause_count = np.bincount(run_owner[pauses], minlength=batch)
+    pause_time = np.bincount(run_owner[pauses], run_time[pauses], minlength=batch)
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+    chord = np.hypot(points[ends, 0] - points[starts, 0], points[ends, 1] - points[starts, 1])
+    straightness = np.where(path_length > 0, chord / np.maximum(path_length, 1e-12), 1.0)
+    mean_speed = np.where(duration > 0, path_length / np.maximum(duration, 1e-12), 0.0)
+
+    # Curvature: mean |turning angle| between consecutive compressed segments
+    kept = np.flatnonzero(_douglas_peucker_batch(points[:, :2], starts, ends, epsilon))
+    kept_points = np.bincount(owner[kept], minlength=batch)
+    kept_steps = np.diff(points[kept, :2], axis=0)
+    kept_owner = owner[kept][1:]
+    kept_valid = (kept_owner == owner[kept][:-1]) & np.any(kept_steps != 0, axis=1)
+    kept_steps, kept_owner = kept_steps[kept_valid], kept_owner[kept_valid]
+    headings = np.arctan2(kept_steps[:, 1], kept_steps[:, 0])
+    turns = np.abs((np.diff(headings) + np.pi) % (2 * np.pi) - np.pi)
+    turn_valid = kept_owner[1:] == kept_owner[:-1]
+    turn_owner = kept_owner[1:][turn_valid]
+    turn_count = np.bincount(turn_owner, minlength=batch)
+    curvature = np.bincount(turn_owner, turns[turn_valid], minlength=batch) / np.maximum(turn_count, 1)
+
+    columns = zip(counts.tolist(), kept_points.tolist(), duration.tolist(), path_length.tolist(),
+                  straightness.tolist(), mean_speed.tolist(), peak_speed.tolist(), mean_jerk.tolist(),
+                  curvature.tolist(), pause_count.tolist(), pause_time.tolist())
+    for index, values in zip(present, columns):
+        results[index] = TrajectoryFeatures(*values)
+    return results
+
+
+def extract_trajectory_features(trajectory: Trajectory, sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+                                epsilon: float = DEFAULT_EPSILON) -> Optional[TrajectoryFeatures]:
+    return extract_features_batch([trajectory], sample_interval, epsilon)[0]
+
+
+def synthetic_trajectory(rng: np.random.Generator, hesitant: bool, points: int = 240) -> List[tuple]:
+    """A curved pointer path towards a target in whole pixels, holding still mid-way when hesitant"""
+    progress = np.linspace(0.0, 1.0, points)
+    if hesitant:
+        # Hold still for a few stretches before committing
+        for stop in np.sort(rng.uniform(0.2, 0.8, 3)):
+            progress = np.where(progress > stop, np.maximum(stop, progress - 0.1), progress)
+        progress /= progress[-1]
+    start, end = rng.uniform(0, 800, 2), rng.uniform(0, 800, 2)
+    direction = end - start
+    normal = np.array([-direction[1], direction[0]]) / max(np.hypot(*direction), 1.0)
+    wobble = rng.uniform(20, 80) * np.sin(progress * np.pi * rng.integers(1, 4))
+    xy = np.rint(start + np.outer(progress, direction) + np.outer(wobble, normal))
+    return [tuple(point) for point in xy.tolist()]
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(5)
+    trajectories = [synthetic_trajectory(rng, hesitant=n % 2 == 1) for n in range(5000)]
+
+    started = time.perf_counter()
+    features = extract_features_batch(trajectories)
+    elapsed = time.perf_counter() - started
+    raw_points = sum(len(trajectory) for trajectory in trajectories)
+    print(f"{len(trajectories):,} trajectories ({raw_points:,} points) in {elapsed * 1e3:.0f} ms "
+          f"-> {len(trajectories) / elapsed:,.0f} trajectories/s")
+    kept = sum(f.kept_points for f in features)
+    print(f"Douglas-Peucker keeps {kept / raw_points:.1%} of the points")
+    for label, rows in (('steady', features[0::2]), ('hesitant', features[1::2])):
+        print(f"{label:9} pause time {np.mean([f.pause_time for f in rows]):.2f}s  "
+              f"pauses {np.mean([f.pause_count for f in rows]):.1f}  "
+              f"straightness {np.mean([f.straightness for f in rows]):.2f}")